@@ -1,8 +1,13 @@
 # Copyright (c) 2025 Bytedance Ltd. and/or its affiliates
 # SPDX-License-Identifier: Apache-2.0
+import os
 import re
 import ast
 import math
+import functools
+from typing import Optional, Union
+
+import numpy as np
 
 IMAGE_FACTOR = 28
 MIN_PIXELS = 100 * 28 * 28
@@ -143,13 +148,140 @@ def smart_resize(height: int,
     return h_bar, w_bar
 
 
+COORDINATE_PARAMS = ("start_box", "end_box", "point")
+
+
+def box_values(box) -> list:
+    """
+    Parse a box parameter ("[x1, y1, x2, y2]", "(x, y)" or a sequence of numbers) into floats.
+    Points are expanded to degenerate boxes so every result has four values.
+    """
+    if isinstance(box, str):
+        values = [float(v) for v in box.strip().strip("[]()").split(",")]
+    else:
+        values = [float(v) for v in box]
+    if len(values) == 2:
+        values = values * 2
+    if len(values) != 4:
+        raise ValueError(f"Expected a point or a box, got {box!r}")
+    return values
+
+
+class CoordinateSpace:
+    """
+    Coordinate transforms of one session: model grid -> normalized [0, 1] -> screenshot pixels
+    -> screen pixels.
+
+    Built once per (screenshot size, screen size, model settings) through get_coordinate_space
+    and shared by the parser, the code generator and the visualization so they agree on every
+    conversion. All transforms take and return numpy arrays of (x, y) pairs, so a whole
+    response is converted in one call.
+
+    Args:
+        image_width: Width of the screenshot the model sees
+        image_height: Height of the screenshot the model sees
+        screen_width: Width of the screen the actions run on (defaults to image_width)
+        screen_height: Height of the screen the actions run on (defaults to image_height)
+        factor: Coordinate range of relative-coordinate models (model_type other than qwen25vl)
+        model_type: "qwen25vl" models answer in smart_resize pixels, others in [0, factor]
+        min_pixels: smart_resize lower bound
+        max_pixels: smart_resize upper bound
+    """
+
+    __slots__ = ("image_width", "image_height", "screen_width", "screen_height", "grid_width", "grid_height",
+                 "_grid", "_image", "_screen")
+
+    def __init__(self, image_width: int, image_height: int, screen_width: Optional[int] = None, screen_height: Optional[int] = None,
+                 factor: int = 1000, model_type: str = "qwen25vl", min_pixels: int = MIN_PIXELS, max_pixels: int = MAX_PIXELS):
+        self.image_width, self.image_height = image_width, image_height
+        self.screen_width = screen_width if screen_width is not None else image_width
+        self.screen_height = screen_height if screen_height is not None else image_height
+        if model_type == "qwen25vl":
+            self.grid_height, self.grid_width = smart_resize(image_height, image_width, factor=IMAGE_FACTOR,
+                                                            min_pixels=min_pixels, max_pixels=max_pixels)
+        else:
+            self.grid_width = self.grid_height = factor
+        self._grid = np.array([self.grid_width, self.grid_height], dtype=np.float64)
+        self._image = np.array([self.image_width, self.image_height], dtype=np.float64)
+        self._screen = np.array([self.screen_width, self.screen_height], dtype=np.float64)
+
+    def __repr__(self) -> str:
+        return (f"CoordinateSpace(grid={self.grid_width}x{self.grid_height}, image={self.image_width}x{self.image_height}, "
+                f"screen={self.screen_width}x{self.screen_height})")
+
+    @staticmethod
+    def _pairs(points) -> np.ndarray:
+        points = np.asarray(points, dtype=np.float64)
+        if points.size % 2:
+            raise ValueError(f"Coordinates must come in (x, y) pairs, got {points.size} values")
+        return points.reshape(-1, 2)
+
+    def model_to_normalized(self, points) -> np.ndarray:
+        """Model output coordinates -> fractions of the screenshot."""
+        return self._pairs(points) / self._grid
+
+    def normalized_to_image(self, points) -> np.ndarray:
+        """Fractions -> screenshot pixels (float; truncate for drawing)."""
+        return self._pairs(points) * self._image
+
+    def normalized_to_screen(self, points) -> np.ndarray:
+        """Fractions -> screen pixels (float; pyautogui accepts them as is)."""
+        return self._pairs(points) * self._screen
+
+    @staticmethod
+    def box_centers(boxes) -> np.ndarray:
+        """(N, 4) boxes -> (N, 2) centers."""
+        boxes = np.asarray(boxes, dtype=np.float64).reshape(-1, 4)
+        return np.stack(((boxes[:, 0] + boxes[:, 2]) / 2, (boxes[:, 1] + boxes[:, 3]) / 2), axis=1)
+
+    def action_points(self, actions, target: str = "screen") -> dict:
+        """
+        Centers of every box parameter of structured actions, converted in a single pass.
+
+        Args:
+            actions: Structured actions (normalized boxes, as returned by parse_action_to_structure_output)
+            target: "screen" for screen pixels, "image" for screenshot pixels, "normalized" for fractions
+
+        Returns:
+            dict: {(action_idx, param_name): (x, y)}. Parameters that do not parse are left out.
+        """
+        keys, boxes = [], []
+        for action_idx, action in enumerate(actions):
+            for param_name, param_value in action.get("action_inputs", {}).items():
+                if not param_value or not any(p in param_name for p in COORDINATE_PARAMS):
+                    continue
+                try:
+                    boxes.append(box_values(param_value))
+                except (ValueError, TypeError):
+                    continue
+                keys.append((action_idx, param_name))
+        if not keys:
+            return {}
+        centers = self.box_centers(boxes)
+        if target == "screen":
+            centers = self.normalized_to_screen(centers)
+        elif target == "image":
+            centers = self.normalized_to_image(centers)
+        elif target != "normalized":
+            raise ValueError(f"Unknown target: {target!r}")
+        return dict(zip(keys, map(tuple, centers.tolist())))
+
+
+@functools.lru_cache(maxsize=32)
+def get_coordinate_space(image_width: int, image_height: int, screen_width: Optional[int] = None, screen_height: Optional[int] = None,
+                         factor: int = 1000, model_type: str = "qwen25vl", min_pixels: int = MIN_PIXELS, max_pixels: int = MAX_PIXELS) -> CoordinateSpace:
+    """Cached CoordinateSpace; spaces are never mutated, so one instance serves a whole session."""
+    return CoordinateSpace(image_width, image_height, screen_width, screen_height, factor, model_type, min_pixels, max_pixels)
+
+
 def parse_action_to_structure_output(text,
                                      factor,
                                      origin_resized_height,
                                      origin_resized_width,
                                      model_type="qwen25vl",
                                      max_pixels=16384 * 28 * 28,
-                                     min_pixels=100 * 28 * 28):
+                                     min_pixels=100 * 28 * 28,
+                                     space: Optional[CoordinateSpace] = None):
     text = text.strip()
 
     if "<point>" in text:
@@ -161,13 +293,9 @@ def parse_action_to_structure_output(text,
     if "point=" in text:
         text = text.replace("point=", "start_box=")
 
-    if model_type == "qwen25vl":
-        smart_resize_height, smart_resize_width = smart_resize(
-            origin_resized_height,
-            origin_resized_width,
-            factor=IMAGE_FACTOR,
-            min_pixels=min_pixels,
-            max_pixels=max_pixels)
+    if space is None:
+        space = get_coordinate_space(origin_resized_width, origin_resized_height, factor=factor, model_type=model_type,
+                                     min_pixels=min_pixels, max_pixels=max_pixels)
 
     # 正则表达式匹配 Action 字符串
     if text.startswith("Thought:"):
@@ -223,6 +351,8 @@ def parse_action_to_structure_output(text,
         for action in all_action
     ]
     actions = []
+    # Box parameters are collected and converted to normalized coordinates in one pass
+    pending_boxes = []
     for action_instance, raw_str in zip(parsed_actions, all_action):
         if action_instance == None:
             print(f"Action can't parse: {raw_str}")
@@ -243,27 +373,9 @@ def parse_action_to_structure_output(text,
                 # Remove parentheses and split the string by commas
                 numbers = ori_box.replace("(", "").replace(")", "").split(",")
 
-                # Convert to float and scale by 1000
-                # Qwen2.5vl output absolute coordinates, qwen2vl output relative coordinates
-                if model_type == "qwen25vl":
-                    float_numbers = []
-                    for num_idx, num in enumerate(numbers):
-                        num = float(num)
-                        if (num_idx + 1) % 2 == 0:
-                            float_numbers.append(
-                                float(num / smart_resize_height))
-                        else:
-                            float_numbers.append(
-                                float(num / smart_resize_width))
-                else:
-                    float_numbers = [float(num) / factor for num in numbers]
-
-                if len(float_numbers) == 2:
-                    float_numbers = [
-                        float_numbers[0], float_numbers[1], float_numbers[0],
-                        float_numbers[1]
-                    ]
-                action_inputs[param_name.strip()] = str(float_numbers)
+                # Qwen2.5vl output absolute coordinates, qwen2vl output relative coordinates;
+                # the coordinate space knows which grid to divide by
+                pending_boxes.append((action_inputs, param_name.strip(), [float(num) for num in numbers]))
 
         # import pdb; pdb.set_trace()
         actions.append({
@@ -273,13 +385,163 @@ def parse_action_to_structure_output(text,
             "action_inputs": action_inputs,
             "text": text
         })
+
+    if pending_boxes:
+        normalized = space.model_to_normalized([num for _, _, numbers in pending_boxes for num in numbers]).ravel().tolist()
+        offset = 0
+        for action_inputs, param_name, numbers in pending_boxes:
+            float_numbers = normalized[offset:offset + len(numbers)]
+            offset += len(numbers)
+            if len(float_numbers) == 2:
+                float_numbers = float_numbers * 2
+            action_inputs[param_name] = str(float_numbers)
     return actions
 
+def roi_around_point(point, image_width: int, image_height: int, roi_width: int, roi_height: int) -> tuple[int, int, int, int]:
+    """
+    Returns an (x, y, width, height) pixel region of the given size centered on a normalized
+    point (e.g. the last action's box center), shifted to stay inside the image.
+    """
+    roi_width, roi_height = min(roi_width, image_width), min(roi_height, image_height)
+    left = int(round(point[0] * image_width - roi_width / 2))
+    top = int(round(point[1] * image_height - roi_height / 2))
+    left = min(max(0, left), image_width - roi_width)
+    top = min(max(0, top), image_height - roi_height)
+    return left, top, roi_width, roi_height
+
+
+def map_actions_from_roi(actions, roi, image_width: int, image_height: int):
+    """
+    Map structured actions parsed from a cropped image back to the full image.
+
+    parse_action_to_structure_output normalizes coordinates against the image it is given,
+    so when the model only saw `roi` the boxes are fractions of the crop. This rescales every
+    start_box/end_box to fractions of the full (image_width x image_height) image.
+
+    Args:
+        actions: Output of parse_action_to_structure_output for the crop (origin size = roi size)
+        roi: (x, y, width, height) of the crop in full-image pixels
+        image_width: Full image width in pixels
+        image_height: Full image height in pixels
+
+    Returns:
+        list: New action dicts with full-image normalized boxes
+    """
+    roi_x, roi_y, roi_w, roi_h = roi
+    mapped = []
+    for action in actions:
+        action_inputs = dict(action.get("action_inputs", {}))
+        for param_name in ("start_box", "end_box"):
+            if param_name not in action_inputs:
+                continue
+            numbers = ast.literal_eval(action_inputs[param_name])
+            full = []
+            for num_idx, num in enumerate(numbers):
+                if num_idx % 2 == 0:
+                    full.append((roi_x + num * roi_w) / image_width)
+                else:
+                    full.append((roi_y + num * roi_h) / image_height)
+            action_inputs[param_name] = str(full)
+        mapped.append(dict(action, action_inputs=action_inputs))
+    return mapped
+
+
+class TimingProfile:
+    """
+    Delays used by generated PyAutoGUI code.
+
+    Args:
+        between_actions: Seconds to wait between consecutive actions
+        after_paste: Seconds to wait after pasting/typing text
+        type_interval: Interval between keystrokes (pyautogui.write / hotkey interval)
+        drag_duration: Duration of dragTo
+        integration_delay: Seconds the integrated script waits after each action
+        per_action: {action_type: seconds} overriding `between_actions` after that action type
+        stability_wait: Emit a wait for the screen to stop changing instead of fixed sleeps
+                        (the sleep value is then the upper bound of the wait)
+        stability_interval: Poll interval of the stability wait
+    """
+
+    def __init__(self,
+                 between_actions: float = 1,
+                 after_paste: float = 0.5,
+                 type_interval: float = 0.1,
+                 drag_duration: float = 1.0,
+                 integration_delay: float = 2.0,
+                 per_action: Optional[dict] = None,
+                 stability_wait: bool = False,
+                 stability_interval: float = 0.1):
+        self.between_actions = between_actions
+        self.after_paste = after_paste
+        self.type_interval = type_interval
+        self.drag_duration = drag_duration
+        self.integration_delay = integration_delay
+        self.per_action = dict(per_action or {})
+        self.stability_wait = stability_wait
+        self.stability_interval = stability_interval
+
+    def replace(self, **changes) -> "TimingProfile":
+        params = dict(self.__dict__)
+        params.update(changes)
+        return TimingProfile(**params)
+
+    def delay_after(self, action_type: Optional[str]) -> float:
+        return self.per_action.get(action_type, self.between_actions)
+
+    def wait_code(self, seconds: float) -> str:
+        """Code line for a pause of (at most) `seconds`."""
+        if self.stability_wait:
+            return f"wait_for_stable_screen({seconds!r})"
+        return f"time.sleep({seconds!r})"
+
+    def integration_note(self) -> str:
+        """Instruction for CODE_INTEGRATION_PROMPT describing how to pause after each action."""
+        if self.stability_wait:
+            return (f"You should call `wait_for_stable_screen({self.integration_delay!r})` after each action to ensure the action is "
+                    f"executed successfully, and keep the `wait_for_stable_screen` definition from the snippets once at the top.")
+        return f"You should insert a `time.sleep({self.integration_delay!r})` after each action to ensure the action is executed successfully."
+
+
+# Defined at the top of generated code when TimingProfile.stability_wait is set: returns as soon
+# as two consecutive downscaled screenshots are identical, or after `timeout` seconds
+STABILITY_WAIT_HELPER = """
+def wait_for_stable_screen(timeout, interval={interval!r}):
+    deadline = time.time() + timeout
+    previous = None
+    while time.time() < deadline:
+        current = pyautogui.screenshot().convert('L').resize((160, 100)).tobytes()
+        if current == previous:
+            return
+        previous = current
+        time.sleep(interval)
+"""
+
+# "safe" keeps the delays the generator always used; "fast" is tuned for responsive UIs
+TIMING_PROFILES = {
+    "safe": TimingProfile(),
+    "fast": TimingProfile(between_actions=0.3, after_paste=0.15, type_interval=0.02, drag_duration=0.3,
+                          integration_delay=0.5, per_action={"hotkey": 0.5, "press": 0.5}),
+    "stable": TimingProfile(between_actions=2.0, after_paste=1.0, integration_delay=3.0, stability_wait=True),
+}
+
+
+def get_timing_profile(profile: Union[str, TimingProfile, None] = None) -> TimingProfile:
+    """Resolve a preset name ("safe", "fast", "stable"), a TimingProfile, or None (the PYAUTOGUI_TIMING env var, then "safe")."""
+    if isinstance(profile, TimingProfile):
+        return profile
+    name = profile or os.getenv("PYAUTOGUI_TIMING") or "safe"
+    if name not in TIMING_PROFILES:
+        raise ValueError(f"Unknown timing profile: {name}, expected one of {sorted(TIMING_PROFILES)}")
+    return TIMING_PROFILES[name]
+
+
 # TODO: This function's output is not compatible with all OS system, for example, on Mac, it should use command + v instead of ctrl + v
 def parsing_response_to_pyautogui_code(responses,
-                                       image_height: int,
-                                       image_width: int,
-                                       input_swap: bool = True) -> str:
+                                       image_height: Optional[int] = None,
+                                       image_width: Optional[int] = None,
+                                       input_swap: bool = True,
+                                       timing: Union[str, TimingProfile, None] = None,
+                                       space: Optional[CoordinateSpace] = None) -> str:
     '''
     将M模型的输出解析为OSWorld中的action，生成pyautogui代码字符串
     参数:
@@ -296,9 +558,18 @@ def parsing_response_to_pyautogui_code(responses,
         生成的pyautogui代码字符串
     '''
 
+    timing = get_timing_profile(timing)
+    if space is None:
+        if image_height is None or image_width is None:
+            raise ValueError("parsing_response_to_pyautogui_code needs image_height and image_width, or a CoordinateSpace via space")
+        space = get_coordinate_space(image_width, image_height)
     pyautogui_code = f"import pyautogui\nimport time\n"
+    if timing.stability_wait:
+        pyautogui_code += STABILITY_WAIT_HELPER.format(interval=timing.stability_interval)
     if isinstance(responses, dict):
         responses = [responses]
+    # Screen positions (box centers) of every action, converted together
+    points = {key: (round(x, 3), round(y, 3)) for key, (x, y) in space.action_points(responses, target="screen").items()}
     for response_id, response in enumerate(responses):
         if "observation" in response:
             observation = response["observation"]
@@ -313,7 +584,7 @@ def parsing_response_to_pyautogui_code(responses,
         if response_id == 0:
             pyautogui_code += f"'''\nObservation:\n{observation}\n\nThought:\n{thought}\n'''\n"
         else:
-            pyautogui_code += f"\ntime.sleep(1)\n"
+            pyautogui_code += f"\n{timing.wait_code(timing.delay_after(responses[response_id - 1].get('action_type')))}\n"
 
         action_dict = response
         action_type = action_dict.get("action_type")
@@ -411,41 +682,32 @@ def parsing_response_to_pyautogui_code(responses,
                 if input_swap:
                     pyautogui_code += f"\nimport pyperclip"
                     pyautogui_code += f"\npyperclip.copy('{stripped_content}')"
-                    pyautogui_code += f"\npyautogui.hotkey('ctrl', 'v', interval=0.1)"
-                    pyautogui_code += f"\ntime.sleep(0.5)\n"
+                    pyautogui_code += f"\npyautogui.hotkey('ctrl', 'v', interval={timing.type_interval!r})"
+                    pyautogui_code += f"\n{timing.wait_code(timing.after_paste)}\n"
                     if content.endswith("\n") or content.endswith("\\n"):
                         pyautogui_code += f"\npyautogui.press('enter')"
                 else:
-                    pyautogui_code += f"\npyautogui.write('{stripped_content}', interval=0.1)"
-                    pyautogui_code += f"\ntime.sleep(0.5)\n"
+                    pyautogui_code += f"\npyautogui.write('{stripped_content}', interval={timing.type_interval!r})"
+                    pyautogui_code += f"\n{timing.wait_code(timing.after_paste)}\n"
                     if content.endswith("\n") or content.endswith("\\n"):
                         pyautogui_code += f"\npyautogui.press('enter')"
 
         elif action_type in ["drag", "select"]:
             # Parsing drag or select action based on start and end_boxes
-            start_box = action_inputs.get("start_box")
-            end_box = action_inputs.get("end_box")
-            if start_box and end_box:
-                x1, y1, x2, y2 = eval(
-                    start_box)  # Assuming box is in [x1, y1, x2, y2]
-                sx = round(float((x1 + x2) / 2) * image_width, 3)
-                sy = round(float((y1 + y2) / 2) * image_height, 3)
-                x1, y1, x2, y2 = eval(
-                    end_box)  # Assuming box is in [x1, y1, x2, y2]
-                ex = round(float((x1 + x2) / 2) * image_width, 3)
-                ey = round(float((y1 + y2) / 2) * image_height, 3)
+            start = points.get((response_id, "start_box"))
+            end = points.get((response_id, "end_box"))
+            if start and end:
+                sx, sy = start
+                ex, ey = end
                 pyautogui_code += (
                     f"\npyautogui.moveTo({sx}, {sy})\n"
-                    f"\npyautogui.dragTo({ex}, {ey}, duration=1.0)\n")
+                    f"\npyautogui.dragTo({ex}, {ey}, duration={timing.drag_duration!r})\n")
 
         elif action_type == "scroll":
             # Parsing scroll action
-            start_box = action_inputs.get("start_box")
-            if start_box:
-                x1, y1, x2, y2 = eval(
-                    start_box)  # Assuming box is in [x1, y1, x2, y2]
-                x = round(float((x1 + x2) / 2) * image_width, 3)
-                y = round(float((y1 + y2) / 2) * image_height, 3)
+            start = points.get((response_id, "start_box"))
+            if start:
+                x, y = start
 
                 # # 先点对应区域，再滚动
                 # pyautogui_code += f"\npyautogui.click({x}, {y}, button='left')"
@@ -469,18 +731,9 @@ def parsing_response_to_pyautogui_code(responses,
                 "click", "left_single", "left_double", "right_single", "hover"
         ]:
             # Parsing mouse click actions
-            start_box = action_inputs.get("start_box")
-            start_box = str(start_box)
-            if start_box:
-                start_box = eval(start_box)
-                if len(start_box) == 4:
-                    x1, y1, x2, y2 = start_box  # Assuming box is in [x1, y1, x2, y2]
-                elif len(start_box) == 2:
-                    x1, y1 = start_box
-                    x2 = x1
-                    y2 = y1
-                x = round(float((x1 + x2) / 2) * image_width, 3)
-                y = round(float((y1 + y2) / 2) * image_height, 3)
+            start = points.get((response_id, "start_box"))
+            if start:
+                x, y = start
                 if action_type == "left_single" or action_type == "click":
                     pyautogui_code += f"\npyautogui.click({x}, {y}, button='left')"
                 elif action_type == "left_double":
@@ -502,6 +755,31 @@ def parsing_response_to_pyautogui_code(responses,
     return pyautogui_code
 
 
+def split_actions_at_barriers(actions):
+    """
+    Split one multi-action model turn into segments that can each run in a single exec round-trip.
+
+    Coordinates of every action were grounded on the screenshot taken before the turn, so an
+    action that targets a point is only safe as the first action of a segment; a new segment
+    (and a fresh look at the screen before it runs) starts at every later coordinate-based action.
+    Keyboard actions such as type/hotkey/press never need a new screenshot.
+
+    Args:
+        actions: Structured actions from parse_action_to_structure_output
+
+    Returns:
+        list: List of action lists, in execution order
+    """
+    segments = []
+    for action in actions:
+        targets_point = "start_box" in action.get("action_inputs", {})
+        if not segments or targets_point:
+            segments.append([action])
+        else:
+            segments[-1].append(action)
+    return segments
+
+
 def add_box_token(input_string):
     # Step 1: Split the string into individual actions
     if "Action: " in input_string and "start_box=" in input_string:
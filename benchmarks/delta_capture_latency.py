@@ -0,0 +1,121 @@
+"""
+Capture latency of DeltaScreenCapture.capture() against computer.interface.screenshot().
+
+Times both paths on a static screen (the best case for deltas: no changed tiles) and reports
+mean/p50/p95 latency and the bytes each capture returns. The delta agent is started once by
+install(); every capture is then one run_command round trip through its FIFOs, in which the
+agent grabs the screen and diffs it against the previous frame it keeps in memory.
+
+By default it starts the cua docker container used by test_ui-tars.py. With --local the
+container interface is emulated on this host: run_command runs the agent with the
+interpreter given by --python and screenshot() grabs and PNG-encodes in process, which is roughly what the
+container's server does without the transport. --local needs pyautogui and a display,
+e.g. under xvfb-run.
+
+Usage:
+    python -m benchmarks.delta_capture_latency --image cua-browser-ubuntu:latest --repeats 20
+    xvfb-run -s "-screen 0 1920x1080x24" python -m benchmarks.delta_capture_latency --local --repeats 20
+"""
+import argparse
+import asyncio
+import io
+import pathlib
+import statistics
+import sys
+import time
+from types import SimpleNamespace
+
+REPO_ROOT = pathlib.Path(__file__).resolve().parent.parent
+if str(REPO_ROOT) not in sys.path:
+    sys.path.insert(0, str(REPO_ROOT))
+
+from delta_capture import DeltaScreenCapture  # noqa: E402
+
+
+class LocalInterface:
+    """Host-side stand-in for computer.interface: the subset DeltaScreenCapture and this benchmark use."""
+
+    def __init__(self, python: str = "python3"):
+        self.python = python
+
+    async def write_text(self, path: str, text: str) -> None:
+        pathlib.Path(path).write_text(text)
+
+    async def run_command(self, command: str):
+        command = command.replace("python3 ", self.python + " ")
+        process = await asyncio.create_subprocess_shell(command, stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE)
+        stdout, stderr = await process.communicate()
+        return SimpleNamespace(stdout=stdout.decode(), stderr=stderr.decode(), returncode=process.returncode)
+
+    async def screenshot(self) -> bytes:
+        import pyautogui
+
+        buffered = io.BytesIO()
+        pyautogui.screenshot().save(buffered, format="PNG")
+        return buffered.getvalue()
+
+
+async def _time(fn, repeats: int) -> dict:
+    await fn()  # warm up
+    samples = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        await fn()
+        samples.append(1000.0 * (time.perf_counter() - start))
+    samples.sort()
+    return {"mean_ms": statistics.fmean(samples), "p50_ms": samples[len(samples) // 2], "p95_ms": samples[min(len(samples) - 1, int(0.95 * len(samples)))]}
+
+
+async def run(computer, repeats: int) -> dict:
+    interface = computer.interface
+    results = {}
+    screenshot_bytes = []
+
+    async def screenshot():
+        screenshot_bytes.append(len(await interface.screenshot()))
+
+    results["interface.screenshot"] = await _time(screenshot, repeats)
+    results["interface.screenshot"]["bytes"] = statistics.fmean(screenshot_bytes)
+
+    capture = DeltaScreenCapture(computer)
+    await capture.install()
+    await capture.capture()  # first capture is a keyframe
+    start_bytes, start_captures = capture.bytes_received, capture.captures
+    results["delta capture (static)"] = await _time(capture.capture, repeats)
+    results["delta capture (static)"]["bytes"] = (capture.bytes_received - start_bytes) / (capture.captures - start_captures)
+    results["delta capture (static)"]["keyframes"] = capture.keyframes
+    await capture.close()
+    return results
+
+
+async def main_async(args) -> dict:
+    if args.local:
+        return await run(SimpleNamespace(interface=LocalInterface(args.python)), args.repeats)
+
+    from computer import Computer
+
+    computer = Computer(os_type="linux", provider_type="docker", image=args.image, name="delta-capture-bench", noVNC_port=6901, port=8000)
+    await computer.run()
+    try:
+        return await run(computer, args.repeats)
+    finally:
+        await computer.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Delta capture latency vs interface.screenshot()")
+    parser.add_argument("--repeats", type=int, default=20)
+    parser.add_argument("--image", default="cua-browser-ubuntu:latest")
+    parser.add_argument("--local", action="store_true", help="Emulate the container interface on this host")
+    parser.add_argument("--python", default="python3", help="Interpreter running the agent with --local")
+    args = parser.parse_args()
+
+    results = asyncio.run(main_async(args))
+    print("=== Delta Capture Latency ===")
+    print(f"{'path':<24} {'mean':>9} {'p50':>9} {'p95':>9} {'bytes':>10}")
+    for name, timing in results.items():
+        print(f"{name:<24} {timing['mean_ms']:>7.1f}ms {timing['p50_ms']:>7.1f}ms {timing['p95_ms']:>7.1f}ms {timing['bytes']:>10.0f}")
+
+
+if __name__ == "__main__":
+    main()
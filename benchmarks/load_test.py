@@ -0,0 +1,133 @@
+"""
+End-to-end load test of the agent step loop against the local chat completions stub.
+
+Each simulated agent runs `demo_docker_cua_step_automation` unmodified in its own process,
+against a ReplayInterface serving a synthetic frame, while all model calls go to one shared
+ChatCompletionsStub with the configured latency model.
+
+Usage:
+    python -m benchmarks.load_test --agents 8 --iterations 5 --first-token lognormal:-0.7,0.4 --token-rate normal:40,5
+"""
+import argparse
+import asyncio
+import io
+import os
+import pathlib
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+REPO_ROOT = pathlib.Path(__file__).resolve().parent.parent
+if str(REPO_ROOT) not in sys.path:
+    sys.path.insert(0, str(REPO_ROOT))
+
+from replay import ReplayComputer, ReplayInterface, _load_step_loop, grounding_endpoint  # noqa: E402
+from stub_server import CannedUITarsResponder, ChatCompletionsStub, Distribution, LatencyModel  # noqa: E402
+
+
+def _synthetic_frame(width: int, height: int) -> bytes:
+    from PIL import Image
+
+    buffered = io.BytesIO()
+    Image.new("RGB", (width, height), (245, 245, 245)).save(buffered, format="PNG")
+    return buffered.getvalue()
+
+
+def _run_agent(agent_idx: int, base_url: str, iterations: int, image_size: tuple, screen_size: tuple, exec_latency: float) -> dict:
+    # Runs in a worker process: isolate output files. The grounding endpoint is pinned after the
+    # step loop module is imported, since its load_dotenv() may set TGI_BASE_URL(S) again
+    workdir = tempfile.mkdtemp(prefix=f"cua_load_{agent_idx}_")
+    os.chdir(workdir)
+
+    step_loop = _load_step_loop()
+    frame = _synthetic_frame(*image_size)
+    interface = ReplayInterface([frame], screen_size[0], screen_size[1], exec_latency=exec_latency)
+
+    start = time.perf_counter()
+    with grounding_endpoint(base_url, api_key="load-test"):
+        asyncio.run(step_loop(
+            f"Load test agent {agent_idx}",
+            ReplayComputer(interface),
+            image_size[0],
+            image_size[1],
+            screen_size[0],
+            screen_size[1],
+            step_idx=agent_idx + 1,
+            max_iterations=iterations,
+        ))
+    return {
+        "agent": agent_idx,
+        "wall_time_s": time.perf_counter() - start,
+        "iterations": interface.frames_served,
+        "commands": len(interface.commands),
+    }
+
+
+def run_load_test(agents: int, iterations: int, first_token: str = "0", token_rate: str = "0", exec_latency: float = 0.0, image_size: tuple = (1440, 900), screen_size: tuple = (1920, 1080), seed: int = 0) -> dict:
+    """
+    Run `agents` concurrent step loops against one stub and report end-to-end throughput.
+
+    Args:
+        agents: Number of concurrent agent processes
+        iterations: Iterations per agent (finished() is never emitted, so every agent runs all of them)
+        first_token: Time-to-first-token distribution spec for the stub
+        token_rate: Decode rate distribution spec for the stub (tokens/s)
+        exec_latency: Emulated in-container execution time per action in seconds
+        image_size: Screenshot size (width, height) served to the loop
+        screen_size: Screen size (width, height) used for code generation
+        seed: Seed for canned responses and latency sampling
+
+    Returns:
+        dict: Throughput, per-agent timings and server-side latency stats
+    """
+    latency = LatencyModel(Distribution.parse(first_token), Distribution.parse(token_rate), seed=seed)
+    responder = CannedUITarsResponder(seed=seed, finish_every=0)
+    with ChatCompletionsStub(responder, latency=latency) as stub:
+        start = time.perf_counter()
+        with ProcessPoolExecutor(max_workers=agents) as pool:
+            futures = [
+                pool.submit(_run_agent, idx, stub.base_url, iterations, image_size, screen_size, exec_latency)
+                for idx in range(agents)
+            ]
+            results = [f.result() for f in futures]
+        elapsed = time.perf_counter() - start
+        server_stats = stub.stats()
+
+    total_iterations = sum(r["iterations"] for r in results)
+    report = {
+        "agents": agents,
+        "iterations_per_agent": iterations,
+        "wall_time_s": elapsed,
+        "total_iterations": total_iterations,
+        "throughput_iter_per_s": total_iterations / elapsed if elapsed else 0.0,
+        "mean_agent_time_s": sum(r["wall_time_s"] for r in results) / len(results),
+        "model_calls": server_stats.get("requests", 0),
+        "server": server_stats,
+    }
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Agent loop load test against the local stub")
+    parser.add_argument("--agents", type=int, default=4)
+    parser.add_argument("--iterations", type=int, default=5)
+    parser.add_argument("--first-token", default="0")
+    parser.add_argument("--token-rate", default="0")
+    parser.add_argument("--exec-latency", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    report = run_load_test(args.agents, args.iterations, args.first_token, args.token_rate, args.exec_latency, seed=args.seed)
+    print("=== Load Test Report ===")
+    print(f"Agents: {report['agents']} x {report['iterations_per_agent']} iteration(s)")
+    print(f"Wall time: {report['wall_time_s']:.2f}s")
+    print(f"Throughput: {report['throughput_iter_per_s']:.2f} iterations/s ({report['model_calls']} model calls)")
+    print(f"Mean agent time: {report['mean_agent_time_s']:.2f}s")
+    server = report["server"]
+    if server.get("requests"):
+        print(f"Server latency: p50 {server['p50_s']:.3f}s, p95 {server['p95_s']:.3f}s, p99 {server['p99_s']:.3f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+"""
+Measure what loop detection saves on recorded trajectories.
+
+Replays each trajectory through `demo_docker_cua_step_automation` with loop detection off,
+with `loop_detection="stop"` and with `loop_detection="escalate"`, and reports the iterations,
+model calls and in-container executions of each run. Trajectories that never repeat an action
+on an unchanged screen must come out identical in all three modes.
+
+Usage:
+    python -m benchmarks.loop_detection ./data/trajectories/step_1 ./data/trajectories/stuck_click --max-iterations 5
+"""
+import argparse
+import asyncio
+import pathlib
+import sys
+
+REPO_ROOT = pathlib.Path(__file__).resolve().parent.parent
+if str(REPO_ROOT) not in sys.path:
+    sys.path.insert(0, str(REPO_ROOT))
+
+import replay  # noqa: E402
+
+MODES = (None, "stop", "escalate")
+
+
+async def compare_modes(trajectory_dirs, max_iterations: int) -> list:
+    rows = []
+    for trajectory_dir in trajectory_dirs:
+        for mode in MODES:
+            result = await replay.replay_trajectory(trajectory_dir, max_iterations=max_iterations,
+                                                    loop_kwargs={"loop_detection": mode, "settle_time": 0.0})
+            rows.append({
+                "trajectory": str(trajectory_dir),
+                "mode": mode or "off",
+                "iterations": result["frames_served"],
+                "model_calls": result["model_calls"],
+                "executions": result["commands_run"],
+                "wall_time_s": result["wall_time_s"],
+                "verdicts": result["loop"].get("loop_detection", {}).get("verdicts", []),
+            })
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Iterations and model calls saved by loop detection")
+    parser.add_argument("trajectories", nargs="+")
+    parser.add_argument("--max-iterations", type=int, default=5)
+    args = parser.parse_args()
+
+    rows = asyncio.run(compare_modes(args.trajectories, args.max_iterations))
+    print("=== Loop Detection ===")
+    print(f"{'trajectory':<32} {'mode':<9} {'iterations':>10} {'model calls':>11} {'executions':>10}")
+    baseline = {}
+    for row in rows:
+        if row["mode"] == "off":
+            baseline[row["trajectory"]] = row
+        base = baseline[row["trajectory"]]
+        print(f"{pathlib.Path(row['trajectory']).name:<32} {row['mode']:<9} {row['iterations']:>10} {row['model_calls']:>11} {row['executions']:>10}"
+              + (f"   saved {base['iterations'] - row['iterations']} iteration(s), {base['model_calls'] - row['model_calls']} call(s)" if row["mode"] != "off" else ""))
+
+    for mode in MODES[1:]:
+        mode_rows = [row for row in rows if row["mode"] == mode]
+        saved_iterations = sum(baseline[row["trajectory"]]["iterations"] - row["iterations"] for row in mode_rows)
+        saved_calls = sum(baseline[row["trajectory"]]["model_calls"] - row["model_calls"] for row in mode_rows)
+        total_calls = sum(baseline[row["trajectory"]]["model_calls"] for row in mode_rows)
+        print(f"{mode}: saved {saved_iterations} iteration(s) and {saved_calls}/{total_calls} model call(s) "
+              f"({100.0 * saved_calls / total_calls if total_calls else 0.0:.1f}%)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+"""
+Prompt-prefix benchmark against a prefix-caching stub.
+
+Sends a multi-task, multi-step workload to a ChatCompletionsStub with a PrefixCacheModel
+(block-level prefix cache), once with the current layout (static prompt first, then the
+per-task note and instruction) and once with the per-task text ahead of the static prompt,
+and compares cached-token ratio and wall time. Byte identity of the static prefix itself is
+covered by tests/test_prefix_cache.py.
+
+Usage:
+    python -m benchmarks.prefix_cache --tasks 4 --steps 5 --prefill-rate 4000
+"""
+import argparse
+import base64
+import io
+import pathlib
+import sys
+import time
+
+REPO_ROOT = pathlib.Path(__file__).resolve().parent.parent
+if str(REPO_ROOT) not in sys.path:
+    sys.path.insert(0, str(REPO_ROOT))
+
+from openai import OpenAI  # noqa: E402
+
+from core import AutomationState, build_messages_with_state  # noqa: E402
+from prompts.prompts import COMPUTER_USE_DOUBAO_STATIC, COMPUTER_USE_DOUBAO_TASK  # noqa: E402
+from stub_server import ChatCompletionsStub, PrefixCacheModel, ScriptedResponder  # noqa: E402
+
+
+def _frame(seed: int, size=(1280, 800)) -> str:
+    from PIL import Image, ImageDraw
+
+    image = Image.new("RGB", size, (250, 250, 250))
+    ImageDraw.Draw(image).rectangle([seed * 37 % size[0], 100, seed * 37 % size[0] + 200, 160], fill=(seed * 50 % 255, 80, 160))
+    buffered = io.BytesIO()
+    image.save(buffered, format="PNG")
+    return base64.b64encode(buffered.getvalue()).decode("ascii")
+
+
+def _task_first_messages(state: AutomationState, current_image_b64: str) -> list:
+    # Per-task note and instruction ahead of the static prompt: no prefix is shared across tasks
+    messages = build_messages_with_state(state, current_image_b64)
+    task_text = COMPUTER_USE_DOUBAO_TASK.format(instruction=state.instruction, language=state.language)
+    return [{"role": "user", "content": task_text + "\n\n" + COMPUTER_USE_DOUBAO_STATIC}] + messages[1:]
+
+
+def build_workload(tasks: int, steps: int, task_first: bool = False) -> list:
+    builder = _task_first_messages if task_first else build_messages_with_state
+    requests = []
+    for task_idx in range(tasks):
+        state = AutomationState(f"Task {task_idx}: fill in the form field number {task_idx} and submit it.")
+        for step in range(steps):
+            frame = _frame(task_idx * 100 + step)
+            requests.append(builder(state, frame))
+            state.add_step(frame, f"Step {step} thought", f"click(start_box='[0.{step + 1}, 0.2, 0.{step + 1}, 0.2]')")
+    return requests
+
+
+def run(requests: list, prefill_rate: float) -> dict:
+    cache = PrefixCacheModel(prefill_tokens_per_s=prefill_rate)
+    with ChatCompletionsStub(ScriptedResponder(["Thought: ok\nAction: wait()"], loop=True), prefix_cache=cache) as stub:
+        client = OpenAI(base_url=stub.base_url, api_key="bench", max_retries=0)
+        start = time.perf_counter()
+        for messages in requests:
+            client.chat.completions.create(model="tgi", messages=messages, temperature=0.0, max_tokens=400)
+        elapsed = time.perf_counter() - start
+    report = cache.stats()
+    report["wall_time_s"] = elapsed
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Prefix-cache benchmark for grounding prompts")
+    parser.add_argument("--tasks", type=int, default=4)
+    parser.add_argument("--steps", type=int, default=5)
+    parser.add_argument("--prefill-rate", type=float, default=4000.0, help="Uncached prompt tokens prefilled per second")
+    args = parser.parse_args()
+
+    for name, requests in (("task-first", build_workload(args.tasks, args.steps, task_first=True)), ("current", build_workload(args.tasks, args.steps))):
+        report = run(requests, args.prefill_rate)
+        print(f"{name:10s} cached {report['cached_tokens']}/{report['prompt_tokens']} prompt tokens "
+              f"({report['cache_hit_ratio']:.1%}), wall time {report['wall_time_s']:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,227 @@
+"""
+Evaluate the local tier of TieredResultChecker against LLM labels on a recorded dataset.
+
+A dataset is a directory with `dataset.json` and the referenced PNGs:
+
+    [
+        {"task_description": "...", "expected": "expected_01.png", "current": "current_01.png", "label": true},
+        ...
+    ]
+
+`label` is the gpt-4o verdict recorded earlier; entries without one are labelled by calling
+`call_result_checking_model` (and written back with --save-labels so the next run is offline).
+
+The report gives how often the local tier decides (pass / fail) versus escalates, and the
+confusion matrix of local decisions against the LLM labels.
+
+Without --mask the checker's DEFAULT_VOLATILE_REGIONS are used; --no-fail-locally evaluates
+the local tier without its fail decision. --build-synthetic writes a dataset of synthetic portal
+screenshots first, labelled by construction (SYNTHETIC_CASES), for checking thresholds without
+recorded data or LLM calls. With the default thresholds, 10 synthetic pages give:
+
+    Decided locally: 30 (30.0%), escalated to LLM: 70
+    Local accuracy:  100.0% (false pass 0, false fail 0)
+    Confusion (local decision x LLM label):
+                llm=true llm=false
+          pass        20         0
+          fail         0        10
+      escalate        30        40
+
+Usage:
+    python -m benchmarks.result_check_tiers ./data/result_check_dataset --mask 0.9,0,1,0.05
+    python -m benchmarks.result_check_tiers /tmp/result_check_synthetic --build-synthetic 10
+"""
+import argparse
+import base64
+import json
+import pathlib
+import random
+import sys
+import time
+
+REPO_ROOT = pathlib.Path(__file__).resolve().parent.parent
+if str(REPO_ROOT) not in sys.path:
+    sys.path.insert(0, str(REPO_ROOT))
+
+from core import call_result_checking_model  # noqa: E402
+from result_check import DEFAULT_VOLATILE_REGIONS, TieredResultChecker  # noqa: E402
+
+DATASET_FILE = "dataset.json"
+
+# Synthetic end-state pairs: (case, label). The label is what the end state means for the task,
+# fixed by construction instead of by an LLM
+SYNTHETIC_CASES = (
+    ("identical", True),
+    ("clock_tick", True),
+    ("caret", True),
+    ("resized", True),
+    ("scrolled", True),
+    ("one_field_differs", False),
+    ("form_empty", False),
+    ("error_banner", False),
+    ("modal_dialog", False),
+    ("other_page", False),
+)
+
+
+def _synthetic_page(rng: random.Random, values: list, scroll: int = 0, clock: str = "10:24", caret: bool = False, size: tuple = (1920, 1080)):
+    from PIL import Image, ImageDraw, ImageFont
+
+    width, height = size
+    font = ImageFont.load_default(size=16)
+    image = Image.new("RGB", size, (246, 247, 249))
+    draw = ImageDraw.Draw(image)
+    # Page content first, then the desktop top panel and browser toolbar on top of it
+    y0 = 140 - scroll
+    for row, value in enumerate(values):
+        y = y0 + row * 70
+        draw.text((220, y), f"Field {row + 1}", fill=(60, 60, 60), font=font)
+        draw.rectangle([420, y - 8, 900, y + 28], outline=(170, 175, 185), fill=(255, 255, 255))
+        draw.text((432, y), value, fill=(20, 20, 20), font=font)
+        if caret and row == len(values) - 1:
+            caret_x = 432 + int(draw.textlength(value, font=font)) + 2
+            draw.line([caret_x, y - 2, caret_x, y + 20], fill=(0, 0, 0), width=1)
+    for line in range(12):
+        y = y0 + len(values) * 70 + 30 + line * 26
+        draw.text((220, y), " ".join(rng.choice(("benefits", "member", "claims", "plan", "details", "coverage", "download", "portal"))
+                                     for _ in range(14)), fill=(80, 80, 80), font=font)
+    draw.rectangle([1000, y0 - 8, 1700, y0 + 400], outline=(200, 204, 210), fill=(236, 240, 246))
+    draw.rectangle([0, 0, width, 36], fill=(30, 30, 30))
+    draw.text((width // 2 - 24, 9), clock, fill=(240, 240, 240), font=font)
+    for idx in range(4):
+        draw.ellipse([width - 150 + idx * 32, 10, width - 134 + idx * 32, 26], fill=(200, 200, 200))
+    draw.rectangle([0, 36, width, 100], fill=(222, 225, 230))
+    draw.rectangle([300, 50, 1620, 86], fill=(255, 255, 255), outline=(180, 180, 180))
+    draw.text((312, 58), "https://portal.example.com/benefits", fill=(40, 40, 40), font=font)
+    return image
+
+
+def build_synthetic_dataset(dataset_dir: str, pages: int = 10, seed: int = 0) -> list:
+    """
+    Write a labelled dataset of synthetic portal screenshots: for each page, one expected end
+    state and one current frame per SYNTHETIC_CASES entry.
+    """
+    from PIL import ImageDraw, ImageFont
+
+    dir_path = pathlib.Path(dataset_dir)
+    dir_path.mkdir(parents=True, exist_ok=True)
+    entries = []
+    for page in range(pages):
+        rng = random.Random(seed * 1000 + page)
+        values = [f"E0{rng.randrange(1000000, 9999999)}", rng.choice(("Jane Doe", "John Smith", "Alex Kim")),
+                  f"{rng.randrange(1, 12):02d}/{rng.randrange(1, 28):02d}/19{rng.randrange(50, 99)}", "Benefits details"]
+        expected = _synthetic_page(random.Random(page), values)
+        expected_name = f"expected_{page:03d}.png"
+        expected.save(dir_path / expected_name)
+        for case, label in SYNTHETIC_CASES:
+            if case == "identical":
+                current = _synthetic_page(random.Random(page), values)
+            elif case == "clock_tick":
+                current = _synthetic_page(random.Random(page), values, clock="10:25")
+            elif case == "caret":
+                current = _synthetic_page(random.Random(page), values, caret=True)
+            elif case == "resized":
+                current = expected.resize((1440, 810))
+            elif case == "scrolled":
+                current = _synthetic_page(random.Random(page), values, scroll=120)
+            elif case == "one_field_differs":
+                changed = list(values)
+                changed[0] = changed[0][:-1] + str((int(changed[0][-1]) + 1) % 10)
+                current = _synthetic_page(random.Random(page), changed)
+            elif case == "form_empty":
+                current = _synthetic_page(random.Random(page), ["", "", "", ""])
+            elif case == "error_banner":
+                current = _synthetic_page(random.Random(page), values)
+                draw = ImageDraw.Draw(current)
+                draw.rectangle([200, 104, 1720, 130], fill=(250, 220, 220))
+                draw.text((212, 108), "Session expired. Please sign in again.", fill=(150, 20, 20), font=ImageFont.load_default(size=16))
+            elif case == "modal_dialog":
+                current = _synthetic_page(random.Random(page), values)
+                draw = ImageDraw.Draw(current)
+                draw.rectangle([0, 100, 1920, 1080], fill=(120, 120, 120))
+                draw.rectangle([660, 380, 1260, 700], fill=(255, 255, 255))
+                draw.text((690, 410), "Download benefits details?", fill=(20, 20, 20), font=ImageFont.load_default(size=16))
+            else:
+                current = _synthetic_page(random.Random(page + 7919), ["", ""], scroll=-300)
+            current_name = f"current_{page:03d}_{case}.png"
+            current.save(dir_path / current_name)
+            entries.append({"task_description": f"Fill in and submit the benefits form ({case})", "expected": expected_name,
+                            "current": current_name, "label": label})
+    with open(dir_path / DATASET_FILE, "w", encoding="utf-8") as f:
+        json.dump(entries, f, indent=2)
+    return entries
+
+
+def evaluate(dataset_dir: str, checker: TieredResultChecker, save_labels: bool = False) -> dict:
+    dir_path = pathlib.Path(dataset_dir).resolve()
+    with open(dir_path / DATASET_FILE, "r", encoding="utf-8") as f:
+        entries = json.load(f)
+
+    # rows: local decision, columns: LLM label
+    confusion = {decision: {True: 0, False: 0} for decision in ("pass", "fail", "escalate")}
+    local_time = 0.0
+    labelled = False
+    for entry in entries:
+        expected_b64 = base64.b64encode((dir_path / entry["expected"]).read_bytes()).decode("ascii")
+        current_b64 = base64.b64encode((dir_path / entry["current"]).read_bytes()).decode("ascii")
+        if "label" not in entry:
+            entry["label"] = bool(call_result_checking_model(entry["task_description"], expected_b64, current_b64).get("result"))
+            labelled = True
+        start = time.perf_counter()
+        local = checker.local_check(expected_b64, current_b64)
+        local_time += time.perf_counter() - start
+        confusion[local["decision"]][bool(entry["label"])] += 1
+
+    if save_labels and labelled:
+        with open(dir_path / DATASET_FILE, "w", encoding="utf-8") as f:
+            json.dump(entries, f, indent=2)
+
+    total = len(entries)
+    decided = total - sum(confusion["escalate"].values())
+    correct = confusion["pass"][True] + confusion["fail"][False]
+    return {
+        "entries": total,
+        "local_decided": decided,
+        "local_rate": decided / total if total else 0.0,
+        "escalated": total - decided,
+        "local_accuracy": correct / decided if decided else 0.0,
+        "false_pass": confusion["pass"][False],
+        "false_fail": confusion["fail"][True],
+        "confusion": confusion,
+        "mean_local_ms": 1000.0 * local_time / total if total else 0.0,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local result-check tier vs LLM labels")
+    parser.add_argument("dataset")
+    parser.add_argument("--pass-ssim", type=float, default=0.995)
+    parser.add_argument("--pass-max-changed", type=float, default=0.0)
+    parser.add_argument("--fail-ssim", type=float, default=0.60)
+    parser.add_argument("--fail-min-changed", type=float, default=0.30)
+    parser.add_argument("--fail-locally", action=argparse.BooleanOptionalAction, default=True, help="Let the local tier fail clear mismatches")
+    parser.add_argument("--build-synthetic", type=int, metavar="PAGES", help="First write a synthetic labelled dataset with this many pages to DATASET")
+    parser.add_argument("--mask", action="append", default=[], help="Volatile region x1,y1,x2,y2 (normalized); repeatable")
+    parser.add_argument("--save-labels", action="store_true")
+    args = parser.parse_args()
+
+    if args.build_synthetic:
+        build_synthetic_dataset(args.dataset, pages=args.build_synthetic)
+    regions = [tuple(float(v) for v in region.split(",")) for region in args.mask]
+    checker = TieredResultChecker(pass_ssim=args.pass_ssim, pass_max_changed=args.pass_max_changed, fail_ssim=args.fail_ssim,
+                                  fail_min_changed=args.fail_min_changed, fail_locally=args.fail_locally,
+                                  volatile_regions=regions or DEFAULT_VOLATILE_REGIONS)
+    report = evaluate(args.dataset, checker, save_labels=args.save_labels)
+    print("=== Tiered Result Check ===")
+    print(f"Entries:         {report['entries']}")
+    print(f"Decided locally: {report['local_decided']} ({report['local_rate']:.1%}), escalated to LLM: {report['escalated']}")
+    print(f"Local accuracy:  {report['local_accuracy']:.1%} (false pass {report['false_pass']}, false fail {report['false_fail']})")
+    print(f"Local tier cost: {report['mean_local_ms']:.1f} ms / check")
+    print("Confusion (local decision x LLM label):")
+    print(f"{'':>10} {'llm=true':>9} {'llm=false':>9}")
+    for decision, row in report["confusion"].items():
+        print(f"{decision:>10} {row[True]:>9} {row[False]:>9}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+"""
+Measure how much pipelining the docker step loop saves per trajectory.
+
+Replays recorded trajectories through `demo_docker_cua_step_automation` twice, once with
+`pipelined=False` (every stage awaited in order) and once with `pipelined=True` (disk writes,
+rc/log retrieval and visualization overlapped with the next capture), and compares the
+mean wall time per trajectory run. The wall time includes draining the background stages
+when the step ends, which per-iteration latencies leave out; both are reported.
+
+Usage:
+    python -m benchmarks.step_loop_overlap ./data/trajectories/step_1 --exec-latency 0.3 --model-latency 0.5
+"""
+import argparse
+import asyncio
+import pathlib
+import sys
+
+REPO_ROOT = pathlib.Path(__file__).resolve().parent.parent
+if str(REPO_ROOT) not in sys.path:
+    sys.path.insert(0, str(REPO_ROOT))
+
+import replay  # noqa: E402
+from stub_server import Distribution, LatencyModel  # noqa: E402
+
+
+async def compare_modes(trajectory_dirs, exec_latency: float, model_latency: str, repeats: int) -> dict:
+    # A realistic inference delay gives the background stages something to hide behind
+    latency = LatencyModel(Distribution.parse(model_latency))
+    wall_means, iteration_means = {}, {}
+    for pipelined in (False, True):
+        wall_times, per_iteration = [], []
+        for _ in range(repeats):
+            for trajectory_dir in trajectory_dirs:
+                result = await replay.replay_trajectory(trajectory_dir, exec_latency=exec_latency, loop_kwargs={"pipelined": pipelined}, model_latency=latency)
+                wall_times.append(result["wall_time_s"])
+                per_iteration.extend(result["loop"]["iteration_times_s"])
+        wall_means[pipelined] = sum(wall_times) / len(wall_times) if wall_times else 0.0
+        iteration_means[pipelined] = sum(per_iteration) / len(per_iteration) if per_iteration else 0.0
+
+    sequential, pipelined = wall_means[False], wall_means[True]
+    return {
+        "sequential_wall_s": sequential,
+        "pipelined_wall_s": pipelined,
+        "saved_s": sequential - pipelined,
+        "saved_pct": 100.0 * (sequential - pipelined) / sequential if sequential else 0.0,
+        "sequential_iteration_s": iteration_means[False],
+        "pipelined_iteration_s": iteration_means[True],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Sequential vs pipelined step loop latency")
+    parser.add_argument("trajectories", nargs="+")
+    parser.add_argument("--exec-latency", type=float, default=0.3)
+    parser.add_argument("--model-latency", default="0.5")
+    parser.add_argument("--repeats", type=int, default=3)
+    args = parser.parse_args()
+
+    report = asyncio.run(compare_modes(args.trajectories, args.exec_latency, args.model_latency, args.repeats))
+    print("=== Step Loop Overlap ===")
+    print(f"Sequential: {report['sequential_wall_s']:.3f}s / trajectory ({report['sequential_iteration_s']:.3f}s / iteration)")
+    print(f"Pipelined:  {report['pipelined_wall_s']:.3f}s / trajectory ({report['pipelined_iteration_s']:.3f}s / iteration)")
+    print(f"Saved:      {report['saved_s']:.3f}s / trajectory ({report['saved_pct']:.1f}%)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+"""
+Concurrency check for visualize_actions_on_image / visualize_actions_batch.
+
+Renders a batch of frames once sequentially (the reference), then again from a thread pool via
+visualize_actions_batch and from concurrent asyncio tasks through run_in_executor (the way the
+docker step loop renders in the background). Every concurrent rendering must be pixel-identical
+to its sequential reference; any shared figure state would mix markers or titles between frames.
+Exits non-zero on a mismatch and prints the wall time of each mode.
+
+Usage:
+    python -m benchmarks.visualization_concurrency --frames 12 --workers 4 --dpi 100
+"""
+import argparse
+import asyncio
+import functools
+import pathlib
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from PIL import Image
+
+REPO_ROOT = pathlib.Path(__file__).resolve().parent.parent
+if str(REPO_ROOT) not in sys.path:
+    sys.path.insert(0, str(REPO_ROOT))
+
+from action_parser import parse_action_to_structure_output  # noqa: E402
+from benchmarks.bench_pipeline import FACTOR, _scaled_corpus, _synthetic_screenshot  # noqa: E402
+from utils import visualize_actions_batch, visualize_actions_on_image  # noqa: E402
+
+
+def build_jobs(frames: int, size: tuple, dpi: int, out_dir: pathlib.Path, tag: str) -> list:
+    width, height = size
+    image = _synthetic_screenshot(width, height)
+    corpus = _scaled_corpus(width, height)
+    jobs = []
+    for idx in range(frames):
+        # Each frame gets different actions and a different title so cross-talk shows up in the pixels
+        actions = parse_action_to_structure_output(corpus[idx % len(corpus)], FACTOR, height, width)
+        jobs.append({"image": image, "structured_actions": actions, "output_path": str(out_dir / tag / f"frame_{idx:03d}.png"),
+                     "title": f"Frame {idx}", "dpi": dpi})
+    return jobs
+
+
+async def render_with_tasks(jobs: list, workers: int) -> None:
+    loop = asyncio.get_running_loop()
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="visualize") as executor:
+        await asyncio.gather(*(loop.run_in_executor(executor, functools.partial(visualize_actions_on_image, **job)) for job in jobs))
+
+
+def _pixels(path: str) -> np.ndarray:
+    with Image.open(path) as image:
+        return np.asarray(image)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Concurrent visualization check")
+    parser.add_argument("--frames", type=int, default=12)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--dpi", type=int, default=100)
+    parser.add_argument("--size", default="1920,1080", help="Screenshot width,height")
+    args = parser.parse_args()
+    size = tuple(int(v) for v in args.size.split(","))
+
+    with tempfile.TemporaryDirectory(prefix="visualization_concurrency_") as tmp:
+        out_dir = pathlib.Path(tmp)
+        timings = {}
+
+        reference = build_jobs(args.frames, size, args.dpi, out_dir, "sequential")
+        start = time.perf_counter()
+        for job in reference:
+            visualize_actions_on_image(**job)
+        timings["sequential"] = time.perf_counter() - start
+
+        batch = build_jobs(args.frames, size, args.dpi, out_dir, "batch")
+        start = time.perf_counter()
+        visualize_actions_batch(batch, max_workers=args.workers)
+        timings["thread batch"] = time.perf_counter() - start
+
+        tasks = build_jobs(args.frames, size, args.dpi, out_dir, "asyncio")
+        start = time.perf_counter()
+        asyncio.run(render_with_tasks(tasks, args.workers))
+        timings["asyncio tasks"] = time.perf_counter() - start
+
+        mismatches = 0
+        for mode, jobs in (("thread batch", batch), ("asyncio tasks", tasks)):
+            for ref_job, job in zip(reference, jobs):
+                if not np.array_equal(_pixels(ref_job["output_path"]), _pixels(job["output_path"])):
+                    mismatches += 1
+                    print(f"MISMATCH ({mode}): {pathlib.Path(job['output_path']).name}")
+
+    print(f"=== Visualization Concurrency ({args.frames} frames, {args.workers} workers, {size[0]}x{size[1]}, dpi {args.dpi}) ===")
+    for mode, seconds in timings.items():
+        print(f"{mode:<14} {seconds:>7.2f}s  ({timings['sequential'] / seconds:.2f}x)")
+    print("All concurrent renderings match the sequential ones" if not mismatches else f"{mismatches} mismatching frame(s)")
+    return 1 if mismatches else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
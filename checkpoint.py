@@ -0,0 +1,151 @@
+import asyncio
+import json
+import os
+import pathlib
+from typing import Awaitable, Callable, List, Tuple
+
+from utils import execute_pyautogui_code
+
+CHECKPOINT_FILE = "checkpoint.json"
+
+
+class SessionCheckpoint:
+    """
+    Per-step progress of a multi-step task, persisted after every completed step.
+
+    For each completed step it keeps the PyAutoGUI snippets that were executed, in order.
+    Resuming replays those snippets instead of asking the model again. Only steps that
+    completed are recorded; each step loop starts from a fresh AutomationState, so a step's
+    final state is not needed to resume and is not stored.
+
+    On disk a checkpoint is a directory with `checkpoint.json`:
+
+        {
+            "instructions": ["...", "..."],
+            "completed_step": 2,
+            "steps": {"1": {"instruction": "...", "snippets": ["import pyautogui ..."]}}
+        }
+
+    Args:
+        checkpoint_dir: Directory holding checkpoint.json (created on first save)
+        instructions: Step instructions of the task; a checkpoint recorded for a different list
+                      is ignored so a stale run is never fast-forwarded
+    """
+
+    def __init__(self, checkpoint_dir: str, instructions: List[str]):
+        self.path = pathlib.Path(checkpoint_dir).resolve() / CHECKPOINT_FILE
+        self.instructions = list(instructions)
+        self.completed_step = 0
+        self.steps = {}
+        self._load()
+
+    def _load(self) -> None:
+        if not self.path.exists():
+            return
+        with open(self.path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        if data.get("instructions") != self.instructions:
+            print(f"Ignoring checkpoint {self.path}: it was recorded for different instructions")
+            return
+        self.completed_step = data.get("completed_step", 0)
+        self.steps = {int(k): v for k, v in data.get("steps", {}).items()}
+
+    def save(self) -> None:
+        os.makedirs(self.path.parent, exist_ok=True)
+        data = {
+            "instructions": self.instructions,
+            "completed_step": self.completed_step,
+            "steps": {str(k): v for k, v in sorted(self.steps.items())},
+        }
+        # Write then rename so a crash mid-save never leaves a truncated checkpoint
+        tmp_path = self.path.with_suffix(".json.tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f)
+        os.replace(tmp_path, self.path)
+
+    def record_step(self, step_idx: int, snippets: List[str]) -> None:
+        """Mark `step_idx` (1-based) complete and persist it."""
+        self.steps[step_idx] = {
+            "instruction": self.instructions[step_idx - 1],
+            "snippets": list(snippets),
+        }
+        self.completed_step = max(self.completed_step, step_idx)
+        self.save()
+
+    def snippets(self, step_idx: int) -> List[str]:
+        return self.steps.get(step_idx, {}).get("snippets", [])
+
+    def reset(self) -> None:
+        self.completed_step = 0
+        self.steps = {}
+        if self.path.exists():
+            self.path.unlink()
+
+
+async def replay_snippet_local(code: str) -> Tuple[bool, str]:
+    """Run a cached snippet on the local display."""
+    return await asyncio.to_thread(execute_pyautogui_code, code)
+
+
+async def replay_snippet_docker(computer, code: str, script_base: str = "/tmp/replay_snippet") -> Tuple[bool, str]:
+    """Run a cached snippet inside the container with the same wrapper as the step loop."""
+    await computer.interface.write_text(f"{script_base}.py", code)
+    await computer.interface.run_command(
+        f"bash -lc 'timeout -s TERM -k 5s 15s python3 {script_base}.py > {script_base}.log 2>&1; echo $? > {script_base}.rc; pkill -f xclip || true; pkill -f xsel || true'"
+    )
+    rc_text = (await computer.interface.read_text(f"{script_base}.rc")).strip()
+    log_text = await computer.interface.read_text(f"{script_base}.log")
+    return rc_text == "0", log_text
+
+
+async def run_steps_with_checkpoint(
+    instructions: List[str],
+    checkpoint: SessionCheckpoint,
+    run_step: Callable[[str, int], Awaitable[Tuple[bool, List[str]]]],
+    replay_snippet: Callable[[str], Awaitable[Tuple[bool, str]]],
+    settle_time: float = 1.0,
+) -> dict:
+    """
+    Run step instructions in order, fast-forwarding through steps the checkpoint already has.
+
+    Completed steps are replayed from their cached snippets (no model calls); the first
+    incomplete step and everything after it run normally and are checkpointed as they finish.
+    If a replayed snippet fails, the UI is no longer where the checkpoint says it is, so that
+    step and the rest run live again. A live step that does not complete (iterations used up,
+    stopped early) ends the run without being checkpointed, so a rerun starts again from it;
+    exceptions from `run_step` propagate the same way.
+
+    Args:
+        instructions: Step instructions (1-based step index = position + 1)
+        checkpoint: SessionCheckpoint for this task
+        run_step: Async callable (instruction, step_idx) -> (completed, executed snippets)
+        replay_snippet: Async callable executing one cached snippet -> (success, output)
+        settle_time: Seconds to wait after each replayed snippet
+
+    Returns:
+        dict: {"replayed_steps", "executed_steps", "replayed_snippets", "incomplete_step"}
+              ("incomplete_step" is the step the run stopped at, or None)
+    """
+    replayed_steps, executed_steps, replayed_snippets = [], [], 0
+    for step_idx, instruction in enumerate(instructions, 1):
+        if step_idx <= checkpoint.completed_step:
+            print(f"=== Step {step_idx} fast-forwarded from checkpoint ===")
+            ok = True
+            for code in checkpoint.snippets(step_idx):
+                ok, output = await replay_snippet(code)
+                replayed_snippets += 1
+                if not ok:
+                    print(f"Replay of step {step_idx} failed, re-running it live: {output}")
+                    break
+                await asyncio.sleep(settle_time)
+            if ok:
+                replayed_steps.append(step_idx)
+                continue
+            checkpoint.completed_step = step_idx - 1
+        completed, snippets = await run_step(instruction, step_idx)
+        executed_steps.append(step_idx)
+        if not completed:
+            print(f"Step {step_idx} did not complete; stopping without checkpointing it")
+            return {"replayed_steps": replayed_steps, "executed_steps": executed_steps, "replayed_snippets": replayed_snippets, "incomplete_step": step_idx}
+        checkpoint.record_step(step_idx, snippets)
+    return {"replayed_steps": replayed_steps, "executed_steps": executed_steps, "replayed_snippets": replayed_snippets, "incomplete_step": None}
@@ -1,57 +1,323 @@
+import asyncio
 import os
 from openai import OpenAI
-from prompts.prompts import COMPUTER_USE_DOUBAO
+from prompts.prompts import COMPUTER_USE_DOUBAO_STATIC, COMPUTER_USE_DOUBAO_TASK
+from prompts.prompts import COMPUTER_USE_DOUBAO_MULTI_ACTION_STATIC, COMPUTER_USE_DOUBAO_MULTI_ACTION_TASK
 from prompts.prompts import RESULT_CHECKING_WITH_IMAGES_PROMPT
 from prompts.prompts import CODE_INTEGRATION_PROMPT
-from typing import List
+from request_policy import get_request_policy
+from endpoint_pool import EndpointPool
+from grounding_batcher import GroundingBatcher
+from action_parser import get_timing_profile
+from typing import List, NamedTuple, Optional, Union
+import base64
 import glob
 import pathlib
 import json
 import re
+from collections import deque
+import struct
+import sys
+import threading
+from io import BytesIO
  
 
 
+class ActionTurn(NamedTuple):
+    """One recorded model turn: its thought and the action(s) it executed."""
+    thought: str
+    action_strs: tuple
+
+    @property
+    def action_str(self) -> str:
+        # Blank-line separated, the way the model emits several actions
+        return "\n\n".join(self.action_strs)
+
+
 class AutomationState:
-    def __init__(self, instruction: str, language: str = "English"):
+    """
+    Short per-session history fed back to the grounding model.
+
+    Kept compact because a fleet holds one per concurrent session: the previous frame is stored
+    as the raw PNG bytes (base64 is only produced when a request is built) and the turns live
+    in a bounded deque of tuples.
+    """
+
+    __slots__ = ("instruction", "language", "multi_action", "max_history", "actions", "prev_image_bytes")
+
+    def __init__(self, instruction: str, language: str = "English", multi_action: bool = False, max_history: int = 2):
         self.instruction = instruction
         self.language = language
-        self.prev_image_b64 = None
-        # store last two actions as list of dicts: {"thought": str, "action_str": str}
-        self.actions = []
+        # multi_action lets the model emit several actions per turn (COMPUTER_USE_DOUBAO_MULTI_ACTION)
+        self.multi_action = multi_action
+        # Number of past turns kept; anything beyond the last two is only used for budgeted summaries
+        self.max_history = max(2, max_history)
+        self.prev_image_bytes: Optional[bytes] = None
+        self.actions: deque = deque(maxlen=self.max_history)
+
+    @property
+    def prev_image_b64(self) -> Optional[str]:
+        if self.prev_image_bytes is None:
+            return None
+        return base64.b64encode(self.prev_image_bytes).decode("ascii")
+
+    @prev_image_b64.setter
+    def prev_image_b64(self, value: Optional[str]):
+        self.prev_image_bytes = base64.b64decode(value) if value else None
+
+    def add_step(self, before_image_b64: Union[str, bytes], thought: str, action_str: str):
+        self.add_batch(before_image_b64, thought, [action_str])
+
+    def add_batch(self, before_image_b64: Union[str, bytes], thought: str, action_strs: List[str]):
+        """
+        Record one model turn that executed several actions (blank-line separated, as the model emits them).
+        The frame may be given as base64 or as raw PNG bytes.
+        """
+        if isinstance(before_image_b64, (bytes, bytearray)):
+            self.prev_image_bytes = bytes(before_image_b64)
+        else:
+            self.prev_image_b64 = before_image_b64
+        self.actions.append(ActionTurn(thought or "", tuple(a for a in action_strs if a) or ("",)))
+
+    def copy(self) -> "AutomationState":
+        # Frames and turns are immutable, so the clone can share them
+        clone = AutomationState(self.instruction, self.language, self.multi_action, self.max_history)
+        clone.prev_image_bytes = self.prev_image_bytes
+        clone.actions.extend(self.actions)
+        return clone
+
+    def memory_usage(self) -> dict:
+        """
+        Approximate bytes held by this session's state.
+
+        Returns:
+            dict: {"image_bytes", "history_bytes", "total_bytes", "turns"}
+        """
+        image_bytes = sys.getsizeof(self.prev_image_bytes) if self.prev_image_bytes is not None else 0
+        history_bytes = sys.getsizeof(self.actions)
+        for turn in self.actions:
+            history_bytes += sys.getsizeof(turn) + sys.getsizeof(turn.thought) + sys.getsizeof(turn.action_strs)
+            history_bytes += sum(sys.getsizeof(a) for a in turn.action_strs)
+        text_bytes = sys.getsizeof(self.instruction) + sys.getsizeof(self.language)
+        return {
+            "image_bytes": image_bytes,
+            "history_bytes": history_bytes + text_bytes,
+            "total_bytes": image_bytes + history_bytes + text_bytes,
+            "turns": len(self.actions),
+        }
 
-    def add_step(self, before_image_b64: str, thought: str, action_str: str):
-        self.prev_image_b64 = before_image_b64
-        self.actions.append({"thought": thought or "", "action_str": action_str or ""})
-        if len(self.actions) > 2:
-            self.actions = self.actions[-2:]
 
+def sessions_memory_usage(states: List[AutomationState]) -> dict:
+    """Aggregate AutomationState.memory_usage over a fleet of sessions."""
+    totals = [state.memory_usage()["total_bytes"] for state in states]
+    return {
+        "sessions": len(totals),
+        "total_bytes": sum(totals),
+        "mean_bytes_per_session": sum(totals) / len(totals) if totals else 0.0,
+        "max_bytes_per_session": max(totals, default=0),
+    }
 
-def build_messages_with_state(state: AutomationState, current_image_b64: str):
-    messages = [
-        {
-            "role": "user",
-            "content": COMPUTER_USE_DOUBAO.format(
-                instruction=state.instruction,
-                language=state.language
-            )
-        }
-    ]
+
+class MessageBudget:
+    """
+    Controls how much context a grounding request carries.
+
+    Args:
+        prev_image: How to send the previous frame: "full", "downscale", "crop" (full-resolution
+                    region around the last action's coordinates) or "none"
+        prev_image_max_pixels: Pixel cap for "downscale" (aspect ratio is kept)
+        crop_fraction: (width, height) of the "crop" region as a fraction of the frame
+        recent_actions: Number of most recent turns sent verbatim as assistant messages
+        summarize_older: Send older turns (up to AutomationState.max_history) as one compact text line
+        summary_max_chars: Truncate each summarized action to this many characters
+        max_tokens: Optional total budget; when exceeded the builder degrades step by step
+                    (crop the previous image, drop it, drop the summary, fewer recent turns)
+    """
+
+    PREV_IMAGE_MODES = ("full", "downscale", "crop", "none")
+
+    def __init__(self,
+                 prev_image: str = "full",
+                 prev_image_max_pixels: int = 640 * 400,
+                 crop_fraction: tuple = (0.35, 0.35),
+                 recent_actions: int = 2,
+                 summarize_older: bool = False,
+                 summary_max_chars: int = 80,
+                 max_tokens: Optional[int] = None):
+        if prev_image not in self.PREV_IMAGE_MODES:
+            raise ValueError(f"Unknown prev_image mode: {prev_image}, expected one of {self.PREV_IMAGE_MODES}")
+        self.prev_image = prev_image
+        self.prev_image_max_pixels = prev_image_max_pixels
+        self.crop_fraction = crop_fraction
+        self.recent_actions = recent_actions
+        self.summarize_older = summarize_older
+        self.summary_max_chars = summary_max_chars
+        self.max_tokens = max_tokens
+
+    def replace(self, **changes) -> "MessageBudget":
+        params = dict(self.__dict__)
+        params.update(changes)
+        return MessageBudget(**params)
+
+
+# "full" keeps the original two-image request content
+MESSAGE_BUDGET_PRESETS = {
+    "full": MessageBudget(),
+    "balanced": MessageBudget(prev_image="downscale", recent_actions=2, summarize_older=True),
+    "compact": MessageBudget(prev_image="crop", recent_actions=1, summarize_older=True),
+    "minimal": MessageBudget(prev_image="none", recent_actions=1, summarize_older=True),
+}
+
+# Qwen2.5-VL merges 2x2 patches of 14px, i.e. one visual token per 28x28 block
+_IMAGE_TOKEN_BLOCK = 28
+_MESSAGE_OVERHEAD_TOKENS = 4
+
+
+def _image_size_from_b64(image_b64: str) -> tuple:
+    # PNG keeps width/height in the IHDR chunk right after the signature; avoid decoding the whole image
+    head = base64.b64decode(image_b64[:44] + "=" * (-len(image_b64[:44]) % 4))
+    if head[:8] == b"\x89PNG\r\n\x1a\n" and len(head) >= 24:
+        return struct.unpack(">II", head[16:24])
+    from utils import get_size_from_base64
+    return get_size_from_base64(image_b64)
+
+
+def estimate_image_tokens(width: int, height: int) -> int:
+    """Visual tokens for an image after the model's smart resize (one token per 28x28 block)."""
+    from action_parser import smart_resize
+    h_bar, w_bar = smart_resize(height, width, factor=_IMAGE_TOKEN_BLOCK)
+    return (h_bar // _IMAGE_TOKEN_BLOCK) * (w_bar // _IMAGE_TOKEN_BLOCK)
+
+
+def estimate_text_tokens(text: str) -> int:
+    """Rough text token count (~4 characters per token)."""
+    return max(1, len(text) // 4)
+
+
+def estimate_message_tokens(messages: list) -> List[int]:
+    """
+    Estimate prompt tokens per message before sending.
+
+    Args:
+        messages: Chat messages as built by build_messages_with_state / build_messages_with_budget
+
+    Returns:
+        List[int]: Estimated tokens for each message, in order
+    """
+    counts = []
+    for message in messages:
+        content = message["content"]
+        tokens = _MESSAGE_OVERHEAD_TOKENS
+        if isinstance(content, str):
+            tokens += estimate_text_tokens(content)
+        else:
+            for part in content:
+                if part["type"] == "text":
+                    tokens += estimate_text_tokens(part["text"])
+                elif part["type"] == "image_url":
+                    url = part["image_url"]["url"]
+                    width, height = _image_size_from_b64(url.split(",", 1)[-1])
+                    tokens += estimate_image_tokens(width, height)
+        counts.append(tokens)
+    return counts
+
+
+_BOX_PATTERN = re.compile(r"start_box='\[([^\]]+)\]'")
+
+
+def get_last_action_point(state: AutomationState) -> Optional[tuple]:
+    """Normalized (x, y) center of the most recent action that targeted a point, or None."""
+    for turn in reversed(state.actions):
+        for action_str in reversed(turn.action_strs):
+            match = _BOX_PATTERN.search(action_str)
+            if match:
+                x1, y1, x2, y2 = [float(v) for v in match.group(1).split(",")]
+                return (x1 + x2) / 2, (y1 + y2) / 2
+    return None
+
+
+def _encode_png_b64(image) -> str:
+    buffered = BytesIO()
+    image.save(buffered, format="PNG")
+    return base64.b64encode(buffered.getvalue()).decode("ascii")
+
+
+def _budget_prev_image(state: AutomationState, budget: MessageBudget) -> Optional[tuple]:
+    """Returns (label, image_b64) for the previous frame under `budget`, or None."""
+    if not state.prev_image_bytes or budget.prev_image == "none":
+        return None
+    if budget.prev_image == "full":
+        return "Previous image:", state.prev_image_b64
+
+    from PIL import Image
+    image = Image.open(BytesIO(state.prev_image_bytes))
+    width, height = image.size
+    if budget.prev_image == "crop":
+        point = get_last_action_point(state)
+        if point is not None:
+            crop_w, crop_h = int(width * budget.crop_fraction[0]), int(height * budget.crop_fraction[1])
+            left = min(max(0, int(point[0] * width - crop_w / 2)), width - crop_w)
+            top = min(max(0, int(point[1] * height - crop_h / 2)), height - crop_h)
+            region = image.crop((left, top, left + crop_w, top + crop_h))
+            label = (f"Previous image (crop around the last action, x {left / width:.2f}-{(left + crop_w) / width:.2f}, "
+                     f"y {top / height:.2f}-{(top + crop_h) / height:.2f} of the screen):")
+            return label, _encode_png_b64(region)
+        # Nothing to crop around yet; fall back to a downscaled frame
+    if width * height > budget.prev_image_max_pixels:
+        scale = (budget.prev_image_max_pixels / (width * height)) ** 0.5
+        image = image.resize((max(1, int(width * scale)), max(1, int(height * scale))))
+    return "Previous image (downscaled):", _encode_png_b64(image)
+
+
+def _summarize_actions(turns: list, max_chars: int) -> str:
+    parts = []
+    for turn in turns:
+        for action_str in turn.action_strs:
+            parts.append(action_str if len(action_str) <= max_chars else action_str[: max_chars - 3] + "...")
+    return "Earlier actions (oldest first): " + "; ".join(parts)
+
+
+def build_task_prefix(instruction: str, language: str = "English", multi_action: bool = False) -> list:
+    """
+    Leading message of every grounding request: one user message with the static
+    role/action-space prompt followed by the per-task note and instruction.
+
+    The static text comes first and is byte-identical across all steps and tasks (per action
+    mode), so the rendered prompt of every request starts with the same tokens and inference
+    servers with prefix/KV caching can reuse them. Per-step history and images always come after
+    this message.
+    """
+    static_prompt = COMPUTER_USE_DOUBAO_MULTI_ACTION_STATIC if multi_action else COMPUTER_USE_DOUBAO_STATIC
+    task_prompt = COMPUTER_USE_DOUBAO_MULTI_ACTION_TASK if multi_action else COMPUTER_USE_DOUBAO_TASK
+    return [{"role": "user", "content": static_prompt + "\n\n" + task_prompt.format(instruction=instruction, language=language)}]
+
+
+def _build_budgeted(state: AutomationState, current_image_b64: str, budget: MessageBudget) -> list:
+    messages = build_task_prefix(state.instruction, state.language, state.multi_action)
+    turns = list(state.actions)
+    recent = turns[-budget.recent_actions:] if budget.recent_actions > 0 else []
+    older = turns[: len(turns) - len(recent)]
+    # Compact text summary of turns that no longer get their own message
+    if budget.summarize_older and older:
+        messages.append({"role": "user", "content": _summarize_actions(older, budget.summary_max_chars)})
     # Optional previous image (first image)
-    if state.prev_image_b64:
+    prev = _budget_prev_image(state, budget)
+    if prev is not None:
+        label, prev_b64 = prev
         messages.append({
             "role": "user",
             "content": [
-                {"type": "text", "text": "Previous image:"},
+                {"type": "text", "text": label},
                 {"type": "image_url", "image_url": {
-                    "url": f"data:image/png;base64,{state.prev_image_b64}"
+                    "url": f"data:image/png;base64,{prev_b64}"
                 }},
             ]
         })
-    # Last two actions as text only (no images)
-    for a in state.actions[-2:]:
+    # Recent actions as text only (no images)
+    for a in recent:
         messages.append({
             "role": "assistant",
-            "content": f"Thought: {a['thought']}\nAction: {a['action_str']}"
+            "content": f"Thought: {a.thought}\nAction: {a.action_str}"
         })
     # Current image (second image) - already resized to screen size by caller
     messages.append({
@@ -66,17 +332,205 @@ def build_messages_with_state(state: AutomationState, current_image_b64: str):
     return messages
 
 
+def build_messages_with_budget(state: AutomationState, current_image_b64: str, budget: Union[str, MessageBudget] = "full") -> list:
+    """
+    Build grounding messages under a token/pixel budget.
+
+    Args:
+        state: Automation state with instruction and history
+        current_image_b64: Current screenshot (base64 PNG)
+        budget: A MessageBudget or the name of a preset in MESSAGE_BUDGET_PRESETS
+                ("full" keeps the original two-image behavior)
+
+    Returns:
+        list: Chat messages; use estimate_message_tokens() to inspect their cost
+    """
+    if isinstance(budget, str):
+        budget = MESSAGE_BUDGET_PRESETS[budget]
+    messages = _build_budgeted(state, current_image_b64, budget)
+    if budget.max_tokens is None:
+        return messages
+
+    # Degrade until the estimate fits, cheapest information loss first
+    fallbacks = []
+    if budget.prev_image in ("full", "downscale"):
+        fallbacks.append(budget.replace(prev_image="crop"))
+    fallbacks.append(budget.replace(prev_image="none"))
+    fallbacks.append(budget.replace(prev_image="none", summarize_older=False))
+    for recent in range(budget.recent_actions - 1, -1, -1):
+        fallbacks.append(budget.replace(prev_image="none", summarize_older=False, recent_actions=recent))
+    for fallback in fallbacks:
+        if sum(estimate_message_tokens(messages)) <= budget.max_tokens:
+            break
+        messages = _build_budgeted(state, current_image_b64, fallback)
+    return messages
+
+
+def build_messages_with_state(state: AutomationState, current_image_b64: str):
+    return build_messages_with_budget(state, current_image_b64, "full")
+
+
+def _create_chat_completion(endpoint: str, client: OpenAI, **kwargs):
+    """
+    Issue a chat completion through the shared request policy for `endpoint`
+    (rate limiting, retries with backoff, deadline and optional hedging).
+    The policy owns retries, so clients are created with max_retries=0.
+    """
+    policy = get_request_policy(endpoint)
+    return policy.call(lambda timeout: client.chat.completions.create(timeout=timeout, **kwargs))
+
+
+_GROUNDING_POOL = None
+_GROUNDING_POOL_KEY = None
+_GROUNDING_CLIENTS = {}
+_GROUNDING_BATCHER = None
+_GROUNDING_LOCK = threading.Lock()
+
+
+def get_grounding_pool() -> EndpointPool:
+    """
+    Endpoint pool for the UI grounding model.
+
+    Reads a comma-separated list of replicas from TGI_BASE_URLS, falling back to the single
+    TGI_BASE_URL. The pool is rebuilt whenever those variables change. The routing strategy
+    comes from TGI_ROUTING ("least_outstanding" or "ewma"); with several replicas a background
+    health check runs every TGI_HEALTH_INTERVAL seconds (default 10).
+    """
+    global _GROUNDING_POOL, _GROUNDING_POOL_KEY
+    raw = os.environ.get("TGI_BASE_URLS") or os.environ["TGI_BASE_URL"]
+    strategy = os.environ.get("TGI_ROUTING") or "least_outstanding"
+    key = (raw, strategy)
+    with _GROUNDING_LOCK:
+        if _GROUNDING_POOL is None or _GROUNDING_POOL_KEY != key:
+            if _GROUNDING_POOL is not None:
+                _GROUNDING_POOL.stop_health_checks()
+            base_urls = [url.strip() for url in raw.split(",") if url.strip()]
+            _GROUNDING_POOL = EndpointPool(base_urls, strategy=strategy)
+            _GROUNDING_POOL_KEY = key
+            if len(base_urls) > 1:
+                _GROUNDING_POOL.start_health_checks(float(os.environ.get("TGI_HEALTH_INTERVAL") or 10.0))
+        return _GROUNDING_POOL
+
+
+def reset_grounding_pool() -> None:
+    """Drop the cached grounding endpoint pool (stopping its health checks); the next call rebuilds it from the environment."""
+    global _GROUNDING_POOL, _GROUNDING_POOL_KEY
+    with _GROUNDING_LOCK:
+        previous, _GROUNDING_POOL, _GROUNDING_POOL_KEY = _GROUNDING_POOL, None, None
+    if previous is not None:
+        previous.stop_health_checks()
+
+
+def _grounding_client(base_url: str) -> OpenAI:
+    # Reuse one client (and its connection pool) per replica
+    key = (base_url, os.environ["HF_TOKEN"])
+    with _GROUNDING_LOCK:
+        client = _GROUNDING_CLIENTS.get(key)
+        if client is None:
+            client = OpenAI(base_url=base_url, api_key=key[1], max_retries=0)
+            _GROUNDING_CLIENTS[key] = client
+        return client
+
+
+def _create_grounding_completion(**kwargs):
+    """
+    Chat completion against the grounding model. Every attempt (including retries made by
+    the "tgi" request policy) leases a replica from the endpoint pool.
+    """
+    pool = get_grounding_pool()
+
+    def attempt(timeout):
+        with pool.lease() as endpoint:
+            client = _grounding_client(endpoint.base_url)
+            return client.chat.completions.create(timeout=timeout, **kwargs)
+
+    return get_request_policy("tgi").call(attempt)
+
+
+def grounding_pool_capacity() -> int:
+    """
+    Requests the grounding replicas accept in flight: the replica count (TGI_BASE_URLS or
+    TGI_BASE_URL) times TGI_MAX_CONCURRENT_REQUESTS per replica (default 128, TGI's default).
+    """
+    raw = os.environ.get("TGI_BASE_URLS") or os.environ.get("TGI_BASE_URL") or ""
+    replicas = max(1, len([url for url in raw.split(",") if url.strip()]))
+    return replicas * int(os.environ.get("TGI_MAX_CONCURRENT_REQUESTS") or 128)
+
+
+def configure_grounding_batching(max_batch_size: int = 8, max_wait_ms: float = 20.0, max_workers: Optional[int] = None) -> GroundingBatcher:
+    """
+    Route grounding calls from concurrent sessions through a micro-batching dispatcher.
+
+    Args:
+        max_batch_size: Flush once this many requests are queued
+        max_wait_ms: Longest extra delay a request may spend waiting for batch-mates
+        max_workers: Most grounding requests in flight at once (defaults to grounding_pool_capacity())
+
+    Returns:
+        GroundingBatcher: The active batcher (its stats() reports batch sizes and queueing delay)
+    """
+    global _GROUNDING_BATCHER
+    batcher = GroundingBatcher(_create_grounding_completion, max_batch_size=max_batch_size, max_wait_ms=max_wait_ms,
+                               max_workers=max_workers or grounding_pool_capacity())
+    with _GROUNDING_LOCK:
+        previous, _GROUNDING_BATCHER = _GROUNDING_BATCHER, batcher
+    if previous is not None:
+        previous.close()
+    return batcher
+
+
+def disable_grounding_batching() -> None:
+    global _GROUNDING_BATCHER
+    with _GROUNDING_LOCK:
+        previous, _GROUNDING_BATCHER = _GROUNDING_BATCHER, None
+    if previous is not None:
+        previous.close()
+
+
+def get_grounding_batcher():
+    """
+    The active GroundingBatcher, or None when batching is off. Setting TGI_BATCH_MAX_SIZE
+    (and optionally TGI_BATCH_MAX_WAIT_MS) enables batching on first use.
+    """
+    if _GROUNDING_BATCHER is None and os.environ.get("TGI_BATCH_MAX_SIZE"):
+        configure_grounding_batching(
+            max_batch_size=int(os.environ["TGI_BATCH_MAX_SIZE"]),
+            max_wait_ms=float(os.environ.get("TGI_BATCH_MAX_WAIT_MS") or 20.0),
+        )
+    return _GROUNDING_BATCHER
+
+
 def call_ui_grounding_model_with_messages(messages) -> str:
-    client = OpenAI(
-        base_url=os.environ["TGI_BASE_URL"],
-        api_key=os.environ["HF_TOKEN"]
+    request = dict(
+        model="tgi",
+        messages=messages,
+        temperature=0.0,
+        max_tokens=400,
     )
-    chat_completion = client.chat.completions.create(
+    batcher = get_grounding_batcher()
+    if batcher is not None:
+        chat_completion = batcher.call(**request)
+    else:
+        chat_completion = _create_grounding_completion(**request)
+    return chat_completion.choices[0].message.content
+
+
+async def acall_ui_grounding_model_with_messages(messages) -> str:
+    """
+    Async variant for step loops sharing one event loop: the call runs off the loop, and
+    through the batcher when batching is enabled, so concurrent sessions can be batched.
+    """
+    request = dict(
         model="tgi",
         messages=messages,
         temperature=0.0,
         max_tokens=400,
     )
+    batcher = get_grounding_batcher()
+    if batcher is not None:
+        chat_completion = await batcher.acall(**request)
+    else:
+        chat_completion = await asyncio.to_thread(_create_grounding_completion, **request)
     return chat_completion.choices[0].message.content
 
 
@@ -92,18 +546,8 @@ def call_ui_grounding_model(base64_image: str, instruction: str, language: str =
     Returns:
         str: The complete model response as a string
     """
-    # Initialize huggingface compatible OpenAI client
-    client = OpenAI(
-        base_url=os.environ["TGI_BASE_URL"],
-        api_key=os.environ["HF_TOKEN"]
-    )
-    
-    # Prepare messages with instruction and image
-    messages = [
-        {
-            "role": "user", 
-            "content": COMPUTER_USE_DOUBAO.format(instruction=instruction, language=language)
-        },
+    # Prepare messages: static prompt prefix, then instruction and image
+    messages = build_task_prefix(instruction, language) + [
         {
             "role": "user",
             "content": [
@@ -117,8 +561,8 @@ def call_ui_grounding_model(base64_image: str, instruction: str, language: str =
         }
     ]
 
-    # Make the non-streaming API call
-    chat_completion = client.chat.completions.create(
+    # Make the non-streaming API call through the replica pool
+    chat_completion = _create_grounding_completion(
         model="tgi",
         messages=messages,
         top_p=None,
@@ -136,6 +580,40 @@ def call_ui_grounding_model(base64_image: str, instruction: str, language: str =
 
     return raw_response
 
+def ground_actions_in_roi(base64_image: str, instruction: str, roi: tuple, image_width: int, image_height: int, language: str = "English", factor: int = 28) -> list:
+    """
+    Ground an instruction on a region of interest only and return actions in full-image space.
+
+    The region is cropped at full resolution, so small widgets keep their detail while the
+    request carries far fewer image tokens than the whole screen. Coordinates in the response
+    are normalized against the crop by parse_action_to_structure_output and then mapped back.
+
+    Args:
+        base64_image: Full screenshot (base64 PNG)
+        instruction: The instruction text to send to the model
+        roi: (x, y, width, height) region in screenshot pixels
+        image_width: Screenshot width in pixels
+        image_height: Screenshot height in pixels
+        language: Language for the prompt (default: "English")
+        factor: Coordinate factor passed to the parser
+
+    Returns:
+        list: Structured actions with boxes normalized to the full screenshot
+    """
+    from action_parser import map_actions_from_roi, parse_action_to_structure_output
+    from utils import crop_base64_image
+
+    crop_b64 = crop_base64_image(base64_image, roi)
+    raw_response = call_ui_grounding_model(crop_b64, instruction, language)
+    actions = parse_action_to_structure_output(
+        raw_response,
+        factor=factor,
+        origin_resized_height=roi[3],
+        origin_resized_width=roi[2]
+    )
+    return map_actions_from_roi(actions, roi, image_width, image_height)
+
+
 def call_result_checking_model(task_description: str, expected_view_base64: str, current_view_base64: str) -> dict:
     """
     Determine if a task is finished by comparing an expected end-state image and the current image.
@@ -149,7 +627,8 @@ def call_result_checking_model(task_description: str, expected_view_base64: str,
         dict: {"thoughts": str, "result": bool}
     """
     client = OpenAI(
-        api_key=os.environ["OPENAI_API_KEY"]
+        api_key=os.environ["OPENAI_API_KEY"],
+        max_retries=0
     )
 
     instruction = RESULT_CHECKING_WITH_IMAGES_PROMPT.format(task_description=task_description)
@@ -177,7 +656,9 @@ def call_result_checking_model(task_description: str, expected_view_base64: str,
         }
     ]
 
-    chat_completion = client.chat.completions.create(
+    chat_completion = _create_chat_completion(
+        "openai",
+        client,
         model="gpt-4o",
         messages=messages,
         temperature=0.0,
@@ -220,18 +701,21 @@ def _load_automation_step_snippets(snippets_dir: str = "./data/automation_code")
     return snippets
 
 
-def call_code_integration_model_with_snippets(snippets: List[str]) -> str:
+def call_code_integration_model_with_snippets(snippets: List[str], timing=None) -> str:
     """
     Call gpt-4o with CODE_INTEGRATION_PROMPT and provided snippets to generate a unified PyAutoGUI script.
 
     Args:
         snippets: List of code snippet strings composing the task steps.
+        timing: Timing profile (action_parser.TimingProfile or preset name) for the per-action
+                delay the integrated script uses; defaults to PYAUTOGUI_TIMING, then "safe".
 
     Returns:
         str: The model's raw response, expected to be a complete PyAutoGUI script.
     """
     client = OpenAI(
-        api_key=os.environ["OPENAI_API_KEY"]
+        api_key=os.environ["OPENAI_API_KEY"],
+        max_retries=0
     )
 
     # Join snippets with clear boundaries to help the model
@@ -243,13 +727,15 @@ def call_code_integration_model_with_snippets(snippets: List[str]) -> str:
             "content": [
                 {
                     "type": "text",
-                    "text": CODE_INTEGRATION_PROMPT.format(code_snippets=joined_snippets)
+                    "text": CODE_INTEGRATION_PROMPT.format(code_snippets=joined_snippets, delay_note=get_timing_profile(timing).integration_note())
                 }
             ]
         }
     ]
 
-    chat_completion = client.chat.completions.create(
+    chat_completion = _create_chat_completion(
+        "openai",
+        client,
         model="gpt-4o",
         messages=messages,
         temperature=0.0,
@@ -259,15 +745,16 @@ def call_code_integration_model_with_snippets(snippets: List[str]) -> str:
     return raw_response
 
 
-def call_code_integration_model_from_dir(snippets_dir: str = "./data/automation_code") -> str:
+def call_code_integration_model_from_dir(snippets_dir: str = "./data/automation_code", timing=None) -> str:
     """
     Convenience wrapper that loads snippets from a directory and calls the integration model.
 
     Args:
         snippets_dir: Directory containing automation step files.
+        timing: Timing profile passed to call_code_integration_model_with_snippets.
 
     Returns:
         str: The model's raw response, expected to be a complete PyAutoGUI script.
     """
     snippets = _load_automation_step_snippets(snippets_dir)
-    return call_code_integration_model_with_snippets(snippets)
\ No newline at end of file
+    return call_code_integration_model_with_snippets(snippets, timing=timing)
\ No newline at end of file
@@ -0,0 +1,299 @@
+import asyncio
+import base64
+import io
+import json
+import shlex
+import time
+import zlib
+from typing import Optional
+
+import numpy as np
+from PIL import Image
+
+# In-container capture agent (python3 + pyautogui, numpy when installed). Started once in the
+# background; it keeps the previous frame in memory and answers each request written to the
+# `request` FIFO with one JSON line on the `response` FIFO: the tiles that changed since the
+# previous capture, zlib compressed. A keyframe (the whole frame as PNG) is sent when asked
+# for, when the host's last frame is not the one the agent kept, when the size changed, or
+# every `--keyframe-interval` frames.
+AGENT_SOURCE = r'''
+import base64
+import io
+import json
+import os
+import sys
+import zlib
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+
+class DeltaEncoder:
+    def __init__(self, tile=64, keyframe_interval=30, use_numpy=True):
+        self.tile = tile
+        self.keyframe_interval = keyframe_interval
+        self.use_numpy = use_numpy and np is not None
+        self.prev = None
+        self.size = None
+        self.seq = -1
+
+    def _changed_tiles_numpy(self, cur, width, height):
+        tile = self.tile
+        changed = (cur != self.prev).any(axis=2)
+        rows, cols = -(-height // tile), -(-width // tile)
+        padded = np.zeros((rows * tile, cols * tile), dtype=bool)
+        padded[:height, :width] = changed
+        flags = padded.reshape(rows, tile, cols, tile).any(axis=(1, 3))
+        tiles, chunks = [], []
+        # np.nonzero is row-major, the same tile order as the pure Python scan
+        for row, col in zip(*np.nonzero(flags)):
+            tx, ty = int(col) * tile, int(row) * tile
+            tw, th = min(tile, width - tx), min(tile, height - ty)
+            tiles.append([tx, ty, tw, th])
+            chunks.append(cur[ty:ty + th, tx:tx + tw].tobytes())
+        return tiles, chunks
+
+    def _changed_tiles_python(self, cur, width, height):
+        tile, prev, stride = self.tile, self.prev, width * 3
+        tiles, chunks = [], []
+        for ty in range(0, height, tile):
+            th = min(tile, height - ty)
+            for tx in range(0, width, tile):
+                tw = min(tile, width - tx)
+                rows = [cur[(ty + r) * stride + tx * 3:(ty + r) * stride + (tx + tw) * 3] for r in range(th)]
+                if all(prev[(ty + r) * stride + tx * 3:(ty + r) * stride + (tx + tw) * 3] == rows[r] for r in range(th)):
+                    continue
+                tiles.append([tx, ty, tw, th])
+                chunks.extend(rows)
+        return tiles, chunks
+
+    def encode(self, frame, base_seq, force_keyframe=False):
+        if frame.mode != "RGB":
+            frame = frame.convert("RGB")
+        width, height = frame.size
+        cur = np.asarray(frame) if self.use_numpy else frame.tobytes()
+        seq = self.seq + 1
+        keyframe = (self.prev is None or self.size != (width, height) or self.seq != base_seq
+                    or seq % self.keyframe_interval == 0 or force_keyframe)
+        tiles, chunks = [], []
+        if not keyframe:
+            diff = self._changed_tiles_numpy if self.use_numpy else self._changed_tiles_python
+            tiles, chunks = diff(cur, width, height)
+        self.prev, self.size, self.seq = cur, (width, height), seq
+        if keyframe:
+            buffered = io.BytesIO()
+            frame.save(buffered, format="PNG")
+            data = buffered.getvalue()
+        else:
+            data = zlib.compress(b"".join(chunks), 1)
+        return {"seq": seq, "keyframe": keyframe, "width": width, "height": height, "tiles": tiles,
+                "data": base64.b64encode(data).decode("ascii")}
+
+
+def serve(state_dir, tile, keyframe_interval):
+    import pyautogui
+
+    request_path = os.path.join(state_dir, "request")
+    response_path = os.path.join(state_dir, "response")
+    encoder = DeltaEncoder(tile, keyframe_interval)
+    while True:
+        # Each request is one line "<id> <host seq> <keyframe 0|1>" from a fresh writer
+        with open(request_path) as f:
+            request = f.readline().split()
+        if not request:
+            continue
+        if request[0] == "quit":
+            return
+        try:
+            payload = encoder.encode(pyautogui.screenshot(), int(request[1]), request[2] == "1")
+        except Exception as e:
+            payload = {"error": repr(e)}
+        payload["id"] = request[0]
+        with open(response_path, "w") as f:
+            f.write(json.dumps(payload) + "\n")
+
+
+if __name__ == "__main__":
+    args = dict(zip(sys.argv[1::2], sys.argv[2::2]))
+    serve(args.get("--state-dir", "/tmp/delta_capture"), int(args.get("--tile", "64")), int(args.get("--keyframe-interval", "30")))
+'''
+
+
+class DeltaFrameBuffer:
+    """
+    Host-side frame reconstruction from delta payloads into one (height, width, 3) uint8 buffer.
+
+    Deltas are applied in place; a delta whose base is not the current frame is rejected so
+    the caller can ask for a keyframe.
+    """
+
+    def __init__(self):
+        self.frame: Optional[np.ndarray] = None
+        self.seq = -1
+
+    def apply(self, payload: dict) -> bool:
+        """Apply one agent payload; returns False if it could not be applied (missing base)."""
+        width, height = payload["width"], payload["height"]
+        if not payload["keyframe"] and (self.frame is None or self.frame.shape[:2] != (height, width) or payload["seq"] != self.seq + 1):
+            return False
+        if payload["keyframe"]:
+            with Image.open(io.BytesIO(base64.b64decode(payload["data"]))) as image:
+                self.frame = np.array(image.convert("RGB"))
+            self.seq = payload["seq"]
+            return True
+        data = zlib.decompress(base64.b64decode(payload["data"]))
+        offset = 0
+        for tx, ty, tw, th in payload["tiles"]:
+            size = tw * th * 3
+            self.frame[ty:ty + th, tx:tx + tw] = np.frombuffer(data, dtype=np.uint8, count=size, offset=offset).reshape(th, tw, 3)
+            offset += size
+        self.seq = payload["seq"]
+        return True
+
+
+class DeltaScreenCapture:
+    """
+    Screenshots from the container as changed tiles instead of full PNGs.
+
+    `install()` uploads the agent and starts it once in the background (nohup); it keeps
+    pyautogui imported and the previous frame in memory. Every `capture()` is then one
+    run_command that writes a request to the agent's FIFO and reads its reply, carrying only
+    the tiles that changed since the previous capture: no interpreter start-up, no pyautogui
+    import and no frame written to disk per capture. The tile diff runs in numpy when the
+    container has it. Used for polling the screen between actions (`wait_for_stable`, the
+    step loop's change checks), where a full PNG per poll is wasted; the model still gets
+    interface.screenshot() frames.
+
+    A capture that times out or gets a reply to another request restarts the agent and asks
+    for a keyframe. One instance per container: requests are serialized by an asyncio lock.
+
+    Args:
+        computer: Computer whose interface runs the agent
+        tile: Tile side in pixels
+        keyframe_interval: Send a full frame every this many captures
+        remote_path: Where the agent script is written in the container
+        state_dir: Container directory for the agent's FIFOs, pid file and log
+        timeout: Seconds a capture may take before the agent is restarted
+    """
+
+    def __init__(self, computer, tile: int = 64, keyframe_interval: int = 30, remote_path: str = "/tmp/delta_capture_agent.py", state_dir: str = "/tmp/delta_capture", timeout: float = 10.0):
+        self.computer = computer
+        self.tile = tile
+        self.keyframe_interval = keyframe_interval
+        self.remote_path = remote_path
+        self.state_dir = state_dir
+        self.timeout = timeout
+        self.buffer = DeltaFrameBuffer()
+        self._lock = asyncio.Lock()
+        self._request_id = 0
+        self.last_changed_tiles: Optional[int] = None
+        self.captures = 0
+        self.keyframes = 0
+        self.restarts = 0
+        self.bytes_received = 0
+        self.tiles_received = 0
+        self.tiles_total = 0
+
+    def _path(self, name: str) -> str:
+        return shlex.quote(f"{self.state_dir.rstrip('/')}/{name}")
+
+    async def install(self) -> None:
+        """Upload the agent and (re)start it."""
+        await self.computer.interface.write_text(self.remote_path, AGENT_SOURCE)
+        await self._start_agent()
+
+    async def _start_agent(self) -> None:
+        state_dir = shlex.quote(self.state_dir)
+        script = (f"mkdir -p {state_dir}; [ -f {self._path('pid')} ] && kill $(cat {self._path('pid')}) 2>/dev/null; "
+                  f"rm -f {self._path('request')} {self._path('response')}; mkfifo {self._path('request')} {self._path('response')}; "
+                  f"nohup python3 {shlex.quote(self.remote_path)} --state-dir {state_dir} --tile {self.tile} "
+                  f"--keyframe-interval {self.keyframe_interval} > {self._path('agent.log')} 2>&1 < /dev/null & echo $! > {self._path('pid')}")
+        # Login shell so the agent inherits the desktop session's DISPLAY
+        await self.computer.interface.run_command(f"bash -lc {shlex.quote(script)}")
+        self.buffer = DeltaFrameBuffer()
+
+    async def close(self) -> None:
+        """Stop the agent."""
+        script = f"[ -f {self._path('pid')} ] && kill $(cat {self._path('pid')}) 2>/dev/null; rm -f {self._path('pid')}"
+        await self.computer.interface.run_command(f"sh -c {shlex.quote(script)}")
+
+    async def _request(self, keyframe: bool) -> Optional[dict]:
+        self._request_id += 1
+        script = f"echo {self._request_id} {self.buffer.seq} {int(keyframe)} > {self._path('request')} && cat {self._path('response')}"
+        result = await self.computer.interface.run_command(f"timeout {self.timeout:g} sh -c {shlex.quote(script)}")
+        if not result.stdout:
+            return None
+        self.bytes_received += len(result.stdout)
+        payload = json.loads(result.stdout.strip().splitlines()[-1])
+        if payload.get("id") != str(self._request_id) or "error" in payload:
+            return None
+        return payload
+
+    async def _capture_payload(self) -> dict:
+        payload = await self._request(keyframe=False)
+        if payload is not None and self.buffer.apply(payload):
+            return payload
+        if payload is None:
+            # Timed out, stale reply or agent error: start over with a fresh agent
+            self.restarts += 1
+            await self._start_agent()
+        payload = await self._request(keyframe=True)
+        if payload is None or not self.buffer.apply(payload):
+            raise RuntimeError("Delta capture agent did not answer; see its agent.log in " + self.state_dir)
+        return payload
+
+    async def capture(self) -> np.ndarray:
+        """
+        Capture the current screen.
+
+        Returns:
+            np.ndarray: The reconstructed (height, width, 3) RGB frame. This is the internal
+                        buffer and is updated in place by the next capture; copy it to keep it.
+        """
+        async with self._lock:
+            payload = await self._capture_payload()
+        self.captures += 1
+        self.keyframes += int(payload["keyframe"])
+        self.last_changed_tiles = None if payload["keyframe"] else len(payload["tiles"])
+        tile_count = -(-payload["width"] // self.tile) * -(-payload["height"] // self.tile)
+        self.tiles_received += tile_count if payload["keyframe"] else len(payload["tiles"])
+        self.tiles_total += tile_count
+        return self.buffer.frame
+
+    async def capture_image(self) -> "Image.Image":
+        """capture() as a PIL image that is not touched by later captures."""
+        return Image.fromarray((await self.capture()).copy())
+
+    async def capture_png(self) -> bytes:
+        """capture() encoded as PNG, for callers that expect computer.interface.screenshot() bytes."""
+        buffered = io.BytesIO()
+        (await self.capture_image()).save(buffered, format="PNG")
+        return buffered.getvalue()
+
+    async def wait_for_stable(self, timeout: float, interval: float = 0.1) -> bool:
+        """
+        Poll until a capture shows no changed tile since the previous one, or `timeout` elapses.
+
+        Returns:
+            bool: True if the screen settled, False on timeout
+        """
+        deadline = time.monotonic() + timeout
+        await self.capture()
+        while time.monotonic() < deadline:
+            await asyncio.sleep(interval)
+            await self.capture()
+            if self.last_changed_tiles == 0:
+                return True
+        return False
+
+    def stats(self) -> dict:
+        return {
+            "captures": self.captures,
+            "keyframes": self.keyframes,
+            "restarts": self.restarts,
+            "bytes_received": self.bytes_received,
+            "mean_bytes_per_capture": self.bytes_received / self.captures if self.captures else 0.0,
+            "changed_tile_fraction": self.tiles_received / self.tiles_total if self.tiles_total else 0.0,
+        }
@@ -0,0 +1,203 @@
+import threading
+import time
+import urllib.request
+from contextlib import contextmanager
+from typing import Iterator, List, Optional
+
+from request_policy import is_retryable_error
+
+ROUTING_STRATEGIES = ("least_outstanding", "ewma")
+
+
+class Endpoint:
+    """Routing state for one backend base URL."""
+
+    def __init__(self, base_url: str):
+        self.base_url = base_url
+        self.outstanding = 0
+        self.ewma_latency: Optional[float] = None
+        self.consecutive_failures = 0
+        self.ejected_until = 0.0
+        # Set when the current ejection came from a failed health probe rather than failed requests
+        self.ejected_by_probe = False
+        self.requests = 0
+        self.failures = 0
+        self.ejections = 0
+
+    def is_available(self, now: float) -> bool:
+        return now >= self.ejected_until
+
+    def snapshot(self) -> dict:
+        return {
+            "base_url": self.base_url,
+            "outstanding": self.outstanding,
+            "ewma_latency_s": self.ewma_latency,
+            "requests": self.requests,
+            "failures": self.failures,
+            "ejections": self.ejections,
+            "ejected": not self.is_available(time.monotonic()),
+        }
+
+
+def health_url_for(base_url: str, health_path: str = "/health") -> str:
+    """TGI serves /health at the server root, so strip a trailing /v1 from the OpenAI base URL."""
+    root = base_url.rstrip("/")
+    if root.endswith("/v1"):
+        root = root[: -len("/v1")]
+    return root + health_path
+
+
+class EndpointPool:
+    """
+    Route grounding calls across several TGI replicas.
+
+    Endpoints that fail `failure_threshold` times in a row (or fail a health check) are
+    ejected for `cooldown` seconds. A passing health check readmits only endpoints that a
+    failed health check ejected; request failures always sit out the full cooldown, since
+    /health can pass while generation fails. If every endpoint is ejected the one that comes
+    back soonest is used, so the pool fails open rather than refusing traffic.
+
+    Args:
+        base_urls: OpenAI-compatible base URLs, e.g. ["http://tgi-0:8080/v1", "http://tgi-1:8080/v1"]
+        strategy: "least_outstanding" (fewest in-flight requests) or "ewma" (lowest latency EWMA
+                  weighted by in-flight requests)
+        ewma_alpha: Smoothing factor for the latency EWMA
+        failure_threshold: Consecutive failures before an endpoint is ejected
+        cooldown: Seconds an ejected endpoint stays out of rotation
+        health_path: Path probed by health checks, relative to the server root
+        health_timeout: Timeout in seconds for a single health probe
+    """
+
+    def __init__(self,
+                 base_urls: List[str],
+                 strategy: str = "least_outstanding",
+                 ewma_alpha: float = 0.3,
+                 failure_threshold: int = 3,
+                 cooldown: float = 30.0,
+                 health_path: str = "/health",
+                 health_timeout: float = 2.0):
+        if not base_urls:
+            raise ValueError("EndpointPool needs at least one base URL")
+        if strategy not in ROUTING_STRATEGIES:
+            raise ValueError(f"Unknown routing strategy: {strategy}, expected one of {ROUTING_STRATEGIES}")
+        self.endpoints = [Endpoint(url) for url in base_urls]
+        self.strategy = strategy
+        self.ewma_alpha = ewma_alpha
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.health_path = health_path
+        self.health_timeout = health_timeout
+        self._lock = threading.Lock()
+        self._rr = 0
+        self._health_thread: Optional[threading.Thread] = None
+        self._health_stop = threading.Event()
+
+    def _score(self, endpoint: Endpoint) -> float:
+        if self.strategy == "least_outstanding":
+            return endpoint.outstanding
+        # Unmeasured endpoints score 0 so they get probed by real traffic first
+        return (endpoint.ewma_latency or 0.0) * (endpoint.outstanding + 1)
+
+    def acquire(self) -> Endpoint:
+        """Pick an endpoint for a new request and count it as outstanding."""
+        with self._lock:
+            now = time.monotonic()
+            candidates = [e for e in self.endpoints if e.is_available(now)]
+            if not candidates:
+                candidates = [min(self.endpoints, key=lambda e: e.ejected_until)]
+            # Rotate the start index so ties are spread round-robin
+            self._rr = (self._rr + 1) % len(candidates)
+            rotated = candidates[self._rr:] + candidates[:self._rr]
+            endpoint = min(rotated, key=self._score)
+            endpoint.outstanding += 1
+            endpoint.requests += 1
+            return endpoint
+
+    def release(self, endpoint: Endpoint, latency: Optional[float] = None, success: bool = True) -> None:
+        """Record the outcome of a request started with `acquire`."""
+        with self._lock:
+            endpoint.outstanding = max(0, endpoint.outstanding - 1)
+            if success:
+                endpoint.consecutive_failures = 0
+                if latency is not None:
+                    if endpoint.ewma_latency is None:
+                        endpoint.ewma_latency = latency
+                    else:
+                        endpoint.ewma_latency = self.ewma_alpha * latency + (1 - self.ewma_alpha) * endpoint.ewma_latency
+            else:
+                endpoint.failures += 1
+                endpoint.consecutive_failures += 1
+                if endpoint.consecutive_failures >= self.failure_threshold:
+                    self._eject(endpoint)
+
+    def _eject(self, endpoint: Endpoint, by_probe: bool = False) -> None:
+        endpoint.ejected_until = time.monotonic() + self.cooldown
+        endpoint.ejected_by_probe = by_probe
+        endpoint.consecutive_failures = 0
+        endpoint.ejections += 1
+        print(f"Ejecting endpoint {endpoint.base_url} for {self.cooldown:.0f}s")
+
+    @contextmanager
+    def lease(self) -> Iterator[Endpoint]:
+        """
+        Context manager around acquire/release. Server-side errors (timeouts, 5xx, 429,
+        connection failures) count against the endpoint; client errors do not.
+        """
+        endpoint = self.acquire()
+        start = time.monotonic()
+        try:
+            yield endpoint
+        except Exception as e:
+            self.release(endpoint, success=not is_retryable_error(e))
+            raise
+        self.release(endpoint, latency=time.monotonic() - start)
+
+    def check_health(self) -> dict:
+        """
+        Probe every endpoint once. Unhealthy endpoints are ejected; healthy ones that an
+        earlier probe ejected are put back into rotation. Endpoints ejected for failed
+        requests stay out until their cooldown ends.
+
+        Returns:
+            dict: base_url -> bool health
+        """
+        results = {}
+        for endpoint in self.endpoints:
+            try:
+                with urllib.request.urlopen(health_url_for(endpoint.base_url, self.health_path), timeout=self.health_timeout) as resp:
+                    healthy = 200 <= resp.status < 300
+            except Exception:
+                healthy = False
+            with self._lock:
+                if healthy:
+                    if endpoint.ejected_by_probe:
+                        endpoint.ejected_until = 0.0
+                        endpoint.ejected_by_probe = False
+                        endpoint.consecutive_failures = 0
+                elif endpoint.is_available(time.monotonic()):
+                    self._eject(endpoint, by_probe=True)
+            results[endpoint.base_url] = healthy
+        return results
+
+    def start_health_checks(self, interval: float = 10.0) -> None:
+        """Run `check_health` every `interval` seconds in a daemon thread."""
+        if self._health_thread is not None:
+            return
+        self._health_stop.clear()
+
+        def loop():
+            while not self._health_stop.wait(interval):
+                self.check_health()
+
+        self._health_thread = threading.Thread(target=loop, name="endpoint-health", daemon=True)
+        self._health_thread.start()
+
+    def stop_health_checks(self) -> None:
+        if self._health_thread is not None:
+            self._health_stop.set()
+            self._health_thread.join(timeout=5)
+            self._health_thread = None
+
+    def stats(self) -> List[dict]:
+        with self._lock:
+            return [e.snapshot() for e in self.endpoints]
@@ -0,0 +1,134 @@
+import asyncio
+import threading
+import time
+from collections import Counter
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, List, Optional, Tuple
+
+# TGI's default --max-concurrent-requests, i.e. what one replica accepts in flight
+DEFAULT_MAX_WORKERS = 128
+
+
+class GroundingBatcher:
+    """
+    Micro-batching dispatcher in front of the grounding model.
+
+    Requests from concurrent step loops are queued and flushed together once
+    `max_batch_size` requests are waiting or the oldest one has waited `max_wait_ms`.
+    The chat completions API has no multi-conversation request, so a flushed batch is
+    released as one simultaneous burst; TGI's continuous batching then schedules the
+    burst into the same prefill/decode batch instead of trickling requests in one by one.
+    Each caller gets its own response back through a Future.
+
+    Trade-off: a larger `max_wait_ms` forms bigger batches (better server throughput) at the
+    cost of up to `max_wait_ms` extra latency per call; `max_wait_ms=0` flushes immediately.
+
+    Args:
+        submit_fn: Callable issuing one request, called with the keyword arguments given to `submit`
+        max_batch_size: Flush as soon as this many requests are queued
+        max_wait_ms: Maximum time the oldest queued request waits before a flush
+        max_workers: Threads sending requests, i.e. the most requests in flight at once. Size it to
+                     what the backends accept (defaults to DEFAULT_MAX_WORKERS), not to max_batch_size:
+                     otherwise a flushed batch waits for the previous one to finish instead of
+                     being released as a burst
+    """
+
+    def __init__(self, submit_fn: Callable[..., Any], max_batch_size: int = 8, max_wait_ms: float = 20.0, max_workers: Optional[int] = None):
+        if max_batch_size < 1:
+            raise ValueError("max_batch_size must be at least 1")
+        self.submit_fn = submit_fn
+        self.max_batch_size = max_batch_size
+        self.max_wait_ms = max_wait_ms
+        self._queue: List[Tuple[dict, Future, float]] = []
+        self._cond = threading.Condition()
+        self._closed = False
+        self._executor = ThreadPoolExecutor(max_workers=max_workers or DEFAULT_MAX_WORKERS, thread_name_prefix="grounding-batch")
+        self._stats_lock = threading.Lock()
+        self._batches = 0
+        self._requests = 0
+        self._queue_wait_total = 0.0
+        self._batch_sizes: Counter = Counter()
+        self._flush_reasons: Counter = Counter()
+        self._thread = threading.Thread(target=self._run, name="grounding-batcher", daemon=True)
+        self._thread.start()
+
+    def submit(self, **kwargs) -> Future:
+        """Queue one request; the returned Future resolves to the submit_fn result."""
+        future: Future = Future()
+        with self._cond:
+            if self._closed:
+                raise RuntimeError("GroundingBatcher is closed")
+            self._queue.append((kwargs, future, time.monotonic()))
+            self._cond.notify()
+        return future
+
+    def call(self, **kwargs) -> Any:
+        """Blocking submit-and-wait."""
+        return self.submit(**kwargs).result()
+
+    async def acall(self, **kwargs) -> Any:
+        """Awaitable submit-and-wait for asyncio step loops."""
+        return await asyncio.wrap_future(self.submit(**kwargs))
+
+    def _take_batch(self) -> Tuple[List[Tuple[dict, Future, float]], str]:
+        with self._cond:
+            while not self._queue and not self._closed:
+                self._cond.wait()
+            if not self._queue:
+                return [], "closed"
+            flush_at = self._queue[0][2] + self.max_wait_ms / 1000.0
+            while len(self._queue) < self.max_batch_size and not self._closed:
+                remaining = flush_at - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+            reason = "size" if len(self._queue) >= self.max_batch_size else ("closed" if self._closed else "timeout")
+            batch = self._queue[: self.max_batch_size]
+            del self._queue[: self.max_batch_size]
+            return batch, reason
+
+    def _run(self) -> None:
+        while True:
+            batch, reason = self._take_batch()
+            if not batch:
+                return
+            now = time.monotonic()
+            with self._stats_lock:
+                self._batches += 1
+                self._requests += len(batch)
+                self._batch_sizes[len(batch)] += 1
+                self._flush_reasons[reason] += 1
+                self._queue_wait_total += sum(now - queued_at for _, _, queued_at in batch)
+            for kwargs, future, _ in batch:
+                if future.set_running_or_notify_cancel():
+                    self._executor.submit(self._dispatch, kwargs, future)
+
+    def _dispatch(self, kwargs: dict, future: Future) -> None:
+        try:
+            future.set_result(self.submit_fn(**kwargs))
+        except BaseException as e:
+            future.set_exception(e)
+
+    def stats(self) -> dict:
+        """Batch count, mean/histogram of batch sizes, flush reasons and mean queueing delay."""
+        with self._stats_lock:
+            return {
+                "batches": self._batches,
+                "requests": self._requests,
+                "mean_batch_size": self._requests / self._batches if self._batches else 0.0,
+                "batch_size_histogram": dict(sorted(self._batch_sizes.items())),
+                "flush_reasons": dict(self._flush_reasons),
+                "mean_queue_wait_ms": 1000.0 * self._queue_wait_total / self._requests if self._requests else 0.0,
+                "max_batch_size": self.max_batch_size,
+                "max_wait_ms": self.max_wait_ms,
+            }
+
+    def close(self) -> None:
+        """Flush what is queued, then stop the dispatcher thread and wait for in-flight requests."""
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        # The dispatcher submits the remaining batches to the executor, so it must be done
+        # before the executor stops accepting work
+        self._thread.join()
+        self._executor.shutdown(wait=True)
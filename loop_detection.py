@@ -0,0 +1,149 @@
+import base64
+import io
+from typing import List, Optional, Union
+
+import numpy as np
+from PIL import Image
+
+from action_parser import COORDINATE_PARAMS, CoordinateSpace, box_values
+
+# Appended to the thought of a turn that repeated itself without effect, so the model sees in
+# its history that the action did nothing
+NO_EFFECT_NOTE = "(This action was repeated on an unchanged screen and had no visible effect; a different action is needed.)"
+
+
+def frame_hash(image: Union[str, bytes, "Image.Image"], size: tuple = (32, 20)) -> np.ndarray:
+    """
+    Difference hash of a frame: each bit tells whether a pixel of a (width + 1) x height
+    grayscale thumbnail is brighter than its left neighbour. Small enough to keep per
+    iteration, coarse enough to ignore a blinking caret or a clock tick.
+
+    Args:
+        image: Frame as base64 string, PNG bytes or PIL Image
+        size: Hash grid (width, height); the hash has width * height bits
+
+    Returns:
+        np.ndarray: Packed bits (uint8)
+    """
+    if isinstance(image, str):
+        image = base64.b64decode(image)
+    if isinstance(image, (bytes, bytearray)):
+        image = Image.open(io.BytesIO(image))
+    gray = np.asarray(image.convert("L").resize((size[0] + 1, size[1]), Image.BILINEAR), dtype=np.int16)
+    return np.packbits(gray[:, 1:] > gray[:, :-1])
+
+
+def hash_distance(a: np.ndarray, b: np.ndarray) -> int:
+    """Number of differing bits between two frame hashes."""
+    if a.shape != b.shape:
+        return a.size * 8
+    return int(np.unpackbits(a ^ b).sum())
+
+
+def action_signature(structured_actions: list) -> list:
+    """
+    Comparable form of a turn's actions: (action_type, non-coordinate inputs, (N, 2) box centers)
+    per action, coordinates normalized to the screenshot.
+    """
+    signature = []
+    for action in structured_actions:
+        params, boxes = [], []
+        for param_name, param_value in sorted(action.get("action_inputs", {}).items()):
+            if param_value and any(p in param_name for p in COORDINATE_PARAMS):
+                try:
+                    boxes.append(box_values(param_value))
+                    continue
+                except (ValueError, TypeError):
+                    pass
+            params.append((param_name, str(param_value)))
+        centers = CoordinateSpace.box_centers(boxes) if boxes else np.zeros((0, 2))
+        signature.append((action.get("action_type"), tuple(params), centers))
+    return signature
+
+
+def same_actions(a: list, b: list, coord_tolerance: float) -> bool:
+    """True if two signatures describe the same actions, coordinates within `coord_tolerance`."""
+    if len(a) != len(b):
+        return False
+    for (type_a, params_a, centers_a), (type_b, params_b, centers_b) in zip(a, b):
+        if type_a != type_b or params_a != params_b or centers_a.shape != centers_b.shape:
+            return False
+        if centers_a.size and np.abs(centers_a - centers_b).max() > coord_tolerance:
+            return False
+    return True
+
+
+class LoopDetector:
+    """
+    Detect a step loop that is stuck: the model proposing the same action(s) again on a screen
+    that did not change since it last proposed them.
+
+    Fed once per iteration, after parsing and before execution, with the frame the actions were
+    planned on. A repeat is an observation whose actions match the previous observation's
+    (same types and inputs, box centers within `coord_tolerance`) and whose frame hash is within
+    `max_hash_distance` bits of the previous frame's. After `max_repeats` consecutive repeats
+    the verdict is "stop", or "escalate" once first when escalation is enabled (the caller skips
+    the repeated action and tells the model it had no effect; a further repeat stops).
+
+    Args:
+        max_repeats: Consecutive repeats tolerated before acting (1 = act on the first repeat)
+        coord_tolerance: Maximum per-axis difference of box centers, as a fraction of the screenshot
+        max_hash_distance: Maximum frame hash distance (bits) for the screen to count as unchanged
+        escalate: Escalate once before stopping
+        hash_size: frame_hash grid size
+    """
+
+    def __init__(self, max_repeats: int = 1, coord_tolerance: float = 0.01, max_hash_distance: int = 8, escalate: bool = False, hash_size: tuple = (32, 20)):
+        self.max_repeats = max_repeats
+        self.coord_tolerance = coord_tolerance
+        self.max_hash_distance = max_hash_distance
+        self.escalate = escalate
+        self.hash_size = hash_size
+        self.reset()
+
+    def reset(self) -> None:
+        self._last_signature: Optional[list] = None
+        self._last_hash: Optional[np.ndarray] = None
+        self.repeats = 0
+        self.observations = 0
+        self.escalations = 0
+        self.stopped_at: Optional[int] = None
+        self.verdicts: List[str] = []
+
+    def observe(self, frame: Union[str, bytes, "Image.Image"], structured_actions: list) -> str:
+        """
+        Record one iteration.
+
+        Args:
+            frame: Screenshot the actions were planned on (base64, PNG bytes or PIL Image)
+            structured_actions: Parsed actions of the iteration
+
+        Returns:
+            str: "continue", "escalate" or "stop"
+        """
+        signature = action_signature(structured_actions)
+        current_hash = frame_hash(frame, self.hash_size)
+        repeated = (self._last_signature is not None and same_actions(signature, self._last_signature, self.coord_tolerance)
+                    and hash_distance(current_hash, self._last_hash) <= self.max_hash_distance)
+        self.repeats = self.repeats + 1 if repeated else 0
+        self._last_signature, self._last_hash = signature, current_hash
+        self.observations += 1
+
+        verdict = "continue"
+        if self.repeats >= self.max_repeats:
+            if self.escalate and self.escalations == 0:
+                self.escalations += 1
+                verdict = "escalate"
+            else:
+                self.stopped_at = self.observations
+                verdict = "stop"
+        self.verdicts.append(verdict)
+        return verdict
+
+    def stats(self) -> dict:
+        return {
+            "observations": self.observations,
+            "escalations": self.escalations,
+            "stopped_at": self.stopped_at,
+            "verdicts": list(self.verdicts),
+        }
@@ -26,6 +26,40 @@ finished(content='xxx') # Use escape characters \\', \\", and \\n in content par
 - Write a small plan and finally summarize your next action (with its target element) in one sentence in `Thought` part.
 
 
+## User Instruction
+{instruction}
+"""
+
+COMPUTER_USE_DOUBAO_MULTI_ACTION = """You are a GUI agent. You are given serious of actions in the user instruction to complete a task. You need to check the screenshot to perform the next actions to complete the task. Do NOT do anything else that not mentioned in the task description.
+
+You may output several actions in one turn when they all apply to the current screenshot, for example clicking an input field, typing into it and pressing enter. Separate the actions with a blank line. Only the first action may target a point that is not visible yet after the previous actions; if an action would change the page (open a dialog, navigate, submit a form), make it the last action of the turn. When the task is done, output finished(content='true') on its own.
+
+## Output Format
+```
+Thought: ...
+Action: ...
+
+...
+```
+
+## Action Space
+
+click(point='<point>x1 y1</point>')
+left_double(point='<point>x1 y1</point>')
+right_single(point='<point>x1 y1</point>')
+drag(start_point='<point>x1 y1</point>', end_point='<point>x2 y2</point>')
+hotkey(key='ctrl c') # Split keys with a space and use lowercase. Also, do not use more than 3 keys in one hotkey action.
+type(content='xxx') # Use escape characters \\', \\\", and \\n in content part to ensure we can parse the content in normal python string format. If you want to submit your input, use \\n at the end of content. 
+scroll(point='<point>x1 y1</point>', direction='down or up or right or left') # Show more information on the `direction` side.
+wait() #Sleep for 5s and take a screenshot to check for any changes.
+finished(content='xxx') # Use escape characters \\', \\", and \\n in content part to ensure we can parse the content in normal python string format.
+
+
+## Note
+- Use {language} in `Thought` part.
+- Write a small plan and finally summarize your next actions (with their target elements) in one sentence in `Thought` part.
+
+
 ## User Instruction
 {instruction}
 """
@@ -68,7 +102,7 @@ CODE_INTEGRATION_PROMPT = """You are a GUI agent specific to generating PyAutoGU
 ## Note
 - You should only output the complete and executable code for the entire task. No other text are allowed.
 - Some part of the step code might be redundant or overlapped, you should filter out the redundant code and make the code as short as possible.
-- You should insert a `time.sleep(2.0)` after each action to ensure the action is executed successfully.
+- {delay_note}
 """
 
 RESULT_CHECKING_WITH_IMAGES_PROMPT = """You are a GUI agent. You are given a task description, an expected end-state screenshot, and a current screenshot. You need to determine if the task has been completed.
@@ -86,4 +120,11 @@ Action: finished(content='true' or 'false')
 
 ## Task Description
 {task_description}
-"""
\ No newline at end of file
+"""
+# Prefix-cache friendly split of the computer-use prompts: the part before "## Note" (role and
+# action space) is byte-identical for every step and task and starts the first message; the
+# note with {language} and the {instruction} are appended to it (core.build_task_prefix).
+COMPUTER_USE_DOUBAO_STATIC = COMPUTER_USE_DOUBAO[:COMPUTER_USE_DOUBAO.index("## Note")].rstrip() + "\n"
+COMPUTER_USE_DOUBAO_TASK = COMPUTER_USE_DOUBAO[COMPUTER_USE_DOUBAO.index("## Note"):]
+COMPUTER_USE_DOUBAO_MULTI_ACTION_STATIC = COMPUTER_USE_DOUBAO_MULTI_ACTION[:COMPUTER_USE_DOUBAO_MULTI_ACTION.index("## Note")].rstrip() + "\n"
+COMPUTER_USE_DOUBAO_MULTI_ACTION_TASK = COMPUTER_USE_DOUBAO_MULTI_ACTION[COMPUTER_USE_DOUBAO_MULTI_ACTION.index("## Note"):]
@@ -0,0 +1,330 @@
+import asyncio
+import contextlib
+import importlib
+import json
+import os
+import pathlib
+import time
+from typing import Dict, List, Optional
+
+from stub_server import ChatCompletionsStub, LatencyModel, ProxyResponder, ScriptedResponder
+
+TRAJECTORY_FILE = "trajectory.json"
+
+
+class ReplayCommandResult:
+    def __init__(self, returncode: int = 0, stdout: str = "", stderr: str = ""):
+        self.returncode = returncode
+        self.stdout = stdout
+        self.stderr = stderr
+
+
+class ReplayInterface:
+    """
+    Stand-in for `computer.interface` that serves recorded screenshots in order.
+
+    Every `screenshot()` call returns the next recorded frame (the last frame is repeated once
+    the recording is exhausted). Scripts written with `write_text` are kept in memory and
+    `run_command` succeeds without executing anything, so the step loop sees rc 0 and an
+    empty log.
+
+    Args:
+        frames: Recorded screenshots as raw PNG bytes
+        screen_width: Screen width reported by `get_screen_size`
+        screen_height: Screen height reported by `get_screen_size`
+        exec_latency: Optional seconds to wait in `run_command` to emulate execution time
+    """
+
+    def __init__(self, frames: List[bytes], screen_width: int, screen_height: int, exec_latency: float = 0.0):
+        if not frames:
+            raise ValueError("ReplayInterface needs at least one recorded frame")
+        self.frames = frames
+        self.screen_width = screen_width
+        self.screen_height = screen_height
+        self.exec_latency = exec_latency
+        self.files: Dict[str, str] = {}
+        self.commands: List[str] = []
+        self.frames_served = 0
+
+    async def screenshot(self) -> bytes:
+        frame = self.frames[min(self.frames_served, len(self.frames) - 1)]
+        self.frames_served += 1
+        return frame
+
+    async def get_screen_size(self) -> dict:
+        return {"width": self.screen_width, "height": self.screen_height}
+
+    async def write_text(self, path: str, content: str) -> None:
+        self.files[path] = content
+
+    async def read_text(self, path: str) -> str:
+        if path in self.files:
+            return self.files[path]
+        if path.endswith(".rc"):
+            return "0\n"
+        return ""
+
+    async def run_command(self, command: str) -> ReplayCommandResult:
+        self.commands.append(command)
+        if self.exec_latency > 0:
+            await asyncio.sleep(self.exec_latency)
+        return ReplayCommandResult(returncode=0)
+
+
+class ReplayComputer:
+    """Minimal `Computer` replacement exposing a ReplayInterface."""
+
+    def __init__(self, interface: ReplayInterface):
+        self.interface = interface
+
+    async def run(self) -> None:
+        return None
+
+    async def stop(self) -> None:
+        return None
+
+
+class Trajectory:
+    """
+    A recorded step: the instruction, the screenshots seen by the loop and the model responses.
+
+    On disk a trajectory is a directory with `trajectory.json` plus one PNG per frame:
+
+        {
+            "instruction": "...",
+            "image_width": 2880, "image_height": 1800,
+            "screen_width": 1920, "screen_height": 1080,
+            "steps": [{"screenshot": "frame_001.png", "response": "Thought: ...\\nAction: ..."}]
+        }
+    """
+
+    def __init__(self, instruction: str, frames: List[bytes], responses: List[str], image_width: int, image_height: int, screen_width: int, screen_height: int):
+        self.instruction = instruction
+        self.frames = frames
+        self.responses = responses
+        self.image_width = image_width
+        self.image_height = image_height
+        self.screen_width = screen_width
+        self.screen_height = screen_height
+
+    @classmethod
+    def load(cls, trajectory_dir: str) -> "Trajectory":
+        dir_path = pathlib.Path(trajectory_dir).resolve()
+        with open(dir_path / TRAJECTORY_FILE, "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        frames = [(dir_path / step["screenshot"]).read_bytes() for step in meta["steps"]]
+        responses = [step["response"] for step in meta["steps"]]
+        return cls(
+            instruction=meta["instruction"],
+            frames=frames,
+            responses=responses,
+            image_width=meta["image_width"],
+            image_height=meta["image_height"],
+            screen_width=meta["screen_width"],
+            screen_height=meta["screen_height"],
+        )
+
+    def save(self, trajectory_dir: str) -> None:
+        dir_path = pathlib.Path(trajectory_dir).resolve()
+        os.makedirs(dir_path, exist_ok=True)
+        steps = []
+        for idx, (frame, response) in enumerate(zip(self.frames, self.responses), 1):
+            name = f"frame_{idx:03d}.png"
+            (dir_path / name).write_bytes(frame)
+            steps.append({"screenshot": name, "response": response})
+        meta = {
+            "instruction": self.instruction,
+            "image_width": self.image_width,
+            "image_height": self.image_height,
+            "screen_width": self.screen_width,
+            "screen_height": self.screen_height,
+            "steps": steps,
+        }
+        with open(dir_path / TRAJECTORY_FILE, "w", encoding="utf-8") as f:
+            json.dump(meta, f, indent=2)
+
+
+class _RecordingInterface:
+    """Proxy around a real `computer.interface` that keeps every screenshot it returns."""
+
+    def __init__(self, interface, recorder: "TrajectoryRecorder"):
+        self._interface = interface
+        self._recorder = recorder
+
+    async def screenshot(self) -> bytes:
+        frame = await self._interface.screenshot()
+        self._recorder.frames.append(frame)
+        return frame
+
+    def __getattr__(self, name):
+        return getattr(self._interface, name)
+
+
+class TrajectoryRecorder:
+    """
+    Record a live step so it can be replayed offline.
+
+    Screenshots are captured by wrapping `computer.interface`; model responses are captured by
+    a proxying stub that sits between core.py and the real TGI endpoint.
+
+    Example:
+        recorder = TrajectoryRecorder(upstream_base_url=os.environ["TGI_BASE_URL"], api_key=os.environ["HF_TOKEN"])
+        with recorder.proxy() as base_url, grounding_endpoint(base_url):
+            computer.interface = recorder.wrap_interface(computer.interface)
+            await demo_docker_cua_step_automation(...)
+        recorder.save("./data/trajectories/step_1", instruction, image_width, image_height, screen_width, screen_height)
+    """
+
+    def __init__(self, upstream_base_url: str, api_key: str = ""):
+        self.upstream_base_url = upstream_base_url
+        self.api_key = api_key
+        self.frames: List[bytes] = []
+        self.responses: List[str] = []
+
+    def wrap_interface(self, interface) -> _RecordingInterface:
+        return _RecordingInterface(interface, self)
+
+    def _on_response(self, request: dict, content: str) -> None:
+        self.responses.append(content)
+
+    def proxy(self) -> "_RecorderProxy":
+        return _RecorderProxy(self)
+
+    def save(self, trajectory_dir: str, instruction: str, image_width: int, image_height: int, screen_width: int, screen_height: int) -> Trajectory:
+        # The loop takes one screenshot per model call, so pair them up in order
+        count = min(len(self.frames), len(self.responses))
+        trajectory = Trajectory(instruction, self.frames[:count], self.responses[:count], image_width, image_height, screen_width, screen_height)
+        trajectory.save(trajectory_dir)
+        return trajectory
+
+
+class _RecorderProxy:
+    def __init__(self, recorder: TrajectoryRecorder):
+        self._stub = ChatCompletionsStub(ProxyResponder(recorder.upstream_base_url, recorder.api_key, on_response=recorder._on_response))
+
+    def __enter__(self) -> str:
+        return self._stub.start()
+
+    def __exit__(self, exc_type, exc, tb):
+        self._stub.stop()
+
+
+@contextlib.contextmanager
+def grounding_endpoint(base_url: str, api_key: str = "replay"):
+    """
+    Point core.py's grounding calls at `base_url` only for the duration of the block.
+
+    TGI_BASE_URLS takes precedence over TGI_BASE_URL in core.get_grounding_pool, so it is
+    cleared as well; the cached endpoint pool is reset on entry and exit so no lease goes to a
+    replica from the surrounding environment. HF_TOKEN keeps its value, or `api_key` if unset.
+    """
+    from core import reset_grounding_pool
+
+    saved_env = {key: os.environ.get(key) for key in ("TGI_BASE_URL", "TGI_BASE_URLS", "HF_TOKEN")}
+    os.environ.pop("TGI_BASE_URLS", None)
+    os.environ["TGI_BASE_URL"] = base_url
+    os.environ["HF_TOKEN"] = saved_env["HF_TOKEN"] or api_key
+    reset_grounding_pool()
+    try:
+        yield
+    finally:
+        for key, value in saved_env.items():
+            if value is None:
+                os.environ.pop(key, None)
+            else:
+                os.environ[key] = value
+        reset_grounding_pool()
+
+
+def _load_step_loop():
+    # test_ui-tars.py is not a valid identifier, so go through importlib
+    return importlib.import_module("test_ui-tars").demo_docker_cua_step_automation
+
+
+async def replay_trajectory(trajectory_dir: str, step_idx: int = 1, max_iterations: Optional[int] = None, exec_latency: float = 0.0, loop_kwargs: Optional[dict] = None, model_latency: Optional[LatencyModel] = None) -> dict:
+    """
+    Run `demo_docker_cua_step_automation` unmodified against a recorded trajectory.
+
+    Screenshots come from a ReplayInterface and model responses from a local
+    ChatCompletionsStub that TGI_BASE_URL is pointed at for the duration of the run.
+
+    Args:
+        trajectory_dir: Directory containing trajectory.json and the recorded frames
+        step_idx: Step index passed to the loop (used in output file names)
+        max_iterations: Iteration cap; defaults to the number of recorded responses
+        exec_latency: Seconds to emulate for each in-container script execution
+        loop_kwargs: Extra keyword arguments for the step loop (e.g. {"pipelined": False})
+        model_latency: Optional latency model for the stub (responses are instant by default)
+
+    Returns:
+        dict: Timing and counters for the replayed run
+    """
+    trajectory = Trajectory.load(trajectory_dir)
+    step_loop = _load_step_loop()
+    interface = ReplayInterface(trajectory.frames, trajectory.screen_width, trajectory.screen_height, exec_latency=exec_latency)
+    computer = ReplayComputer(interface)
+    responder = ScriptedResponder(trajectory.responses)
+
+    with ChatCompletionsStub(responder, latency=model_latency) as stub, grounding_endpoint(stub.base_url):
+        start = time.perf_counter()
+        loop_result = await step_loop(
+            trajectory.instruction,
+            computer,
+            trajectory.image_width,
+            trajectory.image_height,
+            trajectory.screen_width,
+            trajectory.screen_height,
+            step_idx=step_idx,
+            max_iterations=max_iterations or len(trajectory.responses),
+            **(loop_kwargs or {}),
+        )
+        elapsed = time.perf_counter() - start
+
+    return {
+        "trajectory": str(trajectory_dir),
+        "wall_time_s": elapsed,
+        "model_calls": responder.calls,
+        "frames_served": interface.frames_served,
+        "commands_run": len(interface.commands),
+        "iteration_time_s": elapsed / max(1, responder.calls),
+        "loop": loop_result,
+    }
+
+
+async def benchmark_replay(trajectory_dirs: List[str], repeats: int = 3, exec_latency: float = 0.0) -> List[dict]:
+    """
+    Replay each trajectory several times and report the best and mean wall time.
+
+    Args:
+        trajectory_dirs: Trajectory directories to replay
+        repeats: Number of runs per trajectory
+        exec_latency: Seconds to emulate for each in-container script execution
+
+    Returns:
+        List[dict]: One summary per trajectory
+    """
+    summaries = []
+    for trajectory_dir in trajectory_dirs:
+        runs = []
+        for _ in range(repeats):
+            runs.append(await replay_trajectory(trajectory_dir, exec_latency=exec_latency))
+        times = [r["wall_time_s"] for r in runs]
+        summary = {
+            "trajectory": trajectory_dir,
+            "runs": repeats,
+            "model_calls": runs[0]["model_calls"],
+            "best_s": min(times),
+            "mean_s": sum(times) / len(times),
+        }
+        print(f"{trajectory_dir}: best {summary['best_s']:.3f}s, mean {summary['mean_s']:.3f}s over {repeats} run(s), {summary['model_calls']} model call(s)")
+        summaries.append(summary)
+    return summaries
+
+
+if __name__ == "__main__":
+    import sys
+
+    if len(sys.argv) < 2:
+        print("Usage: python replay.py <trajectory_dir> [<trajectory_dir> ...]")
+        sys.exit(1)
+    asyncio.run(benchmark_replay(sys.argv[1:]))
@@ -0,0 +1,335 @@
+import random
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Callable, Dict, List, Optional, TypeVar
+
+T = TypeVar("T")
+
+RETRYABLE_STATUS_CODES = {408, 409, 429, 500, 502, 503, 504}
+RETRYABLE_ERROR_NAMES = {"APITimeoutError", "APIConnectionError", "RateLimitError", "InternalServerError"}
+
+
+class RequestDeadlineExceeded(TimeoutError):
+    """Raised when a call (including its retries) does not finish within the configured deadline."""
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket rate limiter.
+
+    Args:
+        rate: Tokens added per second
+        capacity: Maximum burst size (defaults to max(1, rate))
+    """
+
+    def __init__(self, rate: float, capacity: Optional[float] = None):
+        if rate <= 0:
+            raise ValueError("TokenBucket rate must be positive")
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(1.0, rate)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def try_acquire(self, tokens: float = 1.0) -> bool:
+        with self._lock:
+            self._refill()
+            if self._tokens >= tokens:
+                self._tokens -= tokens
+                return True
+            return False
+
+    def acquire(self, tokens: float = 1.0, timeout: Optional[float] = None) -> bool:
+        """
+        Block until `tokens` are available.
+
+        Returns:
+            bool: True if acquired, False if `timeout` seconds passed first
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            with self._lock:
+                self._refill()
+                if self._tokens >= tokens:
+                    self._tokens -= tokens
+                    return True
+                wait_s = (tokens - self._tokens) / self.rate
+            if deadline is not None:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                wait_s = min(wait_s, remaining)
+            time.sleep(wait_s)
+
+
+class RequestMetrics:
+    """Counters and a latency window for one endpoint."""
+
+    def __init__(self, window: int = 200):
+        self.window = window
+        self.calls = 0
+        self.successes = 0
+        self.failures = 0
+        self.retries = 0
+        self.rate_limited_waits = 0
+        self.deadline_exceeded = 0
+        self.hedges_launched = 0
+        self.hedges_won = 0
+        self.latencies: List[float] = []
+        self._lock = threading.Lock()
+
+    def incr(self, name: str, amount: int = 1) -> None:
+        with self._lock:
+            setattr(self, name, getattr(self, name) + amount)
+
+    def observe(self, seconds: float) -> None:
+        with self._lock:
+            self.latencies.append(seconds)
+            if len(self.latencies) > self.window:
+                del self.latencies[: len(self.latencies) - self.window]
+
+    def quantile(self, q: float) -> Optional[float]:
+        with self._lock:
+            samples = sorted(self.latencies)
+        if not samples:
+            return None
+        return samples[min(len(samples) - 1, int(q * len(samples)))]
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            samples = sorted(self.latencies)
+            snap = {
+                "calls": self.calls,
+                "successes": self.successes,
+                "failures": self.failures,
+                "retries": self.retries,
+                "rate_limited_waits": self.rate_limited_waits,
+                "deadline_exceeded": self.deadline_exceeded,
+                "hedges_launched": self.hedges_launched,
+                "hedges_won": self.hedges_won,
+            }
+        if samples:
+            snap["p50_s"] = samples[int(0.50 * (len(samples) - 1))]
+            snap["p95_s"] = samples[int(0.95 * (len(samples) - 1))]
+        return snap
+
+
+def is_retryable_error(exc: BaseException) -> bool:
+    """
+    Decide whether a failed model call is worth retrying (rate limits, timeouts, 5xx, connection errors).
+    """
+    status = getattr(exc, "status_code", None)
+    if status is not None:
+        return status in RETRYABLE_STATUS_CODES
+    if type(exc).__name__ in RETRYABLE_ERROR_NAMES:
+        return True
+    return isinstance(exc, (TimeoutError, ConnectionError))
+
+
+def _retry_after_seconds(exc: BaseException) -> Optional[float]:
+    response = getattr(exc, "response", None)
+    headers = getattr(response, "headers", None)
+    if not headers:
+        return None
+    value = headers.get("retry-after")
+    try:
+        return float(value) if value is not None else None
+    except (TypeError, ValueError):
+        return None
+
+
+class RequestPolicy:
+    """
+    Rate limiting, bounded retries with jittered backoff, per-call deadlines and optional
+    request hedging for one model endpoint.
+
+    The wrapped callable receives the remaining time budget in seconds and should pass it
+    on as the request timeout, e.g.:
+
+        policy.call(lambda timeout: client.chat.completions.create(..., timeout=timeout))
+
+    Args:
+        rate: Requests per second allowed to the endpoint (None disables rate limiting)
+        burst: Token bucket capacity (defaults to max(1, rate))
+        max_retries: Retries after the first attempt for retryable errors
+        backoff_base: Base delay in seconds for exponential backoff
+        backoff_max: Upper bound for a single backoff delay
+        deadline: Total seconds allowed for a call including retries (None disables)
+        hedge: Launch a duplicate request when the first one is slower than the hedge quantile
+        hedge_quantile: Latency quantile that triggers a hedge (0.95 = p95)
+        hedge_min_samples: Observed calls needed before hedging kicks in
+        hedge_max_workers: Thread pool size used for hedged attempts
+    """
+
+    def __init__(self,
+                 rate: Optional[float] = None,
+                 burst: Optional[float] = None,
+                 max_retries: int = 3,
+                 backoff_base: float = 0.5,
+                 backoff_max: float = 8.0,
+                 deadline: Optional[float] = 120.0,
+                 hedge: bool = False,
+                 hedge_quantile: float = 0.95,
+                 hedge_min_samples: int = 20,
+                 hedge_max_workers: int = 8):
+        self.limiter = TokenBucket(rate, burst) if rate else None
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.deadline = deadline
+        self.hedge = hedge
+        self.hedge_quantile = hedge_quantile
+        self.hedge_min_samples = hedge_min_samples
+        self.metrics = RequestMetrics()
+        self._hedge_max_workers = hedge_max_workers
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._executor_lock = threading.Lock()
+
+    def _remaining(self, deadline_at: Optional[float]) -> Optional[float]:
+        if deadline_at is None:
+            return None
+        return deadline_at - time.monotonic()
+
+    def _acquire(self, deadline_at: Optional[float]) -> None:
+        if self.limiter is None:
+            return
+        if self.limiter.try_acquire():
+            return
+        self.metrics.incr("rate_limited_waits")
+        if not self.limiter.acquire(timeout=self._remaining(deadline_at)):
+            self.metrics.incr("deadline_exceeded")
+            raise RequestDeadlineExceeded("Deadline exceeded while waiting for the rate limiter")
+
+    def _backoff(self, attempt: int, exc: BaseException) -> float:
+        # Full jitter: uniform in [0, min(max, base * 2^attempt)], at least Retry-After if given
+        delay = random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+        retry_after = _retry_after_seconds(exc)
+        if retry_after is not None:
+            delay = max(delay, min(retry_after, self.backoff_max))
+        return delay
+
+    def _hedge_delay(self) -> Optional[float]:
+        if not self.hedge or len(self.metrics.latencies) < self.hedge_min_samples:
+            return None
+        return self.metrics.quantile(self.hedge_quantile)
+
+    def _pool(self) -> ThreadPoolExecutor:
+        with self._executor_lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self._hedge_max_workers, thread_name_prefix="hedge")
+            return self._executor
+
+    def _attempt(self, fn: Callable[[Optional[float]], T], deadline_at: Optional[float]) -> T:
+        hedge_delay = self._hedge_delay()
+        if hedge_delay is None:
+            return fn(self._remaining(deadline_at))
+
+        pool = self._pool()
+        primary = pool.submit(fn, self._remaining(deadline_at))
+        done, _ = wait([primary], timeout=hedge_delay)
+        if done:
+            return primary.result()
+        # Only hedge when there is budget left and the limiter allows an extra request
+        remaining = self._remaining(deadline_at)
+        if (remaining is not None and remaining <= 0) or (self.limiter is not None and not self.limiter.try_acquire()):
+            return primary.result(timeout=remaining)
+        self.metrics.incr("hedges_launched")
+        secondary = pool.submit(fn, remaining)
+        pending = {primary, secondary}
+        last_error: Optional[BaseException] = None
+        while pending:
+            done, pending = wait(pending, timeout=self._remaining(deadline_at), return_when=FIRST_COMPLETED)
+            if not done:
+                raise RequestDeadlineExceeded("Deadline exceeded while waiting for hedged requests")
+            for future in done:
+                if future.exception() is None:
+                    if future is secondary:
+                        self.metrics.incr("hedges_won")
+                    return future.result()
+                last_error = future.exception()
+        raise last_error
+
+    def call(self, fn: Callable[[Optional[float]], T]) -> T:
+        """
+        Run `fn` under this policy.
+
+        Args:
+            fn: Callable taking the remaining time budget in seconds (or None) and performing the request
+
+        Returns:
+            The value returned by the first successful attempt
+
+        Raises:
+            RequestDeadlineExceeded: If the deadline passes before a successful attempt
+            Exception: The last error when it is not retryable or retries are exhausted
+        """
+        self.metrics.incr("calls")
+        deadline_at = time.monotonic() + self.deadline if self.deadline else None
+        attempt = 0
+        while True:
+            self._acquire(deadline_at)
+            start = time.monotonic()
+            try:
+                result = self._attempt(fn, deadline_at)
+            except Exception as e:
+                remaining = self._remaining(deadline_at)
+                if not is_retryable_error(e) or attempt >= self.max_retries:
+                    self.metrics.incr("failures")
+                    raise
+                delay = self._backoff(attempt, e)
+                if remaining is not None and remaining <= delay:
+                    self.metrics.incr("failures")
+                    self.metrics.incr("deadline_exceeded")
+                    raise RequestDeadlineExceeded(f"Deadline exceeded after {attempt + 1} attempt(s): {e}") from e
+                print(f"Retrying model call after error ({type(e).__name__}), attempt {attempt + 2}/{self.max_retries + 1} in {delay:.2f}s")
+                self.metrics.incr("retries")
+                attempt += 1
+                time.sleep(delay)
+                continue
+            self.metrics.observe(time.monotonic() - start)
+            self.metrics.incr("successes")
+            return result
+
+
+_POLICIES: Dict[str, RequestPolicy] = {}
+_POLICIES_LOCK = threading.Lock()
+
+
+def configure_request_policy(endpoint: str, **kwargs) -> RequestPolicy:
+    """
+    Replace the policy used for `endpoint` (e.g. "tgi" or "openai").
+
+    Args:
+        endpoint: Endpoint name used by the call sites in core.py
+        **kwargs: RequestPolicy constructor arguments
+
+    Returns:
+        RequestPolicy: The newly installed policy
+    """
+    policy = RequestPolicy(**kwargs)
+    with _POLICIES_LOCK:
+        _POLICIES[endpoint] = policy
+    return policy
+
+
+def get_request_policy(endpoint: str) -> RequestPolicy:
+    """Return the policy for `endpoint`, creating one with default settings on first use."""
+    with _POLICIES_LOCK:
+        policy = _POLICIES.get(endpoint)
+        if policy is None:
+            policy = RequestPolicy()
+            _POLICIES[endpoint] = policy
+        return policy
+
+
+def get_request_metrics() -> Dict[str, dict]:
+    """Snapshot of retry/hedge/latency metrics for every endpoint seen so far."""
+    with _POLICIES_LOCK:
+        policies = dict(_POLICIES)
+    return {endpoint: policy.metrics.snapshot() for endpoint, policy in policies.items()}
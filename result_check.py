@@ -0,0 +1,344 @@
+import base64
+import hashlib
+import io
+import os
+import threading
+from collections import Counter
+from typing import Callable, Dict, Iterable, Optional, Sequence, Tuple, Union
+
+import numpy as np
+from PIL import Image
+
+from core import call_result_checking_model
+
+# (x1, y1, x2, y2) regions, normalized to the frame, that change between otherwise identical
+# screens; excluded from the local comparison. Top panel clock (centred, GNOME) and status
+# area (right), and the bottom-right clock/tray of a bottom taskbar (Windows, KDE, XFCE).
+DEFAULT_VOLATILE_REGIONS: Tuple[Tuple[float, float, float, float], ...] = (
+    (0.42, 0.0, 0.58, 0.035),
+    (0.82, 0.0, 1.0, 0.035),
+    (0.82, 0.95, 1.0, 1.0),
+)
+
+CHECK_FEATURE_SIZE = (256, 160)
+
+
+def _open_frame(image: Union[str, bytes, "Image.Image"]) -> "Image.Image":
+    if isinstance(image, str):
+        image = base64.b64decode(image)
+    if isinstance(image, (bytes, bytearray)):
+        image = Image.open(io.BytesIO(image))
+    return image
+
+
+def compute_check_features(image: Union[str, bytes, "Image.Image"], size: tuple = CHECK_FEATURE_SIZE) -> np.ndarray:
+    """
+    Downscaled grayscale frame used by the local result check.
+
+    Args:
+        image: Base64 string, PNG bytes or PIL Image
+        size: Thumbnail (width, height)
+
+    Returns:
+        np.ndarray: float32 array of shape (height, width)
+    """
+    return np.asarray(_open_frame(image).convert("L").resize(size, Image.BILINEAR), dtype=np.float32)
+
+
+def volatile_mask(shape: tuple, regions: Sequence[tuple]) -> np.ndarray:
+    """Boolean (height, width) mask that is False inside the normalized `regions`."""
+    height, width = shape
+    mask = np.ones(shape, dtype=bool)
+    for x1, y1, x2, y2 in regions:
+        mask[int(y1 * height):int(np.ceil(y2 * height)), int(x1 * width):int(np.ceil(x2 * width))] = False
+    return mask
+
+
+def _box_mean(x: np.ndarray, window: int) -> np.ndarray:
+    # Mean over a window x window neighbourhood (edge padded) via 2D cumulative sums
+    pad = window // 2
+    padded = np.pad(x, pad, mode="edge")
+    integral = np.pad(padded.cumsum(0).cumsum(1), ((1, 0), (1, 0)))
+    total = (integral[window:, window:] - integral[:-window, window:]
+             - integral[window:, :-window] + integral[:-window, :-window])
+    return total / float(window * window)
+
+
+def ssim(a: np.ndarray, b: np.ndarray, mask: Optional[np.ndarray] = None, window: int = 7) -> float:
+    """
+    Mean structural similarity of two grayscale frames (uniform window, 8-bit dynamic range).
+
+    Args:
+        a: First frame from compute_check_features
+        b: Second frame, same shape
+        mask: Optional boolean mask of the pixels that count toward the mean
+        window: Side of the square averaging window
+
+    Returns:
+        float: SSIM in [-1, 1] (1.0 means identical)
+    """
+    c1, c2 = (0.01 * 255) ** 2, (0.03 * 255) ** 2
+    a, b = a.astype(np.float64), b.astype(np.float64)
+    mu_a, mu_b = _box_mean(a, window), _box_mean(b, window)
+    var_a = _box_mean(a * a, window) - mu_a * mu_a
+    var_b = _box_mean(b * b, window) - mu_b * mu_b
+    cov = _box_mean(a * b, window) - mu_a * mu_b
+    ssim_map = ((2 * mu_a * mu_b + c1) * (2 * cov + c2)) / ((mu_a ** 2 + mu_b ** 2 + c1) * (var_a + var_b + c2))
+    if mask is not None:
+        return float(ssim_map[mask].mean()) if mask.any() else 1.0
+    return float(ssim_map.mean())
+
+
+def diff_histogram(a: np.ndarray, b: np.ndarray, mask: Optional[np.ndarray] = None, edges: Sequence[float] = (4, 24, 64, 256)) -> np.ndarray:
+    """
+    Fraction of (unmasked) pixels per absolute grayscale difference bucket.
+
+    With the default edges the buckets are [0, 4) (noise), [4, 24) (faint changes such as a
+    retyped digit at thumbnail scale), [24, 64) and [64, 256] (clearly different content).
+    """
+    diff = np.abs(a - b)
+    if mask is not None:
+        diff = diff[mask]
+    if diff.size == 0:
+        return np.zeros(len(edges), dtype=np.float64)
+    counts, _ = np.histogram(diff, bins=(0,) + tuple(edges))
+    return counts / float(diff.size)
+
+
+class TieredResultChecker:
+    """
+    Result checking that only calls the LLM checker when the local comparison is inconclusive.
+
+    Tier 1 compares downscaled grayscale frames (SSIM plus a histogram of per-pixel
+    differences, with volatile regions masked out). Frames with no visible difference pass
+    locally and clearly different frames (at or below `fail_ssim`, or at least
+    `fail_min_changed` clearly changed pixels) fail locally; everything in between escalates to
+    tier 2, `call_result_checking_model`. Frames of different resolutions always escalate.
+
+    The pass side has no tolerance by default: on the synthetic set of
+    benchmarks/result_check_tiers.py a blinking caret (a correct end state) changes 0.02% of the
+    thumbnail pixels while a single wrong digit in a field changes at most 0.012%, so any
+    tolerance that passes the caret also passes the wrong value. With the defaults that set
+    decides 30 of 100 checks locally (identical and clock-only frames pass, modal dialogs fail)
+    with no false pass or fail; a scrolled page (24% of pixels changed, 10% clearly) escalates.
+
+    Args:
+        pass_ssim: Minimum SSIM for a local pass
+        pass_max_changed: Maximum fraction of pixels outside the noise bucket for a local pass
+        fail_ssim: SSIM at or below which the check fails locally
+        fail_min_changed: Fraction of clearly changed pixels (difference >= 24) at or above
+                          which the check fails locally
+        fail_locally: Decide clear mismatches locally; False escalates them too
+        volatile_regions: Normalized (x1, y1, x2, y2) regions ignored by the local tier
+        size: Thumbnail size used for the local tier
+        llm_checker: Tier 2 callable with call_result_checking_model's signature
+    """
+
+    def __init__(self,
+                 pass_ssim: float = 0.995,
+                 pass_max_changed: float = 0.0,
+                 fail_ssim: float = 0.60,
+                 fail_min_changed: float = 0.30,
+                 fail_locally: bool = True,
+                 volatile_regions: Sequence[tuple] = DEFAULT_VOLATILE_REGIONS,
+                 size: tuple = CHECK_FEATURE_SIZE,
+                 llm_checker: Callable[..., dict] = call_result_checking_model):
+        self.pass_ssim = pass_ssim
+        self.pass_max_changed = pass_max_changed
+        self.fail_ssim = fail_ssim
+        self.fail_min_changed = fail_min_changed
+        self.fail_locally = fail_locally
+        self.volatile_regions = tuple(volatile_regions)
+        self.size = size
+        self.llm_checker = llm_checker
+        self._mask = volatile_mask((size[1], size[0]), self.volatile_regions)
+        self.decisions: Counter = Counter()
+
+    def local_check(self, expected: Union[str, bytes, np.ndarray], current: Union[str, bytes, np.ndarray], expected_size: Optional[tuple] = None) -> dict:
+        """
+        Tier 1 only.
+
+        Args:
+            expected: Expected view (base64, PNG bytes or precomputed features)
+            current: Current view (base64, PNG bytes or precomputed features)
+            expected_size: (width, height) of the expected view when `expected` is features
+
+        Raises:
+            ValueError: Precomputed features were not computed at this checker's `size`
+
+        Returns:
+            dict: {"decision": "pass" | "fail" | "escalate", "ssim": float, "changed": float,
+                   "histogram": List[float], "size_mismatch": bool} where "changed" is the
+                   fraction of clearly changed pixels
+        """
+        for name, value in (("expected", expected), ("current", current)):
+            if isinstance(value, np.ndarray) and value.shape != self._mask.shape:
+                raise ValueError(f"{name} features have shape {value.shape}, expected {self._mask.shape} "
+                                 f"(compute_check_features with size={self.size})")
+        if isinstance(expected, np.ndarray):
+            expected_features = expected
+        else:
+            expected_image = _open_frame(expected)
+            expected_size = expected_image.size
+            expected_features = compute_check_features(expected_image, self.size)
+        current_size = None
+        if isinstance(current, np.ndarray):
+            current_features = current
+        else:
+            current_image = _open_frame(current)
+            current_size = current_image.size
+            current_features = compute_check_features(current_image, self.size)
+        size_mismatch = expected_size is not None and current_size is not None and tuple(expected_size) != tuple(current_size)
+
+        score = ssim(expected_features, current_features, self._mask)
+        histogram = diff_histogram(expected_features, current_features, self._mask)
+        changed = float(histogram[2:].sum())
+        if size_mismatch:
+            decision = "escalate"
+        elif score >= self.pass_ssim and float(histogram[1:].sum()) <= self.pass_max_changed:
+            decision = "pass"
+        elif self.fail_locally and (score <= self.fail_ssim or changed >= self.fail_min_changed):
+            decision = "fail"
+        else:
+            decision = "escalate"
+        return {"decision": decision, "ssim": score, "changed": changed, "histogram": histogram.tolist(), "size_mismatch": size_mismatch}
+
+    def check(self, task_description: str, expected_view_base64: str, current_view_base64: str, expected_features: Optional[np.ndarray] = None, expected_size: Optional[tuple] = None) -> dict:
+        """
+        Same contract as call_result_checking_model, plus the deciding tier and local scores.
+
+        Args:
+            task_description: The description of the task to be checked
+            expected_view_base64: Base64 of the expected end-state screenshot (PNG)
+            current_view_base64: Base64 of the current screenshot (PNG)
+            expected_features: Precomputed compute_check_features of the expected view
+            expected_size: (width, height) of the expected view, needed with expected_features
+                           to detect a resolution mismatch (ExpectedView.image_size)
+
+        Returns:
+            dict: {"thoughts": str, "result": bool, "tier": "local" | "llm", "ssim": float, "changed": float}
+        """
+        if expected_features is not None:
+            local = self.local_check(expected_features, current_view_base64, expected_size=expected_size)
+        else:
+            local = self.local_check(expected_view_base64, current_view_base64)
+        if local["decision"] != "escalate":
+            self.decisions[("local", local["decision"])] += 1
+            thoughts = f"Decided locally: SSIM {local['ssim']:.4f}, {local['changed']:.2%} of pixels changed."
+            return {"thoughts": thoughts, "result": local["decision"] == "pass", "tier": "local", "ssim": local["ssim"], "changed": local["changed"]}
+
+        check = self.llm_checker(
+            task_description=task_description,
+            expected_view_base64=expected_view_base64,
+            current_view_base64=current_view_base64,
+        )
+        self.decisions[("llm", "pass" if check.get("result") else "fail")] += 1
+        return dict(check, tier="llm", ssim=local["ssim"], changed=local["changed"])
+
+    def stats(self) -> dict:
+        """How often each tier decided, and the share of checks that reached the LLM."""
+        total = sum(self.decisions.values())
+        local = sum(n for (tier, _), n in self.decisions.items() if tier == "local")
+        return {
+            "checks": total,
+            "local_pass": self.decisions[("local", "pass")],
+            "local_fail": self.decisions[("local", "fail")],
+            "llm_pass": self.decisions[("llm", "pass")],
+            "llm_fail": self.decisions[("llm", "fail")],
+            "local_rate": local / total if total else 0.0,
+            "llm_rate": (total - local) / total if total else 0.0,
+        }
+
+
+class ExpectedView:
+    """
+    A preloaded expected end-state image.
+
+    Args:
+        key: sha256 of the file contents
+        path: Source path
+        image_size: (width, height) of the original image
+        payloads: Base64 payloads keyed by (format, size); size None means the original size
+        features: compute_check_features of the image for the local check tier
+    """
+
+    __slots__ = ("key", "path", "image_size", "payloads", "features")
+
+    def __init__(self, key: str, path: str, image_size: tuple, payloads: Dict[tuple, str], features: np.ndarray):
+        self.key = key
+        self.path = path
+        self.image_size = image_size
+        self.payloads = payloads
+        self.features = features
+
+    def payload(self, fmt: str = "PNG", size: Optional[tuple] = None) -> str:
+        """Pre-encoded base64 payload; raises KeyError for a (format, size) the cache was not configured with."""
+        return self.payloads[(fmt.upper(), tuple(size) if size else None)]
+
+
+class ExpectedViewCache:
+    """
+    Expected end-state images decoded and encoded once, then shared by every check.
+
+    Entries are keyed by the sha256 of the file contents, so identical references at different
+    paths share one entry and an edited file gets a new one (a path is re-hashed only when its
+    size or mtime changes). Each entry holds a base64 payload per configured (format, size) and
+    the local-check features, so checking against it costs no image decoding or encoding.
+
+    Args:
+        formats: (format, size) pairs to pre-encode; size None keeps the original size
+        feature_size: Thumbnail size for the local check tier (see TieredResultChecker)
+    """
+
+    def __init__(self, formats: Sequence[tuple] = (("PNG", None),), feature_size: tuple = CHECK_FEATURE_SIZE):
+        self.formats = [(fmt.upper(), tuple(size) if size else None) for fmt, size in formats]
+        self.feature_size = feature_size
+        self._by_key: Dict[str, ExpectedView] = {}
+        self._by_path: Dict[str, Tuple[tuple, str]] = {}
+        self._lock = threading.Lock()
+
+    def _build(self, key: str, path: str, data: bytes) -> ExpectedView:
+        with Image.open(io.BytesIO(data)) as image:
+            image.load()
+            payloads = {}
+            for fmt, size in self.formats:
+                if fmt == (image.format or "").upper() and size is None:
+                    # The file already is this payload
+                    payloads[(fmt, size)] = base64.b64encode(data).decode("ascii")
+                    continue
+                variant = image.resize(size, Image.LANCZOS) if size else image
+                if fmt == "JPEG" and variant.mode != "RGB":
+                    variant = variant.convert("RGB")
+                buffered = io.BytesIO()
+                variant.save(buffered, format=fmt)
+                payloads[(fmt, size)] = base64.b64encode(buffered.getvalue()).decode("ascii")
+            features = compute_check_features(image, self.feature_size)
+            return ExpectedView(key, path, image.size, payloads, features)
+
+    def get(self, path: str) -> ExpectedView:
+        """Return the cached view for `path`, loading it on first use or after the file changed."""
+        path = os.path.abspath(path)
+        st = os.stat(path)
+        stamp = (st.st_size, st.st_mtime_ns)
+        with self._lock:
+            known = self._by_path.get(path)
+            if known is not None and known[0] == stamp:
+                return self._by_key[known[1]]
+        with open(path, "rb") as f:
+            data = f.read()
+        key = hashlib.sha256(data).hexdigest()
+        with self._lock:
+            view = self._by_key.get(key)
+        if view is None:
+            view = self._build(key, path, data)
+        with self._lock:
+            view = self._by_key.setdefault(key, view)
+            self._by_path[path] = (stamp, key)
+        return view
+
+    def preload(self, paths: Iterable[str]) -> None:
+        for path in paths:
+            self.get(path)
+
+    def __len__(self) -> int:
+        return len(self._by_key)
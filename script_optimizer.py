@@ -0,0 +1,283 @@
+import ast
+from collections import Counter
+from typing import Iterable, List, Optional, Tuple
+
+# Modules an integrated script may import
+ALLOWED_MODULES = {"pyautogui", "time", "pyperclip"}
+
+# Builtins that would let a script reach modules, files or objects outside the whitelist
+FORBIDDEN_CALLS = {"__import__", "exec", "eval", "compile", "open", "getattr", "setattr", "delattr", "globals", "locals",
+                   "vars", "breakpoint", "input"}
+
+# Modules the whitelisted modules import and expose as attributes (pyautogui.os, pyautogui.sys, ...)
+FORBIDDEN_ATTRIBUTES = {"os", "sys", "subprocess", "shutil", "platform", "importlib", "builtins", "socket", "ctypes",
+                        "pathlib", "io", "signal", "threading", "multiprocessing", "tempfile", "pickle", "shlex",
+                        "pymsgbox", "pyscreeze", "pytweening", "mouseinfo", "collections", "functools", "datetime",
+                        "re", "math", "types", "inspect"}
+
+# Keys whose press-and-release on its own does nothing. Alt (menu bar focus), Super/command
+# (Activities, Start menu) and fn are not in here: tapping them alone has an effect
+NOOP_MODIFIER_KEYS = {"ctrl", "ctrlleft", "ctrlright", "shift", "shiftleft", "shiftright"}
+
+CLICK_FUNCS = {"click", "doubleClick", "rightClick", "tripleClick", "middleClick"}
+
+
+class ScriptValidationError(ValueError):
+    """Raised when a script imports or reaches modules outside the whitelist."""
+
+
+class ActionIR:
+    """
+    Normalized form of one top-level statement.
+
+    kind is the pyautogui function name ("click", "moveTo", "hotkey", ...), "sleep" for
+    time.sleep, or "other" for anything the optimizer does not reason about. x/y are set when
+    the call has literal coordinates; keys holds literal hotkey keys; seconds the literal sleep.
+
+    This is not the parser's action dict ({"action_type", "action_inputs"}): those carry
+    normalized model-space boxes as strings and only cover actions the model can emit, while an
+    integrated script has screen-pixel pyautogui calls, sleeps and arbitrary statements, and
+    every rewrite has to go back to the statement's AST node.
+    """
+
+    __slots__ = ("kind", "node", "x", "y", "keys", "seconds")
+
+    def __init__(self, kind: str, node: ast.stmt, x=None, y=None, keys=None, seconds=None):
+        self.kind = kind
+        self.node = node
+        self.x = x
+        self.y = y
+        self.keys = keys
+        self.seconds = seconds
+
+    @property
+    def has_point(self) -> bool:
+        return self.x is not None and self.y is not None
+
+
+def _literal(node: Optional[ast.expr]):
+    if node is None:
+        return None
+    try:
+        return ast.literal_eval(node)
+    except ValueError:
+        return None
+
+
+def _call_of(stmt: ast.stmt) -> Optional[Tuple[str, str, ast.Call]]:
+    # (module, function, call) for statements of the form `module.function(...)`
+    if isinstance(stmt, ast.Expr) and isinstance(stmt.value, ast.Call):
+        func = stmt.value.func
+        if isinstance(func, ast.Attribute) and isinstance(func.value, ast.Name):
+            return func.value.id, func.attr, stmt.value
+    return None
+
+
+def _arg(call: ast.Call, position: int, name: str) -> Optional[ast.expr]:
+    if len(call.args) > position and not any(isinstance(a, ast.Starred) for a in call.args[:position + 1]):
+        return call.args[position]
+    for kw in call.keywords:
+        if kw.arg == name:
+            return kw.value
+    return None
+
+
+def to_ir(stmt: ast.stmt) -> ActionIR:
+    """Normalize one statement into an ActionIR."""
+    parsed = _call_of(stmt)
+    if parsed is None:
+        return ActionIR("other", stmt)
+    module, func, call = parsed
+    if module == "time" and func == "sleep":
+        seconds = _literal(_arg(call, 0, "secs"))
+        return ActionIR("sleep", stmt, seconds=seconds if isinstance(seconds, (int, float)) else None)
+    if module != "pyautogui":
+        return ActionIR("other", stmt)
+    if func == "hotkey":
+        keys = [_literal(a) for a in call.args]
+        return ActionIR("hotkey", stmt, keys=keys if all(isinstance(k, str) for k in keys) else None)
+    x, y = _literal(_arg(call, 0, "x")), _literal(_arg(call, 1, "y"))
+    if isinstance(x, (int, float)) and isinstance(y, (int, float)):
+        return ActionIR(func, stmt, x=x, y=y)
+    return ActionIR(func, stmt)
+
+
+def validate_script(tree: ast.AST, allowed_modules: Iterable[str] = ALLOWED_MODULES) -> None:
+    """
+    Raise ScriptValidationError unless the script only uses the whitelisted modules' public API.
+
+    Rejected: imports outside `allowed_modules`, the builtins in FORBIDDEN_CALLS, any name or
+    attribute starting with an underscore (__builtins__, __class__, ...), modules re-exported by
+    a whitelisted module (pyautogui.os) and attribute chains below a module attribute
+    (pyautogui.x.y). This is a static check of model-written scripts, not a sandbox: it keeps a
+    script to the calls it is expected to make, the container remains the isolation boundary.
+    """
+    allowed = set(allowed_modules)
+    # Names the script binds to whitelisted modules (import pyautogui as pg -> "pg")
+    module_names = set()
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Import):
+            for alias in node.names:
+                if alias.name.split(".")[0] not in allowed:
+                    raise ScriptValidationError(f"line {node.lineno}: import of '{alias.name}' is not allowed (allowed: {sorted(allowed)})")
+                module_names.add(alias.asname or alias.name.split(".")[0])
+        elif isinstance(node, ast.ImportFrom):
+            if (node.module or "").split(".")[0] not in allowed:
+                raise ScriptValidationError(f"line {node.lineno}: import of '{node.module or ''}' is not allowed (allowed: {sorted(allowed)})")
+            for alias in node.names:
+                if alias.name == "*" or alias.name.startswith("_") or alias.name in FORBIDDEN_ATTRIBUTES:
+                    raise ScriptValidationError(f"line {node.lineno}: import of '{alias.name}' from '{node.module}' is not allowed")
+
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Call) and isinstance(node.func, ast.Name) and node.func.id in FORBIDDEN_CALLS:
+            raise ScriptValidationError(f"line {node.lineno}: call to {node.func.id}() is not allowed")
+        if isinstance(node, ast.Name) and node.id.startswith("__") and node.id != "__name__":
+            raise ScriptValidationError(f"line {node.lineno}: access to '{node.id}' is not allowed")
+        if isinstance(node, ast.Attribute):
+            if node.attr.startswith("_"):
+                raise ScriptValidationError(f"line {node.lineno}: access to private attribute '{node.attr}' is not allowed")
+            base = node.value
+            if isinstance(base, ast.Name) and base.id in module_names and node.attr in FORBIDDEN_ATTRIBUTES:
+                raise ScriptValidationError(f"line {node.lineno}: access to '{base.id}.{node.attr}' is not allowed")
+            if isinstance(base, ast.Attribute) and isinstance(base.value, ast.Name) and base.value.id in module_names:
+                raise ScriptValidationError(f"line {node.lineno}: access to '{base.value.id}.{base.attr}.{node.attr}' is not allowed")
+
+
+def _sleep_stmt(seconds: float, like: ast.stmt) -> ast.stmt:
+    stmt = ast.parse(f"time.sleep({round(seconds, 3)!r})").body[0]
+    return ast.copy_location(stmt, like)
+
+
+def _clicks_in_place(ir: ActionIR) -> bool:
+    # click() with no coordinates at all acts on the current mouse position
+    call = ir.node.value
+    return not call.args and not any(kw.arg in ("x", "y") for kw in call.keywords)
+
+
+def _same_point(a: ActionIR, b: ActionIR) -> bool:
+    return a.has_point and b.has_point and a.x == b.x and a.y == b.y
+
+
+class _BodyOptimizer:
+    def __init__(self, dedupe_clicks: bool, min_dedupe_gap: float):
+        self.dedupe_clicks = dedupe_clicks
+        self.min_dedupe_gap = min_dedupe_gap
+        self.changes: List[str] = []
+        self.counts: Counter = Counter()
+
+    def _note(self, rule: str, stmt: ast.stmt, message: str) -> None:
+        self.counts[rule] += 1
+        self.changes.append(f"line {stmt.lineno}: {message}")
+
+    def optimize(self, body: List[ast.stmt]) -> List[ast.stmt]:
+        # Nested blocks (loops, ifs, functions) are optimized on their own
+        for stmt in body:
+            for field in ("body", "orelse", "finalbody"):
+                block = getattr(stmt, field, None)
+                if isinstance(block, list) and block and isinstance(block[0], ast.stmt):
+                    setattr(stmt, field, self.optimize(block) or [ast.Pass()])
+
+        irs = [to_ir(stmt) for stmt in body]
+        out: List[ActionIR] = []
+        for ir in irs:
+            # Drop hotkeys that press nothing, or only ctrl/shift
+            if ir.kind == "hotkey" and ir.keys is not None and all(k.lower() in NOOP_MODIFIER_KEYS for k in ir.keys):
+                self._note("noop_hotkey", ir.node, f"dropped no-op hotkey {tuple(ir.keys)}")
+                continue
+            # Coalesce consecutive sleeps
+            if ir.kind == "sleep" and out and out[-1].kind == "sleep" and ir.seconds is not None and out[-1].seconds is not None:
+                prev = out.pop()
+                merged = ActionIR("sleep", _sleep_stmt(prev.seconds + ir.seconds, prev.node), seconds=prev.seconds + ir.seconds)
+                self._note("coalesced_sleep", ir.node, f"merged time.sleep({ir.seconds!r}) into the previous sleep")
+                out.append(merged)
+                continue
+            # A move immediately followed by another move or by a click on the same point is redundant
+            if out and out[-1].kind == "moveTo":
+                prev = out[-1]
+                if ir.kind == "moveTo":
+                    out.pop()
+                    self._note("folded_move", prev.node, "dropped moveTo superseded by the next moveTo")
+                elif ir.kind in CLICK_FUNCS and (_same_point(prev, ir) or (prev.has_point and _clicks_in_place(ir))):
+                    out.pop()
+                    if not ir.has_point:
+                        # click() at the current position -> click(x, y)
+                        ir.node.value.args = list(prev.node.value.args[:2]) or [ast.Constant(prev.x), ast.Constant(prev.y)]
+                        ir.x, ir.y = prev.x, prev.y
+                    self._note("folded_move", prev.node, f"folded moveTo({prev.x}, {prev.y}) into {ir.kind}")
+            # Repeated click on the same point, separated only by sleeps long enough not to be a double click
+            if self.dedupe_clicks and ir.kind == "click":
+                gap, idx = 0.0, len(out) - 1
+                while idx >= 0 and out[idx].kind == "sleep" and out[idx].seconds is not None:
+                    gap += out[idx].seconds
+                    idx -= 1
+                if idx >= 0 and out[idx].kind == "click" and _same_point(out[idx], ir) and gap >= self.min_dedupe_gap \
+                        and ast.dump(out[idx].node) == ast.dump(ir.node):
+                    self._note("deduped_click", ir.node, f"dropped repeated click at ({ir.x}, {ir.y})")
+                    continue
+            out.append(ir)
+        return [ir.node for ir in out]
+
+
+def _sleep_total(tree: ast.AST) -> float:
+    total = 0.0
+    for node in ast.walk(tree):
+        if isinstance(node, ast.stmt):
+            ir = to_ir(node)
+            if ir.kind == "sleep" and ir.seconds is not None:
+                total += ir.seconds
+    return total
+
+
+def optimize_script(source: str, dedupe_clicks: bool = False, min_dedupe_gap: float = 0.5, drop_trailing_sleep: bool = False,
+                    allowed_modules: Iterable[str] = ALLOWED_MODULES) -> Tuple[str, dict]:
+    """
+    Validate and shorten an integrated PyAutoGUI script.
+
+    Passes (each statement list is processed on its own, top-level and nested):
+    - drop a moveTo followed directly by another moveTo, or by a click on the same point
+      (a bare click() after moveTo(x, y) becomes click(x, y))
+    - merge consecutive time.sleep calls
+    - drop hotkeys that press no key, or only ctrl/shift (alt, win/command are kept: on their
+      own they focus the menu bar or open the Activities/Start menu)
+    - opt-in: drop a left click repeated on the same point with only sleeps in between
+      (at least `min_dedupe_gap` seconds, so double clicks are kept)
+    - opt-in: drop sleeps at the very end of the script
+
+    Args:
+        source: Script source
+        dedupe_clicks: Enable the repeated-click pass. Off by default: a second click on the
+                       same point is meaningful for toggles, checkboxes and focus-then-activate flows
+        min_dedupe_gap: Minimum sleep between two identical clicks for the second to be dropped
+        drop_trailing_sleep: Drop the final sleeps. Off by default: they let the UI settle
+                             before whatever runs next (e.g. an end-state screenshot)
+        allowed_modules: Modules the script may import
+
+    Returns:
+        Tuple[str, dict]: (optimized source, report with "changes", "counts", statement and
+                          sleep totals before/after)
+
+    Raises:
+        ScriptValidationError: The script uses modules or calls outside the whitelist (see validate_script)
+        SyntaxError: The script does not parse
+    """
+    tree = ast.parse(source)
+    validate_script(tree, allowed_modules)
+    statements_before = sum(isinstance(n, ast.stmt) for n in ast.walk(tree))
+    sleep_before = _sleep_total(tree)
+
+    optimizer = _BodyOptimizer(dedupe_clicks, min_dedupe_gap)
+    tree.body = optimizer.optimize(tree.body)
+    while drop_trailing_sleep and tree.body and to_ir(tree.body[-1]).kind == "sleep":
+        optimizer._note("trailing_sleep", tree.body[-1], "dropped sleep at the end of the script")
+        tree.body.pop()
+    ast.fix_missing_locations(tree)
+
+    report = {
+        "changes": optimizer.changes,
+        "counts": dict(optimizer.counts),
+        "statements_before": statements_before,
+        "statements_after": sum(isinstance(n, ast.stmt) for n in ast.walk(tree)),
+        "sleep_before_s": sleep_before,
+        "sleep_after_s": _sleep_total(tree),
+    }
+    return ast.unparse(tree) + "\n", report
@@ -0,0 +1,137 @@
+import base64
+import io
+import json
+import os
+import shlex
+import subprocess
+import sys
+import tarfile
+import tempfile
+from typing import List, Optional, Tuple
+
+BUNDLE_MANIFEST = "manifest.json"
+BUNDLE_RESULTS = "results.json"
+BUNDLE_DRIVER = "driver.py"
+
+# Runs inside the container (python3 stdlib + pyautogui for optional screenshots). Executes the
+# steps listed in manifest.json in order and writes one results.json for the whole workflow.
+DRIVER_SOURCE = r'''
+import base64
+import json
+import os
+import subprocess
+import sys
+import time
+
+bundle_dir = os.path.dirname(os.path.abspath(__file__))
+with open(os.path.join(bundle_dir, "manifest.json"), "r", encoding="utf-8") as f:
+    manifest = json.load(f)
+
+results = {"steps": [], "completed": True}
+for idx, step in enumerate(manifest["steps"]):
+    record = {"name": step["name"], "rc": None, "stdout": "", "stderr": ""}
+    start = time.time()
+    try:
+        proc = subprocess.run([sys.executable, os.path.join(bundle_dir, step["path"])], capture_output=True,
+                              text=True, timeout=manifest["timeout"])
+        record.update(rc=proc.returncode, stdout=proc.stdout, stderr=proc.stderr)
+    except subprocess.TimeoutExpired as e:
+        record.update(rc=124, stdout=e.stdout or "", stderr=e.stderr or "")
+        if isinstance(record["stdout"], bytes):
+            record["stdout"] = record["stdout"].decode("utf-8", "replace")
+        if isinstance(record["stderr"], bytes):
+            record["stderr"] = record["stderr"].decode("utf-8", "replace")
+    for stray in ("xclip", "xsel"):
+        subprocess.run(["pkill", "-f", stray], capture_output=True)
+    record["duration_s"] = time.time() - start
+    time.sleep(manifest["settle_time"])
+    if manifest["screenshots"]:
+        shot_path = os.path.join(bundle_dir, "step_%03d.png" % (idx + 1))
+        try:
+            import pyautogui
+            pyautogui.screenshot().save(shot_path)
+            with open(shot_path, "rb") as f:
+                record["screenshot_b64"] = base64.b64encode(f.read()).decode("ascii")
+        except Exception as e:
+            record["screenshot_error"] = str(e)
+    results["steps"].append(record)
+    if record["rc"] != 0 and manifest["stop_on_error"]:
+        results["completed"] = False
+        break
+
+with open(os.path.join(bundle_dir, "results.json"), "w", encoding="utf-8") as f:
+    json.dump(results, f)
+'''
+
+
+def build_bundle(snippets: List[Tuple[str, str]], timeout: float = 15.0, settle_time: float = 0.5, screenshots: bool = False, stop_on_error: bool = False) -> bytes:
+    """
+    Pack a workflow's snippets and the in-container driver into one gzipped tar archive.
+
+    Args:
+        snippets: (name, code) pairs in execution order
+        timeout: Per-step timeout in seconds (rc 124 on expiry, like timeout(1))
+        settle_time: Seconds to wait after each step
+        screenshots: Capture a screenshot after each step into the result manifest
+        stop_on_error: Stop at the first step with a non-zero rc
+
+    Returns:
+        bytes: The archive
+    """
+    manifest = {"timeout": timeout, "settle_time": settle_time, "screenshots": screenshots, "stop_on_error": stop_on_error, "steps": []}
+    files = {BUNDLE_DRIVER: DRIVER_SOURCE}
+    for idx, (name, code) in enumerate(snippets, 1):
+        path = f"steps/{idx:03d}_{os.path.splitext(os.path.basename(name))[0]}.py"
+        files[path] = code
+        manifest["steps"].append({"name": name, "path": path})
+    files[BUNDLE_MANIFEST] = json.dumps(manifest)
+
+    buffered = io.BytesIO()
+    with tarfile.open(fileobj=buffered, mode="w:gz") as tar:
+        for path, content in files.items():
+            data = content.encode("utf-8")
+            info = tarfile.TarInfo(path)
+            info.size = len(data)
+            tar.addfile(info, io.BytesIO(data))
+    return buffered.getvalue()
+
+
+def _driver_command(remote_dir: str, archive_b64_path: str) -> str:
+    remote_dir, driver, archive_b64_path = shlex.quote(remote_dir), shlex.quote(f"{remote_dir}/{BUNDLE_DRIVER}"), shlex.quote(archive_b64_path)
+    script = f"rm -rf {remote_dir} && mkdir -p {remote_dir} && base64 -d {archive_b64_path} | tar xzf - -C {remote_dir} && python3 {driver}"
+    return f"bash -lc {shlex.quote(script)}"
+
+
+async def run_bundle_docker(computer, bundle: bytes, remote_dir: str = "/tmp/snippet_bundle") -> dict:
+    """
+    Upload a bundle to the container in one transfer, run its driver and return the result manifest.
+
+    Three round trips regardless of the number of steps: upload, run, read results.
+
+    Returns:
+        dict: {"steps": [{"name", "rc", "stdout", "stderr", "duration_s", ["screenshot_b64"]}], "completed": bool}
+    """
+    archive_b64_path = f"{remote_dir}.tgz.b64"
+    await computer.interface.write_text(archive_b64_path, base64.b64encode(bundle).decode("ascii"))
+    result = await computer.interface.run_command(_driver_command(remote_dir, archive_b64_path))
+    if result.returncode != 0:
+        return {"steps": [], "completed": False, "error": f"Driver exited with {result.returncode}; driver stderr: {result.stderr}"}
+    try:
+        return json.loads(await computer.interface.read_text(f"{remote_dir}/{BUNDLE_RESULTS}"))
+    except Exception as e:
+        return {"steps": [], "completed": False, "error": f"No result manifest ({e}); driver stderr: {result.stderr}"}
+
+
+def run_bundle_local(bundle: bytes, work_dir: Optional[str] = None) -> dict:
+    """Run a bundle with the local interpreter (same driver, same result manifest)."""
+    work_dir = work_dir or tempfile.mkdtemp(prefix="snippet_bundle_")
+    with tarfile.open(fileobj=io.BytesIO(bundle), mode="r:gz") as tar:
+        tar.extractall(work_dir, filter="data")
+    result = subprocess.run([sys.executable, os.path.join(work_dir, BUNDLE_DRIVER)], capture_output=True, text=True)
+    if result.returncode != 0:
+        return {"steps": [], "completed": False, "error": f"Driver exited with {result.returncode}; driver stderr: {result.stderr}"}
+    try:
+        with open(os.path.join(work_dir, BUNDLE_RESULTS), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except Exception as e:
+        return {"steps": [], "completed": False, "error": f"No result manifest ({e}); driver stderr: {result.stderr}"}
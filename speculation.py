@@ -0,0 +1,151 @@
+import asyncio
+import base64
+import io
+import time
+from typing import Optional, Set, Union
+
+import numpy as np
+from PIL import Image
+
+from core import AutomationState, MessageBudget, acall_ui_grounding_model_with_messages, build_messages_with_budget, build_messages_with_state
+
+# Actions after which the screen usually changes only locally (focus ring, caret), so the
+# next model call can be issued before the post-action screenshot exists
+PREDICTABLE_ACTION_TYPES = {"click", "left_single", "left_double"}
+
+
+def _to_gray_thumbnail(image: Union[str, bytes, "Image.Image"], size: tuple) -> np.ndarray:
+    if isinstance(image, str):
+        image = base64.b64decode(image)
+    if isinstance(image, (bytes, bytearray)):
+        image = Image.open(io.BytesIO(image))
+    thumb = image.convert("L").resize(size, Image.BILINEAR)
+    return np.asarray(thumb, dtype=np.float32)
+
+
+def frame_similarity(a: Union[str, bytes, "Image.Image"], b: Union[str, bytes, "Image.Image"], size: tuple = (192, 120)) -> float:
+    """
+    Cheap similarity between two frames: 1 - mean absolute difference of downscaled grayscale
+    thumbnails, in [0, 1] (1.0 means identical at thumbnail resolution).
+
+    Args:
+        a: First frame as base64 string, PNG bytes or PIL Image
+        b: Second frame, same accepted types
+        size: Thumbnail (width, height) used for the comparison
+
+    Returns:
+        float: Similarity score
+    """
+    diff = np.abs(_to_gray_thumbnail(a, size) - _to_gray_thumbnail(b, size))
+    return float(1.0 - diff.mean() / 255.0)
+
+
+class SpeculativePrefetcher:
+    """
+    Issue the next grounding request while the current action is still executing.
+
+    The speculative request is built from the state as it will look after the action is
+    recorded, with the pre-action frame standing in for the post-action frame. Once the real
+    screenshot arrives it is compared against that frame: if they are similar enough the
+    speculative response is committed (hit), otherwise it is discarded and the caller makes a
+    regular model call (miss).
+
+    Args:
+        similarity_threshold: Minimum frame_similarity to commit a speculative response
+        action_types: Action types after which speculation is attempted
+        message_budget: The step loop's message budget (MessageBudget or preset name), so the
+                        speculative prompt is built exactly like the regular one; None keeps
+                        build_messages_with_state
+    """
+
+    def __init__(self, similarity_threshold: float = 0.985, action_types: Optional[Set[str]] = None, message_budget: Union[str, MessageBudget, None] = None):
+        self.similarity_threshold = similarity_threshold
+        self.action_types = action_types if action_types is not None else set(PREDICTABLE_ACTION_TYPES)
+        self.message_budget = message_budget
+        self._task: Optional[asyncio.Task] = None
+        self._frame_b64: Optional[str] = None
+        self._started_at = 0.0
+        self._finished_at: Optional[float] = None
+        self.speculations = 0
+        self.hits = 0
+        self.misses = 0
+        self.latency_saved_s = 0.0
+
+    def should_speculate(self, structured_actions: list) -> bool:
+        return len(structured_actions) == 1 and structured_actions[0].get("action_type") in self.action_types
+
+    def start(self, state: AutomationState, frame_b64: str, thought: str, action_str: str) -> None:
+        """
+        Launch the speculative request for the step that will follow `action_str`.
+
+        Args:
+            state: Current state (not modified)
+            frame_b64: Screenshot the action was planned on, used as the predicted next frame
+            thought: Thought of the action being executed
+            action_str: Action being executed
+        """
+        self.discard()
+        predicted = state.copy()
+        predicted.add_step(before_image_b64=frame_b64, thought=thought, action_str=action_str)
+        if self.message_budget is None:
+            messages = build_messages_with_state(predicted, frame_b64)
+        else:
+            messages = build_messages_with_budget(predicted, frame_b64, self.message_budget)
+        self._frame_b64 = frame_b64
+        self._started_at = time.perf_counter()
+        self._finished_at = None
+        self._task = asyncio.create_task(acall_ui_grounding_model_with_messages(messages))
+        self._task.add_done_callback(self._mark_finished)
+        self.speculations += 1
+
+    def _mark_finished(self, task: asyncio.Task) -> None:
+        self._finished_at = time.perf_counter()
+
+    async def resolve(self, real_frame_b64: str) -> Optional[str]:
+        """
+        Validate the pending speculation against the real post-action frame.
+
+        Returns:
+            Optional[str]: The speculative model response on a hit, None on a miss or when
+                           nothing was speculated
+        """
+        if self._task is None:
+            return None
+        task, frame_b64, started_at = self._task, self._frame_b64, self._started_at
+        self._task, self._frame_b64 = None, None
+        resolved_at = time.perf_counter()
+
+        similarity = await asyncio.to_thread(frame_similarity, frame_b64, real_frame_b64)
+        if similarity < self.similarity_threshold:
+            task.cancel()
+            self.misses += 1
+            print(f"Speculation discarded (frame similarity {similarity:.4f})")
+            return None
+        try:
+            response = await task
+        except Exception as e:
+            self.misses += 1
+            print(f"Speculative request failed: {e}")
+            return None
+        # Time already spent in flight before the real frame existed is latency the step did not pay
+        in_flight_until = self._finished_at if self._finished_at is not None else resolved_at
+        self.latency_saved_s += max(0.0, min(in_flight_until, resolved_at) - started_at)
+        self.hits += 1
+        print(f"Speculation committed (frame similarity {similarity:.4f})")
+        return response
+
+    def discard(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            self._task, self._frame_b64 = None, None
+
+    def stats(self) -> dict:
+        resolved = self.hits + self.misses
+        return {
+            "speculations": self.speculations,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / resolved if resolved else 0.0,
+            "latency_saved_s": self.latency_saved_s,
+            "mean_saved_per_hit_s": self.latency_saved_s / self.hits if self.hits else 0.0,
+        }
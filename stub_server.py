@@ -0,0 +1,547 @@
+import argparse
+import hashlib
+import json
+import math
+import random
+import threading
+import time
+import uuid
+import urllib.request
+from collections import OrderedDict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, List, Optional, Tuple
+
+# UI-TARS emits absolute coordinates on the smart-resized model grid
+STUB_GRID_WIDTH, STUB_GRID_HEIGHT = 2884, 1792
+
+
+class ScriptedResponder:
+    """
+    Serve a fixed list of model responses in order, one per chat completion request.
+
+    Args:
+        responses: Raw model responses (e.g. "Thought: ...\\nAction: ...") to return in order
+        loop: Start over from the first response when the list is exhausted; otherwise keep
+              returning the last one
+    """
+
+    def __init__(self, responses: List[str], loop: bool = False):
+        if not responses:
+            raise ValueError("ScriptedResponder needs at least one response")
+        self.responses = list(responses)
+        self.loop = loop
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def __call__(self, request: dict) -> str:
+        with self._lock:
+            idx = self.calls
+            self.calls += 1
+        if self.loop:
+            return self.responses[idx % len(self.responses)]
+        return self.responses[min(idx, len(self.responses) - 1)]
+
+
+class CannedUITarsResponder:
+    """
+    Generate plausible UI-TARS responses in the `Thought: ...\nAction: ...` format.
+
+    Actions are drawn from a weighted mix of click/type/hotkey/scroll/finished with
+    `<point>` coordinates on the model grid, so the parse/codegen path sees realistic input.
+
+    Args:
+        seed: Seed for the random generator (responses are reproducible per seed)
+        finish_every: Emit `finished(...)` on every n-th call (0 disables)
+    """
+
+    ACTIONS = [
+        ("click", 0.45),
+        ("type", 0.25),
+        ("hotkey", 0.1),
+        ("scroll", 0.1),
+        ("left_double", 0.05),
+        ("wait", 0.05),
+    ]
+    WORDS = ["E01257444", "11", "01", "1992", "Benefit Details", "search term", "it's done\\n"]
+
+    def __init__(self, seed: int = 0, finish_every: int = 0):
+        self.random = random.Random(seed)
+        self.finish_every = finish_every
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def _point(self) -> str:
+        return f"<point>{self.random.randint(0, STUB_GRID_WIDTH - 1)} {self.random.randint(0, STUB_GRID_HEIGHT - 1)}</point>"
+
+    def __call__(self, request: dict) -> str:
+        with self._lock:
+            self.calls += 1
+            if self.finish_every and self.calls % self.finish_every == 0:
+                return "Thought: The task has been completed as requested.\nAction: finished(content='true')"
+            names, weights = zip(*self.ACTIONS)
+            action_type = self.random.choices(names, weights=weights)[0]
+            if action_type == "type":
+                action = f"type(content='{self.random.choice(self.WORDS)}')"
+                thought = "The input field is focused, so I can type the value directly."
+            elif action_type == "hotkey":
+                action = f"hotkey(key='{self.random.choice(['ctrl a', 'ctrl c', 'enter', 'tab'])}')"
+                thought = "I should use a keyboard shortcut to move on."
+            elif action_type == "scroll":
+                action = f"scroll(point='{self._point()}', direction='{self.random.choice(['up', 'down'])}')"
+                thought = "The target is not visible yet, I need to scroll."
+            elif action_type == "wait":
+                action = "wait()"
+                thought = "The page is still loading, I should wait."
+            else:
+                action = f"{action_type}(point='{self._point()}')"
+                thought = "I can see the target element on the page and need to click on it."
+            return f"Thought: {thought}\nAction: {action}"
+
+
+class ProxyResponder:
+    """
+    Forward requests to a real OpenAI-compatible endpoint and report every response.
+
+    Used to record trajectories against TGI without touching the calling code.
+
+    Args:
+        upstream_base_url: Base URL of the real endpoint (e.g. the value of TGI_BASE_URL)
+        api_key: Bearer token for the upstream endpoint
+        on_response: Optional callback receiving (request, content) for every response
+        timeout: Upstream request timeout in seconds
+    """
+
+    def __init__(self, upstream_base_url: str, api_key: str = "", on_response: Optional[Callable[[dict, str], None]] = None, timeout: float = 120.0):
+        self.url = upstream_base_url.rstrip("/") + "/chat/completions"
+        self.api_key = api_key
+        self.on_response = on_response
+        self.timeout = timeout
+
+    def __call__(self, request: dict) -> str:
+        body = dict(request)
+        body["stream"] = False
+        req = urllib.request.Request(
+            self.url,
+            data=json.dumps(body).encode("utf-8"),
+            headers={"Content-Type": "application/json", "Authorization": f"Bearer {self.api_key}"},
+            method="POST",
+        )
+        with urllib.request.urlopen(req, timeout=self.timeout) as resp:
+            payload = json.loads(resp.read().decode("utf-8"))
+        content = payload["choices"][0]["message"]["content"] or ""
+        if self.on_response is not None:
+            self.on_response(request, content)
+        return content
+
+
+class Distribution:
+    """
+    A small parametric distribution used to model latencies and token rates.
+
+    Spec strings (also accepted on the command line):
+        "0.5"                    constant
+        "uniform:0.2,0.8"        uniform between low and high
+        "normal:0.5,0.1"         normal with mean and stddev (clamped at 0)
+        "lognormal:-0.7,0.4"     lognormal with mu and sigma of the underlying normal
+    """
+
+    def __init__(self, kind: str = "constant", params: Tuple[float, ...] = (0.0,)):
+        if kind not in ("constant", "uniform", "normal", "lognormal"):
+            raise ValueError(f"Unknown distribution: {kind}")
+        self.kind = kind
+        self.params = tuple(float(p) for p in params)
+
+    @classmethod
+    def parse(cls, spec: str) -> "Distribution":
+        if ":" not in spec:
+            return cls("constant", (float(spec),))
+        kind, raw = spec.split(":", 1)
+        return cls(kind.strip(), tuple(float(p) for p in raw.split(",")))
+
+    def sample(self, rng: random.Random) -> float:
+        if self.kind == "constant":
+            return self.params[0]
+        if self.kind == "uniform":
+            return rng.uniform(self.params[0], self.params[1])
+        if self.kind == "normal":
+            return max(0.0, rng.gauss(self.params[0], self.params[1]))
+        return rng.lognormvariate(self.params[0], self.params[1])
+
+    def mean(self) -> float:
+        if self.kind == "constant":
+            return self.params[0]
+        if self.kind == "uniform":
+            return (self.params[0] + self.params[1]) / 2
+        if self.kind == "normal":
+            return self.params[0]
+        return math.exp(self.params[0] + self.params[1] ** 2 / 2)
+
+    def __repr__(self) -> str:
+        return f"Distribution({self.kind}, {self.params})"
+
+
+class LatencyModel:
+    """
+    Timing model for a stubbed completion: time to first token plus per-token decode time.
+
+    Args:
+        first_token: Distribution of time to first token in seconds (prefill + queueing)
+        token_rate: Distribution of decode speed in tokens per second (0 means instantaneous)
+        seed: Seed for the sampling generator
+    """
+
+    def __init__(self, first_token: Optional[Distribution] = None, token_rate: Optional[Distribution] = None, seed: int = 0):
+        self.first_token = first_token or Distribution()
+        self.token_rate = token_rate or Distribution()
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def sample(self) -> Tuple[float, float]:
+        """
+        Returns:
+            Tuple[float, float]: (seconds to first token, seconds per subsequent token)
+        """
+        with self._lock:
+            ttft = self.first_token.sample(self._rng)
+            rate = self.token_rate.sample(self._rng)
+        per_token = 1.0 / rate if rate > 0 else 0.0
+        return ttft, per_token
+
+
+class PrefixCacheModel:
+    """
+    Simulate server-side prefix (KV) caching for benchmarking prompt layouts.
+
+    Like paged KV caches, the rendered prompt is cached in blocks: each message contributes a
+    role block, its text in blocks of `block_tokens` (~4 characters per token) and one block
+    per image. The longest leading run of blocks seen before (byte-identical, including
+    everything before them) counts as cached, and only the remaining prompt tokens pay prefill
+    time at `prefill_tokens_per_s`. Blocks are kept in an LRU of `capacity` entries.
+
+    Args:
+        prefill_tokens_per_s: Prefill throughput for uncached prompt tokens
+        capacity: Number of cached blocks
+        block_tokens: Text tokens per cache block
+    """
+
+    def __init__(self, prefill_tokens_per_s: float = 4000.0, capacity: int = 65536, block_tokens: int = 16):
+        self.prefill_tokens_per_s = prefill_tokens_per_s
+        self.capacity = capacity
+        self.block_tokens = block_tokens
+        self.prompt_tokens = 0
+        self.cached_tokens = 0
+        self._cache: "OrderedDict[str, None]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _blocks(self, messages: list) -> list:
+        from core import _MESSAGE_OVERHEAD_TOKENS, estimate_message_tokens
+
+        block_chars = 4 * self.block_tokens
+        blocks = []
+        for message in messages:
+            blocks.append((("role:" + message["role"]).encode("utf-8"), _MESSAGE_OVERHEAD_TOKENS))
+            content = message["content"]
+            parts = [{"type": "text", "text": content}] if isinstance(content, str) else content
+            for part in parts:
+                if part["type"] == "text":
+                    text = part["text"]
+                    for offset in range(0, len(text), block_chars):
+                        blocks.append((text[offset:offset + block_chars].encode("utf-8"), len(text[offset:offset + block_chars]) / 4))
+                elif part["type"] == "image_url":
+                    image_message = {"role": message["role"], "content": [part]}
+                    blocks.append((part["image_url"]["url"].encode("utf-8"), estimate_message_tokens([image_message])[0] - _MESSAGE_OVERHEAD_TOKENS))
+        return blocks
+
+    def prefill_seconds(self, messages: list) -> float:
+        blocks = self._blocks(messages)
+        digest = hashlib.sha256()
+        prefix_keys = []
+        for data, _ in blocks:
+            digest.update(len(data).to_bytes(8, "little") + data)
+            prefix_keys.append(digest.copy().hexdigest())
+
+        with self._lock:
+            cached_blocks = 0
+            for idx, key in enumerate(prefix_keys):
+                if key not in self._cache:
+                    break
+                self._cache.move_to_end(key)
+                cached_blocks = idx + 1
+            for key in prefix_keys[cached_blocks:]:
+                self._cache[key] = None
+            while len(self._cache) > self.capacity:
+                self._cache.popitem(last=False)
+            cached = round(sum(tokens for _, tokens in blocks[:cached_blocks]))
+            total = round(sum(tokens for _, tokens in blocks))
+            self.prompt_tokens += total
+            self.cached_tokens += cached
+        return (total - cached) / self.prefill_tokens_per_s
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "prompt_tokens": self.prompt_tokens,
+                "cached_tokens": self.cached_tokens,
+                "cache_hit_ratio": self.cached_tokens / self.prompt_tokens if self.prompt_tokens else 0.0,
+            }
+
+
+def estimate_completion_tokens(content: str) -> int:
+    """Rough token count for generated text (~4 characters per token)."""
+    return max(1, len(content) // 4)
+
+
+def build_chat_completion(content: str, model: str = "tgi") -> dict:
+    """
+    Wrap a response string into a non-streaming chat.completion payload.
+
+    Args:
+        content: Assistant message content
+        model: Model name echoed back to the client
+
+    Returns:
+        dict: JSON-serializable chat.completion object
+    """
+    completion_tokens = estimate_completion_tokens(content)
+    return {
+        "id": f"chatcmpl-{uuid.uuid4().hex[:24]}",
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": model,
+        "choices": [
+            {
+                "index": 0,
+                "message": {"role": "assistant", "content": content},
+                "finish_reason": "stop",
+            }
+        ],
+        "usage": {
+            "prompt_tokens": 0,
+            "completion_tokens": completion_tokens,
+            "total_tokens": completion_tokens,
+        },
+    }
+
+
+def build_chat_completion_chunk(completion_id: str, delta: dict, model: str = "tgi", finish_reason: Optional[str] = None) -> dict:
+    """Build one `chat.completion.chunk` event for streaming responses."""
+    return {
+        "id": completion_id,
+        "object": "chat.completion.chunk",
+        "created": int(time.time()),
+        "model": model,
+        "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}],
+    }
+
+
+def _split_tokens(content: str, chars_per_token: int = 4) -> List[str]:
+    return [content[i:i + chars_per_token] for i in range(0, len(content), chars_per_token)] or [""]
+
+
+class _StubRequestHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        # Keep benchmark output clean
+        return
+
+    def _send_json(self, status: int, payload: dict) -> None:
+        data = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        path = self.path.rstrip("/")
+        if path in ("/health", "/v1/health"):
+            if self.server.stub.healthy:
+                self._send_json(200, {"status": "ok"})
+            else:
+                self._send_json(503, {"status": "unavailable"})
+        elif path == "/v1/models":
+            self._send_json(200, {"object": "list", "data": [{"id": "tgi", "object": "model", "owned_by": "stub"}]})
+        else:
+            self._send_json(404, {"error": {"message": f"Unknown path: {self.path}"}})
+
+    def do_POST(self):
+        if self.path.rstrip("/") != "/v1/chat/completions":
+            self._send_json(404, {"error": {"message": f"Unknown path: {self.path}"}})
+            return
+        length = int(self.headers.get("Content-Length") or 0)
+        try:
+            request = json.loads(self.rfile.read(length).decode("utf-8") or "{}")
+        except json.JSONDecodeError as e:
+            self._send_json(400, {"error": {"message": f"Invalid JSON body: {e}"}})
+            return
+        stub: "ChatCompletionsStub" = self.server.stub
+        start = time.perf_counter()
+        try:
+            content = stub.responder(request)
+        except Exception as e:
+            self._send_json(500, {"error": {"message": f"Responder failed: {e}"}})
+            return
+        model = request.get("model", "tgi")
+        ttft, per_token = stub.latency.sample()
+        if stub.prefix_cache is not None:
+            ttft += stub.prefix_cache.prefill_seconds(request.get("messages") or [])
+        if request.get("stream"):
+            self._stream(content, model, ttft, per_token)
+        else:
+            time.sleep(ttft + per_token * max(0, estimate_completion_tokens(content) - 1))
+            self._send_json(200, build_chat_completion(content, model=model))
+        stub._record(time.perf_counter() - start)
+
+    def _stream(self, content: str, model: str, ttft: float, per_token: float) -> None:
+        completion_id = f"chatcmpl-{uuid.uuid4().hex[:24]}"
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        self.close_connection = True
+
+        def emit(payload: dict) -> None:
+            self.wfile.write(f"data: {json.dumps(payload)}\n\n".encode("utf-8"))
+            self.wfile.flush()
+
+        time.sleep(ttft)
+        emit(build_chat_completion_chunk(completion_id, {"role": "assistant", "content": ""}, model))
+        for idx, piece in enumerate(_split_tokens(content)):
+            if idx and per_token:
+                time.sleep(per_token)
+            emit(build_chat_completion_chunk(completion_id, {"content": piece}, model))
+        emit(build_chat_completion_chunk(completion_id, {}, model, finish_reason="stop"))
+        self.wfile.write(b"data: [DONE]\n\n")
+        self.wfile.flush()
+
+
+class ChatCompletionsStub:
+    """
+    Minimal local server speaking the OpenAI `/v1/chat/completions` API.
+
+    Runs in a background thread so the OpenAI client in core.py can be pointed at it
+    through TGI_BASE_URL without any code changes. Both plain and `stream=True` requests
+    are supported; response timing follows the configured LatencyModel.
+
+    Args:
+        responder: Callable receiving the parsed request body and returning the assistant content
+        host: Interface to bind to
+        port: Port to bind to (0 picks a free port)
+        latency: Timing model applied to every completion (default: respond immediately)
+        prefix_cache: Optional PrefixCacheModel adding prefill time for uncached prompt prefixes
+
+    Set `healthy = False` to make the /health endpoint report 503 (for exercising
+    endpoint ejection in EndpointPool).
+    """
+
+    def __init__(self, responder: Callable[[dict], str], host: str = "127.0.0.1", port: int = 0, latency: Optional[LatencyModel] = None, prefix_cache: Optional[PrefixCacheModel] = None):
+        self.responder = responder
+        self.host = host
+        self.port = port
+        self.latency = latency or LatencyModel()
+        self.prefix_cache = prefix_cache
+        self.healthy = True
+        self.requests_served = 0
+        self.service_times: List[float] = []
+        self._stats_lock = threading.Lock()
+        self._server: Optional[ThreadingHTTPServer] = None
+        self._thread: Optional[threading.Thread] = None
+
+    def _record(self, seconds: float) -> None:
+        with self._stats_lock:
+            self.requests_served += 1
+            self.service_times.append(seconds)
+
+    def stats(self) -> dict:
+        """
+        Server-side view of the load: request count and service-time percentiles in seconds.
+        """
+        with self._stats_lock:
+            times = sorted(self.service_times)
+        if not times:
+            return {"requests": 0}
+
+        def pct(q: float) -> float:
+            return times[min(len(times) - 1, int(q * len(times)))]
+
+        return {
+            "requests": len(times),
+            "mean_s": sum(times) / len(times),
+            "p50_s": pct(0.50),
+            "p95_s": pct(0.95),
+            "p99_s": pct(0.99),
+            "max_s": times[-1],
+        }
+
+    @property
+    def base_url(self) -> str:
+        """OpenAI client base URL, e.g. http://127.0.0.1:8123/v1"""
+        return f"http://{self.host}:{self.port}/v1"
+
+    def start(self) -> str:
+        """
+        Start serving in a daemon thread.
+
+        Returns:
+            str: The base URL to use as TGI_BASE_URL
+        """
+        self._server = ThreadingHTTPServer((self.host, self.port), _StubRequestHandler)
+        self._server.daemon_threads = True
+        self._server.stub = self
+        self.port = self._server.server_address[1]
+        self._thread = threading.Thread(target=self._server.serve_forever, name="chat-completions-stub", daemon=True)
+        self._thread.start()
+        return self.base_url
+
+    def stop(self) -> None:
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local OpenAI-compatible chat completions stub")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--first-token", default="0", help="Time-to-first-token distribution in seconds, e.g. lognormal:-0.7,0.4")
+    parser.add_argument("--token-rate", default="0", help="Decode rate distribution in tokens/s, e.g. normal:40,5 (0 = instant)")
+    parser.add_argument("--responses", default=None, help="Text file with one scripted response per JSON line; canned UI-TARS responses otherwise")
+    parser.add_argument("--loop", action="store_true", help="Cycle through scripted responses")
+    parser.add_argument("--finish-every", type=int, default=5, help="Canned mode: emit finished() every n calls")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    if args.responses:
+        with open(args.responses, "r", encoding="utf-8") as f:
+            responses = [json.loads(line) for line in f if line.strip()]
+        responder = ScriptedResponder(responses, loop=args.loop)
+    else:
+        responder = CannedUITarsResponder(seed=args.seed, finish_every=args.finish_every)
+    latency = LatencyModel(Distribution.parse(args.first_token), Distribution.parse(args.token_rate), seed=args.seed)
+
+    stub = ChatCompletionsStub(responder, host=args.host, port=args.port, latency=latency)
+    print(f"Serving chat completions at {stub.start()} (first token: {latency.first_token}, token rate: {latency.token_rate})")
+    try:
+        while True:
+            time.sleep(1.0)
+    except KeyboardInterrupt:
+        print(f"Stub stats: {stub.stats()}")
+    finally:
+        stub.stop()
+
+
+if __name__ == "__main__":
+    main()
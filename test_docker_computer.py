@@ -1,4 +1,5 @@
 import asyncio
+import base64
 import io
 import os
 import time
@@ -7,6 +8,7 @@ from agent import ComputerAgent
 from computer import Computer
 from dotenv import load_dotenv
 from utils import get_size_from_base64
+from snippet_bundle import build_bundle, run_bundle_docker
 
 load_dotenv()
 os.environ["HF_TOKEN"] = os.getenv("HF_TOKEN") or ""
@@ -16,97 +18,233 @@ os.environ["TGI_BASE_URL"] = os.getenv("TGI_BASE_URL") or ""
 
 IMAGE = "cua-browser-ubuntu:latest"
 
-async def main():
+
+def _natural_key(path: str) -> list:
+    # automation_step_2_1.py sorts before automation_step_10_1.py
+    return [int(part) if part.isdigit() else part for part in re.split(r"(\d+)", os.path.basename(path))]
+
+
+def discover_sequences(root: str) -> list:
     """
-    Replace main to execute all automation snippets inside a single Docker container.
+    Find snippet sequences to replay.
+
+    Snippets directly under `root` form one sequence; every subdirectory holding snippets is
+    another (one recorded workflow each). Snippets within a sequence depend on each other and
+    always run in order in the same container; sequences are independent and can be sharded.
+
+    Returns:
+        list: [(name, [snippet paths in natural order]), ...]
     """
     import glob
     import pathlib
 
-    computer = Computer(
-        os_type="linux",
-        provider_type="docker",
-        image=IMAGE,
-        name="my-cua-container",
-        noVNC_port=6901,
-        port=8000
-    )
+    root_path = pathlib.Path(root).resolve()
+    sequences = []
+    for dir_path in [root_path] + sorted((p for p in root_path.iterdir() if p.is_dir()), key=lambda p: _natural_key(str(p))):
+        files = sorted(glob.glob(str(dir_path / "automation_step_*.py")), key=_natural_key)
+        if files:
+            sequences.append((dir_path.name, files))
+    return sequences
 
-    await computer.run()
 
-    print("VNC Access: http://localhost:6901")
-    print("API: http://localhost:8000")
+def shard_sequences(sequences: list, num_shards: int) -> list:
+    """Assign sequences to shards, longest first onto the least loaded shard (by snippet count)."""
+    shards = [[] for _ in range(max(1, num_shards))]
+    loads = [0] * len(shards)
+    for sequence in sorted(sequences, key=lambda s: len(s[1]), reverse=True):
+        target = loads.index(min(loads))
+        shards[target].append(sequence)
+        loads[target] += len(sequence[1])
+    return [shard for shard in shards if shard]
 
-    # # Open the target webpage inside the container
-    # _ = await computer.interface.run_command(
-    #     "bash -lc 'nohup xdg-open https://www.brmsprovidergateway.com/provideronline/search.aspx >/dev/null 2>&1 </dev/null &'"
-    # )
-    # print(f"Browser open return code: {_.returncode}")
-    # if _.stderr:
-    #     print(f"Browser open STDERR: {_.stderr}")
-    # time.sleep(5)
 
-    try:
-        dir_path = pathlib.Path("./data/automation_code").resolve()
-        pattern = str(dir_path / "automation_step_*.py")
-        files = sorted(glob.glob(pattern))
+def _write_bytes(path: str, data: bytes) -> None:
+    with open(path, "wb") as out:
+        out.write(data)
 
-        if not files:
-            print(f"No automation snippets found under: {dir_path}")
-            return
 
-        print(f"Found {len(files)} snippet(s). Executing in container...\n")
+def _read_text(path: str) -> str:
+    with open(path, "r", encoding="utf-8") as f:
+        return f.read()
 
-        os.makedirs("./data/screenshots", exist_ok=True)
 
-        for idx, file_path in enumerate(files, 1):
-            print(f"=== [{idx}/{len(files)}] Executing: {file_path} ===")
-            try:
-                with open(file_path, "r", encoding="utf-8") as f:
-                    code = f.read()
+async def replay_shard(computer: Computer, shard_idx: int, sequences: list, screenshot_dir: str = "./data/screenshots", settle_time: float = 0.5) -> dict:
+    """
+    Replay the sequences of one shard in one container.
 
-                # Write and execute inside the container with timeout and cleanup
-                await computer.interface.write_text("/tmp/my_script.py", code)
+    The upload of snippet i+1 overlaps the execution of snippet i, and screenshots are saved
+    to disk in background threads, so the container is only idle during `settle_time`.
+
+    Returns:
+        dict: {"shard", "wall_s", "snippets": [per-snippet timing and status]}
+    """
+    shard_start = time.perf_counter()
+    snippets = []
+    pending_writes = []
+    for seq_name, files in sequences:
+        codes = await asyncio.gather(*(asyncio.to_thread(_read_text, f) for f in files))
+        # Unique remote paths so the next upload never overwrites the script that is running
+        remote = [f"/tmp/replay_{shard_idx}_{seq_name}_{idx}.py" for idx in range(len(files))]
+
+        async def upload(idx):
+            start = time.perf_counter()
+            await computer.interface.write_text(remote[idx], codes[idx])
+            return time.perf_counter() - start
+
+        next_upload = asyncio.create_task(upload(0))
+        for idx, file_path in enumerate(files):
+            label = f"[shard {shard_idx}] {seq_name}/{os.path.basename(file_path)}"
+            upload_s = await next_upload
+            if idx + 1 < len(files):
+                next_upload = asyncio.create_task(upload(idx + 1))
+            record = {"shard": shard_idx, "sequence": seq_name, "snippet": file_path, "upload_s": upload_s, "rc": None}
+            try:
+                start = time.perf_counter()
                 result = await computer.interface.run_command(
-                    "bash -lc 'timeout 15s python3 /tmp/my_script.py; rc=$?; pkill -f xclip || true; pkill -f xsel || true; echo __RC__$rc'"
+                    f"bash -lc 'timeout 15s python3 {remote[idx]}; rc=$?; pkill -f xclip || true; pkill -f xsel || true; echo __RC__$rc'"
                 )
-
-                print(f"Return code: {result.returncode}")
-                snippet_rc = None
-                if result.stdout:
-                    print(f"STDOUT:\n{result.stdout}")
-                    m = re.search(r"__RC__(\d+)", result.stdout)
-                    if m:
-                        snippet_rc = int(m.group(1))
-                if snippet_rc is not None:
-                    if snippet_rc == 0:
-                        print("Snippet status: completed successfully")
-                    elif snippet_rc == 124:
-                        print("Snippet status: timed out (timeout(1) exit code 124)")
-                    else:
-                        print(f"Snippet status: exited with code {snippet_rc}")
+                record["exec_s"] = time.perf_counter() - start
+                m = re.search(r"__RC__(\d+)", result.stdout or "")
+                if m:
+                    record["rc"] = int(m.group(1))
                 if result.stderr:
-                    print(f"STDERR:\n{result.stderr}")
+                    print(f"{label} STDERR:\n{result.stderr}")
 
-                # Save a screenshot after each snippet
+                # Screenshot after each snippet; the disk write runs off the event loop
+                start = time.perf_counter()
                 screenshot_bytes = await computer.interface.screenshot()
-                from datetime import datetime
-                ts = datetime.now().strftime("%Y%m%d_%H%M%S")
+                record["screenshot_s"] = time.perf_counter() - start
                 base_name = os.path.splitext(os.path.basename(file_path))[0]
-                out_path = f"./data/screenshots/{base_name}_{ts}.png"
-                with open(out_path, "wb") as out:
-                    out.write(screenshot_bytes)
-                print(f"Screenshot saved: {out_path}\n")
+                out_path = os.path.join(screenshot_dir, f"{seq_name}_{base_name}_shard{shard_idx}.png")
+                pending_writes.append(asyncio.create_task(asyncio.to_thread(_write_bytes, out_path, screenshot_bytes)))
 
-                time.sleep(0.5)
+                status = {0: "ok", 124: "timeout", None: "unknown"}.get(record["rc"], f"rc={record['rc']}")
+                print(f"{label}: {status} (upload {record['upload_s']:.3f}s, exec {record['exec_s']:.3f}s)")
+                await asyncio.sleep(settle_time)
             except Exception as e:
-                print(f"Error executing {file_path}: {e}\n")
-                # Continue with next snippet
-                continue
+                record["error"] = str(e)
+                print(f"{label}: error: {e}")
+            snippets.append(record)
+        if not next_upload.done():
+            await next_upload
+    await asyncio.gather(*pending_writes)
+    return {"shard": shard_idx, "wall_s": time.perf_counter() - shard_start, "snippets": snippets}
+
+
+async def replay_shard_bundled(computer: Computer, shard_idx: int, sequences: list, screenshot_dir: str = "./data/screenshots", settle_time: float = 0.5) -> dict:
+    """
+    Same as replay_shard, but each sequence ships as one bundle (snippet_bundle) and runs under
+    the in-container driver: one upload, one run and one result read per sequence.
+    """
+    shard_start = time.perf_counter()
+    snippets = []
+    pending_writes = []
+    for seq_name, files in sequences:
+        codes = await asyncio.gather(*(asyncio.to_thread(_read_text, f) for f in files))
+        bundle = build_bundle(list(zip(files, codes)), timeout=15.0, settle_time=settle_time, screenshots=True)
+        start = time.perf_counter()
+        manifest = await run_bundle_docker(computer, bundle, remote_dir=f"/tmp/replay_bundle_{shard_idx}_{seq_name}")
+        elapsed = time.perf_counter() - start
+        if "error" in manifest:
+            print(f"[shard {shard_idx}] {seq_name}: {manifest['error']}")
+        for step in manifest["steps"]:
+            label = f"[shard {shard_idx}] {seq_name}/{os.path.basename(step['name'])}"
+            if step.get("screenshot_b64"):
+                base_name = os.path.splitext(os.path.basename(step["name"]))[0]
+                out_path = os.path.join(screenshot_dir, f"{seq_name}_{base_name}_shard{shard_idx}.png")
+                pending_writes.append(asyncio.create_task(asyncio.to_thread(_write_bytes, out_path, base64.b64decode(step["screenshot_b64"]))))
+            if step["stderr"]:
+                print(f"{label} STDERR:\n{step['stderr']}")
+            print(f"{label}: rc={step['rc']} (exec {step['duration_s']:.3f}s)")
+            snippets.append({"shard": shard_idx, "sequence": seq_name, "snippet": step["name"], "rc": step["rc"],
+                             "upload_s": 0.0, "exec_s": step["duration_s"], "screenshot_s": 0.0})
+        print(f"[shard {shard_idx}] {seq_name}: {len(manifest['steps'])}/{len(files)} step(s) in one bundle, {elapsed:.3f}s round trip")
+    await asyncio.gather(*pending_writes)
+    return {"shard": shard_idx, "wall_s": time.perf_counter() - shard_start, "snippets": snippets}
+
+
+async def replay_sharded(computers: list, root: str = "./data/automation_code", screenshot_dir: str = "./data/screenshots", settle_time: float = 0.5, bundled: bool = False) -> dict:
+    """
+    Shard the snippet sequences under `root` across `computers` and replay the shards concurrently.
+    With `bundled=True` every sequence is shipped and run as one bundle (see replay_shard_bundled).
+
+    Returns:
+        dict: {"wall_s", "shards": [replay_shard results]}
+    """
+    sequences = discover_sequences(root)
+    if not sequences:
+        print(f"No automation snippets found under: {root}")
+        return {"wall_s": 0.0, "shards": []}
+    os.makedirs(screenshot_dir, exist_ok=True)
+    shards = shard_sequences(sequences, len(computers))
+    print(f"Replaying {sum(len(files) for _, files in sequences)} snippet(s) in {len(sequences)} sequence(s) on {len(shards)} container(s)\n")
+    start = time.perf_counter()
+    run_shard = replay_shard_bundled if bundled else replay_shard
+    results = await asyncio.gather(*(
+        run_shard(computers[idx], idx, shard, screenshot_dir, settle_time) for idx, shard in enumerate(shards)
+    ))
+    return {"wall_s": time.perf_counter() - start, "shards": list(results)}
+
+
+def print_timing_report(report: dict) -> None:
+    print("=== Replay Timing ===")
+    print(f"{'shard':>5} {'snippet':<40} {'rc':>4} {'upload':>8} {'exec':>8} {'shot':>8}")
+    for shard in report["shards"]:
+        for s in shard["snippets"]:
+            name = f"{s['sequence']}/{os.path.basename(s['snippet'])}"
+            print(f"{s['shard']:>5} {name:<40} {str(s['rc']):>4} {s['upload_s']:>7.3f}s {s.get('exec_s', 0.0):>7.3f}s {s.get('screenshot_s', 0.0):>7.3f}s")
+    for shard in report["shards"]:
+        failed = sum(1 for s in shard["snippets"] if s["rc"] != 0)
+        busy = sum(s.get("exec_s", 0.0) for s in shard["snippets"])
+        print(f"Shard {shard['shard']}: {len(shard['snippets'])} snippet(s), {failed} failed, wall {shard['wall_s']:.3f}s, exec {busy:.3f}s")
+    print(f"Total wall time: {report['wall_s']:.3f}s")
+
+
+async def start_container_pool(size: int) -> list:
+    """Start `size` containers with distinct names and ports (API 8000+i, noVNC 6901+i)."""
+    computers = [
+        Computer(
+            os_type="linux",
+            provider_type="docker",
+            image=IMAGE,
+            name="my-cua-container" if idx == 0 else f"my-cua-container-{idx}",
+            noVNC_port=6901 + idx,
+            port=8000 + idx
+        )
+        for idx in range(size)
+    ]
+    await asyncio.gather(*(computer.run() for computer in computers))
+    for idx in range(size):
+        print(f"Container {idx}: VNC http://localhost:{6901 + idx}, API http://localhost:{8000 + idx}")
+    return computers
+
+
+async def main():
+    """
+    Replay all automation snippets, sharded across a pool of Docker containers
+    (REPLAY_CONTAINERS, default 1). REPLAY_BUNDLED=1 ships each sequence as a single bundle.
+    """
+    pool_size = int(os.getenv("REPLAY_CONTAINERS") or 1)
+    bundled = os.getenv("REPLAY_BUNDLED", "").lower() in ("1", "true", "yes")
+    computers = await start_container_pool(pool_size)
+
+    # # Open the target webpage inside the container
+    # _ = await computer.interface.run_command(
+    #     "bash -lc 'nohup xdg-open https://www.brmsprovidergateway.com/provideronline/search.aspx >/dev/null 2>&1 </dev/null &'"
+    # )
+    # print(f"Browser open return code: {_.returncode}")
+    # if _.stderr:
+    #     print(f"Browser open STDERR: {_.stderr}")
+    # time.sleep(5)
+
+    try:
+        report = await replay_sharded(computers, "./data/automation_code", "./data/screenshots", bundled=bundled)
+        if report["shards"]:
+            print_timing_report(report)
     finally:
-        # await computer.stop()
+        # await asyncio.gather(*(computer.stop() for computer in computers))
         pass
 
 
 if __name__ == "__main__":
-    asyncio.run(main())
\ No newline at end of file
+    asyncio.run(main())
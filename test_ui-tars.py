@@ -1,11 +1,13 @@
 # pip install openai
 import asyncio
+import functools
 import io
 import os
 import re
 import json
 import base64
 import time
+from concurrent.futures import ThreadPoolExecutor
 from PIL import Image
 import matplotlib.pyplot as plt
 from io import BytesIO
@@ -13,9 +15,16 @@ from openai import OpenAI
 from dotenv import load_dotenv
 from computer import Computer
 
-from action_parser import add_box_token, parse_action_to_structure_output, parsing_response_to_pyautogui_code, smart_resize, parse_action, convert_point_to_coordinates
-from utils import visualize_actions_on_image, execute_pyautogui_code, get_screenshot_base64, get_size_from_base64
-from core import call_ui_grounding_model, call_result_checking_model, AutomationState, build_messages_with_state, call_ui_grounding_model_with_messages, call_code_integration_model_from_dir
+from action_parser import add_box_token, parse_action_to_structure_output, parsing_response_to_pyautogui_code, smart_resize, parse_action, convert_point_to_coordinates, split_actions_at_barriers, map_actions_from_roi, roi_around_point, get_coordinate_space, get_timing_profile
+from speculation import SpeculativePrefetcher, frame_similarity
+from loop_detection import NO_EFFECT_NOTE, LoopDetector
+from delta_capture import DeltaScreenCapture
+from snippet_bundle import build_bundle, run_bundle_docker
+from script_optimizer import ScriptValidationError, optimize_script
+from result_check import ExpectedViewCache, TieredResultChecker
+from checkpoint import SessionCheckpoint, replay_snippet_docker, replay_snippet_local, run_steps_with_checkpoint
+from utils import visualize_actions_on_image, execute_pyautogui_code, get_screenshot_base64, get_size_from_base64, crop_base64_image
+from core import call_ui_grounding_model, call_result_checking_model, AutomationState, build_messages_with_state, build_messages_with_budget, estimate_message_tokens, call_ui_grounding_model_with_messages, acall_ui_grounding_model_with_messages, call_code_integration_model_from_dir, get_last_action_point
 
 load_dotenv()
 os.environ["HF_TOKEN"] = os.getenv("HF_TOKEN") or ""
@@ -125,12 +134,19 @@ def demo_local_cua_step_automation(instruction: str, step_idx: int, max_iteratio
     - At most two images per model call (previous + current)
     - Last two actions as text for reasoning
     - Early stop when model emits finished
+
+    Returns:
+        dict: Final AutomationState ("state"), executed snippets ("snippets") and whether the
+              task completed ("completed")
     """
     print(f"=== Step {step_idx} Started ===")
     print(f"Instruction: {instruction}")
     print(f"Max iterations: {max_iterations}")
 
     state = AutomationState(instruction=instruction, language="English")
+    executed_snippets = []
+    task_completed = False
+    space = get_coordinate_space(RESIZED_MODEL_IMG_WIDTH, RESIZED_MODEL_IMG_HEIGHT, SCREEN_WIDTH, SCREEN_HEIGHT, factor=FACTOR)
 
     for iteration in range(max_iterations):
         print(f"\n--- Iteration {iteration + 1} ---")
@@ -150,19 +166,20 @@ def demo_local_cua_step_automation(instruction: str, step_idx: int, max_iteratio
                 raw_response,
                 factor=FACTOR,
                 origin_resized_height=RESIZED_MODEL_IMG_HEIGHT,
-                origin_resized_width=RESIZED_MODEL_IMG_WIDTH
+                origin_resized_width=RESIZED_MODEL_IMG_WIDTH,
+                space=space
             )
 
             # 4) Early stop if finished
             if any(a.get("action_type") == "finished" for a in structured_actions):
+                task_completed = True
                 print("Task completed (model emitted finished).")
                 break
 
             # 5) Generate PyAutoGUI code
             pyautogui_code = parsing_response_to_pyautogui_code(
                 structured_actions,
-                image_height=SCREEN_HEIGHT,
-                image_width=SCREEN_WIDTH
+                space=space
             )
             # print("--------------------------------")
             # print("Generated PyAutoGUI code")
@@ -176,11 +193,13 @@ def demo_local_cua_step_automation(instruction: str, step_idx: int, max_iteratio
 
             # 6) Execute code unless parser signaled DONE
             if pyautogui_code == "DONE":
+                task_completed = True
                 print("Task completed (parser signals DONE).")
                 break
 
             print("Executing PyAutoGUI code...")
             success, result = execute_pyautogui_code(pyautogui_code)
+            executed_snippets.append(pyautogui_code)
             if success:
                 print("Actions executed successfully")
             else:
@@ -194,7 +213,8 @@ def demo_local_cua_step_automation(instruction: str, step_idx: int, max_iteratio
                 image=cur_b64,
                 structured_actions=structured_actions,
                 output_path=output_path,
-                title=f"Automation Step {iteration + 1}: {instruction[:30]}..."
+                title=f"Automation Step {iteration + 1}: {instruction[:30]}...",
+                space=space
             )
             print(f"Actions visualized and saved to: {output_path}")
 
@@ -214,6 +234,7 @@ def demo_local_cua_step_automation(instruction: str, step_idx: int, max_iteratio
             break
 
     print("\n=== Step Ended ===")
+    return {"state": state, "snippets": executed_snippets, "completed": task_completed}
 
 def demo_local_result_checking():
     """
@@ -298,21 +319,137 @@ async def run_docker_container(image_name: str):
 
     return computer, image_width, image_height, SCREEN_WIDTH, SCREEN_HEIGHT
 
-async def demo_docker_cua_step_automation(instruction: str, computer: Computer, image_width: int, image_height: int, screen_width: int, screen_height: int, step_idx: int, max_iterations: int = 5):
+async def _read_snippet_result(computer: Computer, rc_path: str, log_path: str):
+    try:
+        rc_text = await computer.interface.read_text(rc_path)
+        print(f"Snippet RC: {rc_text.strip()}")
+    except Exception as _e:
+        print(f"Failed to read snippet RC: {_e}")
+    try:
+        log_text = await computer.interface.read_text(log_path)
+        if log_text:
+            print("SNIPPET LOG:\n" + log_text)
+    except Exception as _e:
+        print(f"Failed to read snippet log: {_e}")
+
+
+def _write_snippet_file(path: str, code: str):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w") as f:
+        f.write(code)
+
+
+# Visualizations render off the event loop; each call owns its figure, so concurrent sessions can
+# render in parallel (VISUALIZATION_WORKERS overrides the pool size)
+_VISUALIZATION_EXECUTOR = ThreadPoolExecutor(max_workers=int(os.environ.get("VISUALIZATION_WORKERS") or min(4, os.cpu_count() or 1)), thread_name_prefix="visualize")
+
+
+async def _visualize_in_background(image_b64: str, structured_actions: list, output_path: str, title: str, space=None):
+    loop = asyncio.get_running_loop()
+    await loop.run_in_executor(
+        _VISUALIZATION_EXECUTOR,
+        functools.partial(visualize_actions_on_image, image=image_b64, structured_actions=structured_actions, output_path=output_path, title=title, space=space)
+    )
+    print(f"Actions visualized and saved to: {output_path}")
+
+
+def _format_action(action: dict) -> str:
+    return f"{action['action_type']}(" + ", ".join(
+        f"{k}='{v}'" for k, v in action.get("action_inputs", {}).items()
+    ) + ")"
+
+
+def _summarize_first_action(structured_actions: list):
+    thought = structured_actions[0].get("thought", "") if structured_actions else ""
+    first = structured_actions[0] if structured_actions else {"action_type": "", "action_inputs": {}}
+    return thought, _format_action(first)
+
+
+# Expected end-state images, encoded once per process and shared by every result check
+EXPECTED_VIEWS = ExpectedViewCache()
+EXPECTED_END_IMAGE = './data/test_images/test_img_13.png'
+
+# Minimum frame similarity for running the remaining coordinate-based actions of a multi-action turn
+MULTI_ACTION_MIN_SIMILARITY = 0.97
+
+
+async def demo_docker_cua_step_automation(instruction: str, computer: Computer, image_width: int, image_height: int, screen_width: int, screen_height: int, step_idx: int, max_iterations: int = 5, pipelined: bool = True, settle_time: float = 1.0, speculative: bool = False, multi_action: bool = False, message_budget=None, roi=None, roi_size: tuple = (1280, 800), timing=None, loop_detection=None, delta_capture: bool = False):
     """
     Demo function showing continuous automation with short history inside the docker container:
     - At most two images per model call (previous + current)
     - Last two actions as text for reasoning
     - Early stop when model emits finished
+
+    With `pipelined=True` only capture -> model -> parse -> execute -> settle stays on the
+    critical path. Writing the step code to disk, reading the snippet rc/log and rendering the
+    visualization run as background tasks that overlap with settling, the next capture and
+    the next model call; they are all awaited before the step returns.
+
+    With `speculative=True`, after a predictable action (a single click) the next grounding
+    request is issued while the action executes; it is committed only if the real screenshot
+    matches the frame it was built from (see speculation.SpeculativePrefetcher).
+
+    With `multi_action=True` the model may emit several actions per turn (e.g. click + type +
+    enter on a form field); they run in one exec round-trip when possible and are recorded as
+    one batch in AutomationState.
+
+    `message_budget` (a core.MessageBudget or preset name such as "compact") switches the
+    request to the token-budgeted message builder; None keeps the original two-image request.
+
+    `roi` grounds on a full-resolution crop instead of the whole screenshot: either a fixed
+    (x, y, width, height) region in screenshot pixels, or "auto" to use a `roi_size` window
+    around the last action's target (the full frame is used until there is one). Actions are
+    mapped back to full-screenshot coordinates before code generation. Speculation is skipped
+    while a region is active since the speculative request would be built on a different crop.
+
+    `timing` (an action_parser.TimingProfile or preset name such as "fast") sets the delays in
+    the generated code; None uses PYAUTOGUI_TIMING, then "safe".
+
+    `loop_detection` ("stop" or "escalate") ends the step early when the model proposes the
+    same action again on an unchanged screen (see loop_detection.LoopDetector). "escalate"
+    first skips the repeated action and records it in the history as having had no effect,
+    and only stops if the model repeats it once more.
+
+    With `delta_capture=True` the settle after each action and the change check between
+    batch segments poll a background capture agent in the container (see
+    delta_capture.DeltaScreenCapture), which returns only the tiles that changed: settling
+    ends as soon as the screen stops changing (`settle_time` becomes the upper bound) and the
+    check frame costs no full PNG. Frames sent to the model still come from screenshot().
+
+    Returns:
+        dict: Per-iteration latencies (capture of one frame to capture of the next),
+              speculation and loop detection stats when enabled, the final AutomationState
+              ("state"), the executed PyAutoGUI scripts in order ("snippets") and whether the
+              task completed (finished()/DONE) rather than running out of iterations, failing
+              or being stopped by loop detection ("completed")
     """
     print(f"=== Step {step_idx} Started ===")
     print(f"Instruction: {instruction}")
     print(f"Max iterations: {max_iterations}")
 
-    state = AutomationState(instruction=instruction, language="English")
+    state = AutomationState(instruction=instruction, language="English", multi_action=multi_action, max_history=6 if message_budget is not None else 2)
+    background = []
+    iteration_times = []
+    executed_snippets = []
+    task_completed = False
+    prefetcher = SpeculativePrefetcher(message_budget=message_budget) if speculative else None
+    loop_detector = LoopDetector(escalate=loop_detection == "escalate") if loop_detection else None
+    # One coordinate space for the whole step: parser, code generation and visualization share it
+    space = get_coordinate_space(image_width, image_height, screen_width, screen_height, factor=FACTOR)
+    timing = get_timing_profile(timing)
+    delta = DeltaScreenCapture(computer) if delta_capture else None
+    if delta is not None:
+        await delta.install()
+
+    async def run_stage(coro):
+        if pipelined:
+            background.append(asyncio.create_task(coro))
+        else:
+            await coro
 
     for iteration in range(max_iterations):
         print(f"\n--- Iteration {iteration + 1} ---")
+        iteration_start = time.perf_counter()
         try:
             # 1) Capture current screenshot inside the docker container
             print("Capturing screenshot...")
@@ -320,89 +457,216 @@ async def demo_docker_cua_step_automation(instruction: str, computer: Computer,
             cur_b64 = base64.b64encode(screenshot_bytes).decode("ascii")
             print("Screenshot captured and converted to base64")
 
-            # 2) Build messages (<=2 images) and call model
-            messages = build_messages_with_state(state, cur_b64)
-            print("Calling UI grounding model with history...")
-            raw_response = call_ui_grounding_model_with_messages(messages)
+            # Optionally narrow the model input to a region of interest
+            region = roi
+            if roi == "auto":
+                point = get_last_action_point(state)
+                region = roi_around_point(point, image_width, image_height, *roi_size) if point is not None else None
+            model_b64 = await asyncio.to_thread(crop_base64_image, cur_b64, region) if region is not None else cur_b64
+            if region is not None:
+                print(f"Grounding on region {region}")
+
+            # 2) Build messages (<=2 images) and call model (off the event loop so background stages progress),
+            #    unless a speculative response issued during the previous action is still valid
+            raw_response = await prefetcher.resolve(cur_b64) if prefetcher is not None and region is None else None
+            if raw_response is None:
+                if message_budget is None:
+                    messages = build_messages_with_state(state, model_b64)
+                else:
+                    messages = build_messages_with_budget(state, model_b64, message_budget)
+                    token_counts = estimate_message_tokens(messages)
+                    print(f"Estimated prompt tokens: {sum(token_counts)} (per message: {token_counts})")
+                print("Calling UI grounding model with history...")
+                raw_response = await acall_ui_grounding_model_with_messages(messages)
 
             # 3) Parse the response into actions
             structured_actions = parse_action_to_structure_output(
                 raw_response,
                 factor=FACTOR,
-                origin_resized_height=image_height,
-                origin_resized_width=image_width
+                origin_resized_height=image_height if region is None else region[3],
+                origin_resized_width=image_width if region is None else region[2],
+                space=space if region is None else None
             )
-
-            # 4) Early stop if finished
-            if any(a.get("action_type") == "finished" for a in structured_actions):
+            if region is not None:
+                structured_actions = map_actions_from_roi(structured_actions, region, image_width, image_height)
+
+            # 4) Early stop if finished. In multi-action mode the actions emitted before
+            #    finished() in the same turn still run first.
+            finished = any(a.get("action_type") == "finished" for a in structured_actions)
+            if multi_action:
+                structured_actions = [a for a in structured_actions if a.get("action_type") != "finished"]
+            if finished and (not multi_action or not structured_actions):
+                task_completed = True
                 print("Task completed (model emitted finished).")
                 break
 
+            # Stop (or escalate once) when the model repeats itself on an unchanged screen
+            if loop_detector is not None:
+                verdict = await asyncio.to_thread(loop_detector.observe, cur_b64, structured_actions)
+                if verdict == "stop":
+                    print("Loop detected: same action proposed again on an unchanged screen, stopping.")
+                    break
+                if verdict == "escalate":
+                    print("Loop detected: skipping the repeated action and telling the model it had no effect.")
+                    thought, action_str = _summarize_first_action(structured_actions)
+                    if multi_action:
+                        state.add_batch(before_image_b64=cur_b64, thought=f"{thought} {NO_EFFECT_NOTE}", action_strs=[_format_action(a) for a in structured_actions])
+                    else:
+                        state.add_step(before_image_b64=cur_b64, thought=f"{thought} {NO_EFFECT_NOTE}", action_str=action_str)
+                    iteration_times.append(time.perf_counter() - iteration_start)
+                    continue
+
             # 5) Generate PyAutoGUI code
             pyautogui_code = parsing_response_to_pyautogui_code(
                 structured_actions,
-                image_height=screen_height,
-                image_width=screen_width
+                timing=timing,
+                space=space
             )
             print("--------------------------------")
             print("Generated PyAutoGUI code")
             print(pyautogui_code)
             print("--------------------------------")
 
-            # Save every pyautogui code to a file for debugging
-            os.makedirs("./data/automation_code", exist_ok=True)
-            with open(f"./data/automation_code/automation_step_{step_idx}_{iteration + 1}.py", "w") as f:
-                f.write(pyautogui_code)
-
             # 6) Execute code unless parser signaled DONE
             if pyautogui_code == "DONE":
+                task_completed = True
                 print("Task completed (parser signals DONE).")
                 break
 
-            print("Executing PyAutoGUI code...")
-            await computer.interface.write_text("/tmp/my_script.py", pyautogui_code)
-            result = await computer.interface.run_command(
-                "bash -lc 'timeout -s TERM -k 5s 15s python3 /tmp/my_script.py > /tmp/my_script.log 2>&1; echo $? > /tmp/my_script.rc; pkill -f xclip || true; pkill -f xsel || true'"
-            )
-            print(f"Script executed with return code: {result.returncode}")
-            try:
-                rc_text = await computer.interface.read_text("/tmp/my_script.rc")
-                print(f"Snippet RC: {rc_text.strip()}")
-            except Exception as _e:
-                print(f"Failed to read snippet RC: {_e}")
-            try:
-                log_text = await computer.interface.read_text("/tmp/my_script.log")
-                if log_text:
-                    print("SNIPPET LOG:\n" + log_text)
-            except Exception as _e:
-                print(f"Failed to read snippet log: {_e}")
+            # Speculatively ask for the next action while this one executes
+            thought, action_str = _summarize_first_action(structured_actions)
+            if prefetcher is not None and region is None and prefetcher.should_speculate(structured_actions):
+                prefetcher.start(state, cur_b64, thought, action_str)
+
+            # A multi-action turn runs in as few exec round-trips as possible: it is only split
+            # before later actions that target a point, and those run only if the screen has not
+            # changed substantially since the frame they were grounded on
+            segments = split_actions_at_barriers(structured_actions) if multi_action else [structured_actions]
+            executed_actions = []
+            executed_codes = []
+            for segment_idx, segment in enumerate(segments):
+                if segment_idx > 0:
+                    # Generated code only pauses between actions; let the UI react to the last
+                    # action of the previous segment before comparing
+                    settle = max(timing.delay_after(segments[segment_idx - 1][-1].get("action_type")), settle_time)
+                    if delta is not None:
+                        await delta.wait_for_stable(settle)
+                        check_frame = Image.fromarray(delta.buffer.frame.copy())
+                    else:
+                        await asyncio.sleep(settle)
+                        check_frame = base64.b64encode(await computer.interface.screenshot()).decode("ascii")
+                    similarity = await asyncio.to_thread(frame_similarity, cur_b64, check_frame)
+                    if similarity < MULTI_ACTION_MIN_SIMILARITY:
+                        print(f"Screen changed after {len(executed_actions)} action(s) (similarity {similarity:.4f}); dropping the rest of the batch")
+                        break
+                segment_code = pyautogui_code if len(segments) == 1 else parsing_response_to_pyautogui_code(
+                    segment,
+                    timing=timing,
+                    space=space
+                )
+
+                # Per-iteration paths so a background read never races the next iteration's run
+                script_base = f"/tmp/my_script_{step_idx}_{iteration + 1}" + (f"_{segment_idx + 1}" if len(segments) > 1 else "")
+                print("Executing PyAutoGUI code...")
+                await computer.interface.write_text(f"{script_base}.py", segment_code)
+                result = await computer.interface.run_command(
+                    f"bash -lc 'timeout -s TERM -k 5s 15s python3 {script_base}.py > {script_base}.log 2>&1; echo $? > {script_base}.rc; pkill -f xclip || true; pkill -f xsel || true'"
+                )
+                print(f"Script executed with return code: {result.returncode}")
+                executed_snippets.append(segment_code)
+                executed_codes.append(segment_code)
+                await run_stage(_read_snippet_result(computer, f"{script_base}.rc", f"{script_base}.log"))
+                executed_actions.extend(segment)
+
+            # Save the code that actually ran (a cut-short batch drops its later segments) for
+            # debugging, snippet replay and code integration
+            await run_stage(asyncio.to_thread(
+                _write_snippet_file, f"./data/automation_code/automation_step_{step_idx}_{iteration + 1}.py", "\n".join(executed_codes)
+            ))
 
             # 7) Visualize the actions using current image
             output_path = f"./data/screenshots/automation_step_{step_idx}_{iteration + 1}.png"
-            visualize_actions_on_image(
-                image=cur_b64,
-                structured_actions=structured_actions,
-                output_path=output_path,
-                title=f"Automation Step {iteration + 1}: {instruction[:30]}..."
-            )
-            print(f"Actions visualized and saved to: {output_path}")
+            await run_stage(_visualize_in_background(
+                cur_b64,
+                structured_actions,
+                output_path,
+                f"Automation Step {iteration + 1}: {instruction[:30]}...",
+                space=space
+            ))
+
+            # 8) Save step memory (previous image + last action summary, or the whole executed batch).
+            #    The full frame is kept even when grounding on a region: the recorded actions are
+            #    already mapped back to full-frame coordinates
+            if multi_action:
+                state.add_batch(before_image_b64=cur_b64, thought=thought, action_strs=[_format_action(a) for a in executed_actions])
+            else:
+                state.add_step(before_image_b64=cur_b64, thought=thought, action_str=action_str)
 
-            # 8) Save step memory (previous image + last action summary)
-            thought = structured_actions[0].get("thought", "") if structured_actions else ""
-            first = structured_actions[0] if structured_actions else {"action_type": "", "action_inputs": {}}
-            action_str = f"{first['action_type']}(" + ", ".join(
-                f"{k}='{v}'" for k, v in first.get("action_inputs", {}).items()
-            ) + ")"
-            state.add_step(before_image_b64=cur_b64, thought=thought, action_str=action_str)
+            if finished:
+                task_completed = True
+                print("Task completed (model emitted finished after the batch).")
+                iteration_times.append(time.perf_counter() - iteration_start)
+                break
 
-            # Short settle time
-            time.sleep(1.0)
+            # Short settle time; the next capture starts as soon as it elapses (or, with delta
+            # capture, as soon as the screen stops changing)
+            if delta is not None:
+                await delta.wait_for_stable(settle_time)
+            else:
+                await asyncio.sleep(settle_time)
+            iteration_times.append(time.perf_counter() - iteration_start)
 
         except Exception as e:
             print(f"Error in iteration {iteration + 1}: {str(e)}")
             break
 
+    if background:
+        for outcome in await asyncio.gather(*background, return_exceptions=True):
+            if isinstance(outcome, Exception):
+                print(f"Background stage failed: {outcome}")
+    if delta is not None:
+        await delta.close()
+
+    mean_iteration = sum(iteration_times) / len(iteration_times) if iteration_times else 0.0
+    print(f"Mean iteration latency ({'pipelined' if pipelined else 'sequential'}): {mean_iteration:.3f}s over {len(iteration_times)} iteration(s)")
+    report = {"pipelined": pipelined, "iteration_times_s": iteration_times, "mean_iteration_s": mean_iteration, "state": state, "snippets": executed_snippets, "completed": task_completed}
+    if prefetcher is not None:
+        prefetcher.discard()
+        report["speculation"] = prefetcher.stats()
+        print(f"Speculation: {report['speculation']['hits']}/{report['speculation']['speculations']} hit(s), "
+              f"hit rate {report['speculation']['hit_rate']:.0%}, saved {report['speculation']['latency_saved_s']:.3f}s")
+    if loop_detector is not None:
+        report["loop_detection"] = loop_detector.stats()
+    if delta is not None:
+        report["delta_capture"] = delta.stats()
     print("\n=== Step Ended ===")
+    return report
+
+
+async def run_docker_steps_with_checkpoint(instructions: list, computer: Computer, image_width: int, image_height: int, screen_width: int, screen_height: int, checkpoint_dir: str = "./data/checkpoints/docker", max_iterations: int = 5, **loop_kwargs):
+    """
+    Run step instructions in the container, checkpointing after each step. On a rerun, steps
+    already in the checkpoint are fast-forwarded by replaying their cached snippets in the
+    container instead of calling the model again.
+    """
+    checkpoint = SessionCheckpoint(checkpoint_dir, instructions)
+
+    async def run_step(instruction, step_idx):
+        report = await demo_docker_cua_step_automation(instruction, computer, image_width, image_height, screen_width, screen_height, step_idx=step_idx, max_iterations=max_iterations, **loop_kwargs)
+        return report["completed"], report["snippets"]
+
+    return await run_steps_with_checkpoint(instructions, checkpoint, run_step, functools.partial(replay_snippet_docker, computer))
+
+
+async def run_local_steps_with_checkpoint(instructions: list, checkpoint_dir: str = "./data/checkpoints/local", max_iterations: int = 5):
+    """Local-display counterpart of run_docker_steps_with_checkpoint."""
+    checkpoint = SessionCheckpoint(checkpoint_dir, instructions)
+
+    async def run_step(instruction, step_idx):
+        result = await asyncio.to_thread(demo_local_cua_step_automation, instruction, step_idx, max_iterations)
+        return result["completed"], result["snippets"]
+
+    return await run_steps_with_checkpoint(instructions, checkpoint, run_step, replay_snippet_local)
 
 async def main():
     # run_images_testing()
@@ -429,16 +693,18 @@ async def main():
                 "I need to click on the 'Search' button and click on 'Benefit Details'.",\
                 "I need to click on the dropdown date range to save the file.",\
             ]
+    # Decode, encode and featurize the expected end state up front, off the timed result check
+    EXPECTED_VIEWS.preload([EXPECTED_END_IMAGE])
     computer, image_width, image_height, screen_width, screen_height = await run_docker_container(image_name="cua-browser-ubuntu:latest")
     print("--------------------------------")
     print("Running docker container")
     print(f"Image width: {image_width}, Image height: {image_height}, Screen width: {screen_width}, Screen height: {screen_height}")
 
     #########################################################
-    # # FIRST LOOP to generate the automation code snippets
-    # for i in range(len(test_instructions_v2)):
-    #     await demo_docker_cua_step_automation(test_instructions_v2[i], computer, image_width, 
-    #     image_height, screen_width, screen_height, step_idx=i+1, max_iterations=5)
+    # # FIRST LOOP to generate the automation code snippets (checkpointed: a rerun after a crash
+    # # replays the completed steps from ./data/checkpoints/docker instead of calling the model)
+    # await run_docker_steps_with_checkpoint(test_instructions_v2, computer, image_width,
+    #     image_height, screen_width, screen_height, max_iterations=5)
     # print("--------------------------------")
 
     #########################################################
@@ -449,44 +715,52 @@ async def main():
     script = call_code_integration_model_from_dir("./data/automation_code")
     print(script)
     script = script.replace("```python", "").replace("```", "")
+    try:
+        script, optimize_report = optimize_script(script)
+    except (ScriptValidationError, SyntaxError) as e:
+        print(f"Integrated script rejected: {e}")
+        await computer.stop()
+        return
+    print(f"Optimized integrated script: {optimize_report['statements_before']} -> {optimize_report['statements_after']} statements, "
+          f"sleep {optimize_report['sleep_before_s']:.1f}s -> {optimize_report['sleep_after_s']:.1f}s")
+    for change in optimize_report["changes"]:
+        print(f"  {change}")
 
     print("--------------------------------")
     print("Executing integrated script inside container...")
-    await computer.interface.write_text("/tmp/integrated_script.py", script)
-    result = await computer.interface.run_command(
-        "bash -lc 'timeout -s TERM -k 5s 60s python3 /tmp/integrated_script.py > /tmp/integrated_script.log 2>&1; echo $? > /tmp/integrated_script.rc; pkill -f xclip || true; pkill -f xsel || true'"
-    )
-    print(f"Integrated script return code: {result.returncode}")
-    try:
-        rc_text = await computer.interface.read_text("/tmp/integrated_script.rc")
-        print(f"Integrated script RC: {rc_text.strip()}")
-    except Exception as _e:
-        print(f"Failed to read integrated script RC: {_e}")
-    try:
-        log_text = await computer.interface.read_text("/tmp/integrated_script.log")
+    # Shipped as a one-step bundle: one upload, one run, one result read, and the end-state
+    # screenshot comes back in the result manifest
+    manifest = await run_bundle_docker(computer, build_bundle([("integrated_script.py", script)], timeout=60.0, settle_time=0.0, screenshots=True))
+    if "error" in manifest:
+        print(f"Integrated script failed to run: {manifest['error']}")
+    for step in manifest["steps"]:
+        print(f"Integrated script RC: {step['rc']}")
+        log_text = step["stdout"] + step["stderr"]
         if log_text:
             print("INTEGRATED SCRIPT LOG:\n" + log_text)
-    except Exception as _e:
-        print(f"Failed to read integrated script log: {_e}")
 
     # After execution: take current screenshot from container, load expected end image, and check result
     try:
-        screenshot_bytes = await computer.interface.screenshot()
-        current_b64 = base64.b64encode(screenshot_bytes).decode("ascii")
+        final_step = manifest["steps"][-1] if manifest["steps"] else {}
+        current_b64 = final_step.get("screenshot_b64")
+        if not current_b64:
+            screenshot_bytes = await computer.interface.screenshot()
+            current_b64 = base64.b64encode(screenshot_bytes).decode("ascii")
 
-        expected_path = './data/test_images/test_img_13.png'
-        expected_image = Image.open(expected_path)
-        _buf = BytesIO()
-        expected_image.save(_buf, format="PNG")
-        expected_b64 = base64.b64encode(_buf.getvalue()).decode()
+        # Reference side comes pre-encoded (and pre-featurized) from the expected-view cache
+        expected_view = EXPECTED_VIEWS.get(EXPECTED_END_IMAGE)
 
         task_description = "Log in to the insurance portal and download the benefits details file."
-        check = call_result_checking_model(
+        # Unchanged screens pass and clearly different ones fail locally; only ambiguous cases reach gpt-4o
+        check = TieredResultChecker().check(
             task_description=task_description,
-            expected_view_base64=expected_b64,
+            expected_view_base64=expected_view.payload("PNG"),
             current_view_base64=current_b64,
+            expected_features=expected_view.features,
+            expected_size=expected_view.image_size,
         )
         print("=== Result Checking ===")
+        print(f"Tier: {check['tier']} (SSIM {check['ssim']:.4f}, changed {check['changed']:.2%})")
         print(f"Thoughts: {check.get('thoughts', '')}")
         print(f"Finished: {check.get('result', False)}")
     except Exception as e:
@@ -0,0 +1,90 @@
+"""
+Delta capture: frames rebuilt by DeltaFrameBuffer from the agent's payloads are bit-identical
+to the captured frames, with the numpy and the pure Python tile diff alike.
+"""
+import pathlib
+import random
+import sys
+
+import numpy as np
+import pytest
+from PIL import Image, ImageDraw
+
+REPO_ROOT = pathlib.Path(__file__).resolve().parent.parent
+if str(REPO_ROOT) not in sys.path:
+    sys.path.insert(0, str(REPO_ROOT))
+
+from delta_capture import AGENT_SOURCE, DeltaFrameBuffer  # noqa: E402
+
+agent = {"__name__": "delta_capture_agent"}
+exec(AGENT_SOURCE, agent)
+DeltaEncoder = agent["DeltaEncoder"]
+
+
+def _frames(count: int = 24, seed: int = 0) -> list:
+    """A desktop-like frame sequence: small edits, a static frame, a resize and a full repaint."""
+    rng = random.Random(seed)
+    frame = Image.new("RGB", (333, 211), (246, 247, 249))
+    frames = []
+    for index in range(count):
+        frame = frame.copy()
+        draw = ImageDraw.Draw(frame)
+        if index == 8:
+            pass  # unchanged screen: a delta with no tiles
+        elif index == 12:
+            frame = frame.resize((300, 190))
+        elif index == 18:
+            frame = Image.effect_noise(frame.size, 60).convert("RGB")
+        else:
+            for _ in range(rng.randint(1, 3)):
+                x, y = rng.randrange(frame.width), rng.randrange(frame.height)
+                draw.rectangle([x, y, x + rng.randint(0, 40), y + rng.randint(0, 25)], fill=tuple(rng.randrange(256) for _ in range(3)))
+        frames.append(frame)
+    return frames
+
+
+@pytest.mark.parametrize("use_numpy", [True, False])
+def test_reconstruction_is_bit_identical(use_numpy):
+    encoder = DeltaEncoder(tile=32, keyframe_interval=10, use_numpy=use_numpy)
+    buffer = DeltaFrameBuffer()
+    keyframes = 0
+    for frame in _frames():
+        payload = encoder.encode(frame, buffer.seq)
+        assert buffer.apply(payload)
+        keyframes += payload["keyframe"]
+        assert np.array_equal(buffer.frame, np.asarray(frame))
+    # first frame, interval at 10 and 20, resize at 12
+    assert keyframes == 4
+
+
+def test_numpy_and_python_payloads_match():
+    numpy_encoder = DeltaEncoder(tile=32, use_numpy=True)
+    python_encoder = DeltaEncoder(tile=32, use_numpy=False)
+    for frame in _frames():
+        assert numpy_encoder.encode(frame, numpy_encoder.seq) == python_encoder.encode(frame, python_encoder.seq)
+
+
+def test_unchanged_frame_sends_no_tiles():
+    encoder = DeltaEncoder(tile=32)
+    frame = _frames(count=1)[0]
+    encoder.encode(frame, -1)
+    assert encoder.encode(frame, 0)["tiles"] == []
+
+
+def test_lost_base_gets_a_keyframe():
+    encoder = DeltaEncoder(tile=32)
+    buffer = DeltaFrameBuffer()
+    first, second, third = _frames(count=3)
+    assert buffer.apply(encoder.encode(first, buffer.seq))
+    encoder.encode(second, buffer.seq)  # reply lost: the host never applied it
+    payload = encoder.encode(third, buffer.seq)
+    assert payload["keyframe"] and buffer.apply(payload)
+    assert np.array_equal(buffer.frame, np.asarray(third))
+
+
+def test_delta_against_a_different_base_is_rejected():
+    encoder = DeltaEncoder(tile=32)
+    buffer = DeltaFrameBuffer()
+    first, second = _frames(count=2)
+    encoder.encode(first, -1)
+    assert not buffer.apply(encoder.encode(second, 0))
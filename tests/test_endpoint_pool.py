@@ -0,0 +1,78 @@
+"""
+EndpointPool health checks against several local stub servers: a passing probe readmits
+endpoints a failed probe ejected, but not endpoints ejected for failed requests.
+"""
+import pathlib
+import sys
+import time
+
+import pytest
+from openai import OpenAI
+
+REPO_ROOT = pathlib.Path(__file__).resolve().parent.parent
+if str(REPO_ROOT) not in sys.path:
+    sys.path.insert(0, str(REPO_ROOT))
+
+from endpoint_pool import EndpointPool  # noqa: E402
+from stub_server import ChatCompletionsStub, ScriptedResponder  # noqa: E402
+
+
+def _failing_responder(body: dict) -> str:
+    raise RuntimeError("generation failed")
+
+
+@pytest.fixture
+def stubs():
+    servers = [ChatCompletionsStub(ScriptedResponder(["Thought: ok\nAction: wait()"], loop=True)) for _ in range(2)]
+    servers.append(ChatCompletionsStub(_failing_responder))
+    for server in servers:
+        server.start()
+    yield servers
+    for server in servers:
+        server.stop()
+
+
+@pytest.fixture
+def pool(stubs):
+    return EndpointPool([stub.base_url for stub in stubs], failure_threshold=2, cooldown=60.0, health_timeout=5.0)
+
+
+def _ejected(pool) -> set:
+    return {snapshot["base_url"] for snapshot in pool.stats() if snapshot["ejected"]}
+
+
+def _send(pool, requests: int) -> None:
+    for _ in range(requests):
+        try:
+            with pool.lease() as endpoint:
+                client = OpenAI(base_url=endpoint.base_url, api_key="test", max_retries=0)
+                client.chat.completions.create(model="tgi", messages=[{"role": "user", "content": "hi"}], max_tokens=8)
+        except Exception:
+            pass
+
+
+def test_all_healthy(pool, stubs):
+    assert pool.check_health() == {stub.base_url: True for stub in stubs}
+    assert _ejected(pool) == set()
+
+
+def test_probe_ejection_is_lifted_by_a_passing_probe(pool, stubs):
+    stubs[1].healthy = False
+    assert pool.check_health()[stubs[1].base_url] is False
+    assert _ejected(pool) == {stubs[1].base_url}
+    assert all(pool.acquire().base_url != stubs[1].base_url for _ in range(6))
+
+    stubs[1].healthy = True
+    pool.check_health()
+    assert _ejected(pool) == set()
+
+
+def test_request_failure_ejection_keeps_its_cooldown(pool, stubs):
+    _send(pool, 9)
+    assert _ejected(pool) == {stubs[2].base_url}
+    ejected_until = pool.endpoints[2].ejected_until
+
+    # /health still passes on the replica whose completions fail
+    assert pool.check_health()[stubs[2].base_url] is True
+    assert _ejected(pool) == {stubs[2].base_url}
+    assert pool.endpoints[2].ejected_until == ejected_until > time.monotonic()
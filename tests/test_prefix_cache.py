@@ -0,0 +1,78 @@
+"""
+Grounding requests start with the same bytes for every task, step and message builder, so
+inference servers with prefix caching can reuse the static prompt.
+"""
+import base64
+import io
+import json
+import os
+import pathlib
+import sys
+
+import pytest
+from PIL import Image, ImageDraw
+
+REPO_ROOT = pathlib.Path(__file__).resolve().parent.parent
+if str(REPO_ROOT) not in sys.path:
+    sys.path.insert(0, str(REPO_ROOT))
+
+from core import AutomationState, build_messages_with_budget, build_messages_with_state  # noqa: E402
+from prompts.prompts import COMPUTER_USE_DOUBAO_MULTI_ACTION_STATIC, COMPUTER_USE_DOUBAO_STATIC  # noqa: E402
+from stub_server import PrefixCacheModel  # noqa: E402
+
+INSTRUCTIONS = [
+    "Click the 'Name' field and type 123.",
+    "Open the settings menu {and} enable dark mode.",
+    "在搜索框中输入天气",
+]
+
+
+def _frame(seed: int) -> str:
+    image = Image.new("RGB", (640, 400), (250, 250, 250))
+    ImageDraw.Draw(image).rectangle([seed * 37 % 600, 100, seed * 37 % 600 + 40, 160], fill=(seed * 50 % 255, 80, 160))
+    buffered = io.BytesIO()
+    image.save(buffered, format="PNG")
+    return base64.b64encode(buffered.getvalue()).decode("ascii")
+
+
+def _requests(multi_action: bool, budget=None, steps: int = 3) -> list:
+    requests = []
+    for task_idx, instruction in enumerate(INSTRUCTIONS):
+        state = AutomationState(instruction, language="English" if task_idx % 2 else "Chinese", multi_action=multi_action)
+        for step in range(steps):
+            frame = _frame(task_idx * 10 + step)
+            requests.append(build_messages_with_state(state, frame) if budget is None else build_messages_with_budget(state, frame, budget))
+            state.add_step(frame, f"thought {step}", f"click(start_box='[0.{step + 1}, 0.2, 0.{step + 1}, 0.2]')")
+    return requests
+
+
+def _render(messages: list) -> bytes:
+    # What a chat template sees, in order; any change in the static text shows up in these bytes
+    return json.dumps(messages, ensure_ascii=False).encode("utf-8")
+
+
+@pytest.mark.parametrize("budget", [None, "full", "compact"])
+@pytest.mark.parametrize("multi_action", [False, True])
+def test_rendered_prefix_is_byte_identical(multi_action, budget):
+    static = COMPUTER_USE_DOUBAO_MULTI_ACTION_STATIC if multi_action else COMPUTER_USE_DOUBAO_STATIC
+    expected = _render([{"role": "user", "content": static}])[:-len('"}]')]
+    rendered = [_render(messages) for messages in _requests(multi_action, budget)]
+    assert all(request.startswith(expected) for request in rendered)
+    # Nothing per-task or per-step leaks into the static part
+    assert len(os.path.commonprefix(rendered)) >= len(expected)
+    assert "{" not in static and "English" not in static and "Chinese" not in static
+
+
+def test_one_leading_user_message():
+    for messages in _requests(multi_action=False):
+        assert messages[0]["role"] == "user" and "## User Instruction" in messages[0]["content"]
+        # The task text is not split off into a message of its own
+        assert not (messages[1]["role"] == "user" and isinstance(messages[1]["content"], str))
+
+
+def test_static_prefix_is_cached_across_tasks():
+    cache = PrefixCacheModel()
+    first, second = (_requests(multi_action=False, steps=1)[idx] for idx in (0, 1))
+    cache.prefill_seconds(first)
+    cache.prefill_seconds(second)
+    assert cache.cached_tokens >= len(COMPUTER_USE_DOUBAO_STATIC) // 4 - cache.block_tokens
@@ -0,0 +1,72 @@
+"""
+Local tier of TieredResultChecker: decisions on clear cases, escalation of resolution
+mismatches and validation of precomputed features.
+"""
+import io
+import pathlib
+import sys
+
+import numpy as np
+import pytest
+from PIL import Image, ImageDraw
+
+REPO_ROOT = pathlib.Path(__file__).resolve().parent.parent
+if str(REPO_ROOT) not in sys.path:
+    sys.path.insert(0, str(REPO_ROOT))
+
+from result_check import TieredResultChecker, compute_check_features  # noqa: E402
+
+
+def _png(image: Image.Image) -> bytes:
+    buffered = io.BytesIO()
+    image.save(buffered, format="PNG")
+    return buffered.getvalue()
+
+
+def _frame(clock: str = "10:24", dialog: bool = False, size: tuple = (1920, 1080)) -> bytes:
+    image = Image.new("RGB", (1920, 1080), (246, 247, 249))
+    draw = ImageDraw.Draw(image)
+    draw.rectangle([0, 0, 1920, 36], fill=(30, 30, 30))
+    draw.text((936, 10), clock, fill=(240, 240, 240))
+    for row in range(6):
+        draw.rectangle([420, 150 + row * 70, 900, 186 + row * 70], outline=(170, 175, 185), fill=(255, 255, 255))
+    if dialog:
+        draw.rectangle([0, 100, 1920, 1080], fill=(120, 120, 120))
+        draw.rectangle([660, 380, 1260, 700], fill=(255, 255, 255))
+    return _png(image if size == (1920, 1080) else image.resize(size))
+
+
+@pytest.fixture
+def checker():
+    return TieredResultChecker(llm_checker=lambda **kwargs: {"thoughts": "", "result": True})
+
+
+def test_identical_frames_pass_locally(checker):
+    assert checker.local_check(_frame(), _frame())["decision"] == "pass"
+
+
+def test_clock_change_is_masked(checker):
+    assert checker.local_check(_frame(), _frame(clock="10:25"))["decision"] == "pass"
+
+
+def test_clearly_different_frame_fails_locally(checker):
+    assert checker.local_check(_frame(), _frame(dialog=True))["decision"] == "fail"
+
+
+def test_resolution_mismatch_escalates(checker):
+    result = checker.local_check(_frame(), _frame(size=(1440, 810)))
+    assert result["decision"] == "escalate" and result["size_mismatch"]
+
+
+def test_precomputed_features_with_size(checker):
+    features = compute_check_features(_frame())
+    assert checker.local_check(features, _frame(), expected_size=(1920, 1080))["decision"] == "pass"
+    assert checker.local_check(features, _frame(size=(1440, 810)), expected_size=(1920, 1080))["decision"] == "escalate"
+
+
+@pytest.mark.parametrize("argument", ["expected", "current"])
+def test_features_of_the_wrong_shape_are_rejected(checker, argument):
+    wrong = np.zeros((100, 160), dtype=np.float32)
+    frames = {"expected": _frame(), "current": _frame(), argument: wrong}
+    with pytest.raises(ValueError, match=f"{argument} features have shape"):
+        checker.local_check(frames["expected"], frames["current"])
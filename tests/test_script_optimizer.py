@@ -0,0 +1,220 @@
+"""
+Fixture scripts for script_optimizer: each fixture is an integrated script in the shape the
+code integration model returns, the optimize_script options and the statements the optimizer
+must produce; the rejected scripts must fail validation with the given reason.
+"""
+import ast
+import pathlib
+import re
+import sys
+
+import pytest
+
+REPO_ROOT = pathlib.Path(__file__).resolve().parent.parent
+if str(REPO_ROOT) not in sys.path:
+    sys.path.insert(0, str(REPO_ROOT))
+
+from script_optimizer import ScriptValidationError, optimize_script  # noqa: E402
+
+FIXTURES = [
+    (
+        "move folded into click, sleeps merged, trailing sleep dropped",
+        """
+import pyautogui
+import time
+pyautogui.moveTo(100, 200)
+pyautogui.click(100, 200, button='left')
+time.sleep(2.0)
+time.sleep(1)
+pyautogui.hotkey('ctrl', 'v', interval=0.1)
+time.sleep(2.0)
+""",
+        """
+import pyautogui
+import time
+pyautogui.click(100, 200, button='left')
+time.sleep(3.0)
+pyautogui.hotkey('ctrl', 'v', interval=0.1)
+""",
+        {"drop_trailing_sleep": True},
+    ),
+    (
+        "trailing sleep kept by default",
+        """
+import pyautogui
+import time
+pyautogui.click(100, 200)
+time.sleep(1.0)
+time.sleep(1.0)
+""",
+        """
+import pyautogui
+import time
+pyautogui.click(100, 200)
+time.sleep(2.0)
+""",
+        {},
+    ),
+    (
+        "bare click after moveTo takes the coordinates, move chain collapsed",
+        """
+import pyautogui
+pyautogui.moveTo(10, 10)
+pyautogui.moveTo(50, 60)
+pyautogui.click()
+""",
+        """
+import pyautogui
+pyautogui.click(50, 60)
+""",
+        {},
+    ),
+    (
+        "repeated click on the same field dropped, double click kept",
+        """
+import pyautogui
+import time
+pyautogui.click(300, 400, button='left')
+time.sleep(2.0)
+pyautogui.click(300, 400, button='left')
+pyautogui.write('abc', interval=0.1)
+pyautogui.click(10, 10)
+pyautogui.click(10, 10)
+""",
+        """
+import pyautogui
+import time
+pyautogui.click(300, 400, button='left')
+time.sleep(2.0)
+pyautogui.write('abc', interval=0.1)
+pyautogui.click(10, 10)
+pyautogui.click(10, 10)
+""",
+        {"dedupe_clicks": True},
+    ),
+    (
+        "repeated click kept by default (toggles, focus then activate)",
+        """
+import pyautogui
+import time
+pyautogui.click(300, 400, button='left')
+time.sleep(2.0)
+pyautogui.click(300, 400, button='left')
+""",
+        """
+import pyautogui
+import time
+pyautogui.click(300, 400, button='left')
+time.sleep(2.0)
+pyautogui.click(300, 400, button='left')
+""",
+        {},
+    ),
+    (
+        "modifier-only hotkeys dropped, real hotkeys kept, nested blocks optimized",
+        """
+import pyautogui
+import time
+pyautogui.hotkey('ctrl')
+pyautogui.hotkey('ctrl', 'shift')
+pyautogui.hotkey('ctrl', 'c')
+for _ in range(2):
+    pyautogui.press('tab')
+    time.sleep(0.5)
+    time.sleep(0.5)
+pyautogui.press('enter')
+""",
+        """
+import pyautogui
+import time
+pyautogui.hotkey('ctrl', 'c')
+for _ in range(2):
+    pyautogui.press('tab')
+    time.sleep(1.0)
+pyautogui.press('enter')
+""",
+        {},
+    ),
+    (
+        "hover before a different target is kept",
+        """
+import pyautogui
+pyautogui.moveTo(5, 5)
+pyautogui.click(6, 6)
+""",
+        """
+import pyautogui
+pyautogui.moveTo(5, 5)
+pyautogui.click(6, 6)
+""",
+        {},
+    ),
+    (
+        "main guard and screenshot method chains are allowed",
+        """
+import pyautogui
+import time
+if __name__ == '__main__':
+    previous = pyautogui.screenshot().convert('L').resize((160, 100)).tobytes()
+    pyautogui.press('tab')
+""",
+        """
+import pyautogui
+import time
+if __name__ == '__main__':
+    previous = pyautogui.screenshot().convert('L').resize((160, 100)).tobytes()
+    pyautogui.press('tab')
+""",
+        {},
+    ),
+    (
+        "alt, win and command hotkeys are kept, empty hotkey dropped",
+        """
+import pyautogui
+pyautogui.hotkey()
+pyautogui.hotkey('win')
+pyautogui.hotkey('alt')
+pyautogui.hotkey('command')
+pyautogui.hotkey('shift')
+""",
+        """
+import pyautogui
+pyautogui.hotkey('win')
+pyautogui.hotkey('alt')
+pyautogui.hotkey('command')
+""",
+        {},
+    ),
+]
+
+REJECTED = [
+    ("import os\nimport pyautogui\nos.system('rm -rf /tmp/x')\n", "import of 'os'"),
+    ("import pyautogui\n__import__('subprocess').run(['ls'])\n", "__import__"),
+    ("from subprocess import run\n", "import of 'subprocess'"),
+    ("import pyautogui\npyautogui.os.system('ls')\n", "pyautogui.os"),
+    ("import pyautogui as pg\npg.subprocess.run(['ls'])\n", "pg.subprocess"),
+    ("from pyautogui import os\n", "import of 'os' from 'pyautogui'"),
+    ("import time\ntime.__builtins__['open']('/etc/passwd')\n", "__builtins__"),
+    ("import pyautogui\ngetattr(pyautogui, 'os').system('ls')\n", "getattr()"),
+    ("open('/tmp/x', 'w').write('x')\n", "open()"),
+    ("globals()['pyautogui']\n", "globals()"),
+    ("import pyautogui\npyautogui.platformModule.foo()\n", "pyautogui.platformModule.foo"),
+]
+
+
+
+def _normalize(source: str) -> str:
+    return ast.unparse(ast.parse(source))
+
+
+@pytest.mark.parametrize("source, expected, options", [fixture[1:] for fixture in FIXTURES], ids=[fixture[0] for fixture in FIXTURES])
+def test_optimize_script(source, expected, options):
+    optimized, report = optimize_script(source, **options)
+    assert _normalize(optimized) == _normalize(expected)
+    assert report["statements_after"] <= report["statements_before"]
+
+
+@pytest.mark.parametrize("source, message", REJECTED, ids=[message for _, message in REJECTED])
+def test_rejected(source, message):
+    with pytest.raises(ScriptValidationError, match=re.escape(message)):
+        optimize_script(source)
@@ -1,13 +1,17 @@
-import matplotlib.pyplot as plt
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
 import os
 import subprocess
 import sys
 import tempfile
+import threading
+from concurrent.futures import Executor, ThreadPoolExecutor, wait
 from typing import Optional, Tuple, Union
 import time
 import base64
 import io
 from PIL import Image
+from action_parser import CoordinateSpace, get_coordinate_space
 
 def get_size_from_base64(b64_or_bytes: Union[str, bytes]) -> tuple[int, int]:
     """
@@ -32,7 +36,25 @@ def get_size_from_base64(b64_or_bytes: Union[str, bytes]) -> tuple[int, int]:
     with Image.open(io.BytesIO(data)) as im:
         return im.size  # (width, height)
 
-def visualize_actions_on_image(image: Union['Image.Image', str], structured_actions: list, output_path: str, title: Optional[str] = None, dpi: int = 350) -> None:
+def crop_base64_image(image_b64: str, region: Tuple[int, int, int, int]) -> str:
+    """
+    Crop a base64 PNG to a region at full resolution and return the crop as base64 PNG.
+
+    Args:
+        image_b64: Base64 encoded image (without data URL prefix)
+        region: (x, y, width, height) in image pixels
+
+    Returns:
+        str: Base64 encoded PNG of the region
+    """
+    x, y, w, h = region
+    with Image.open(io.BytesIO(base64.b64decode(image_b64))) as im:
+        crop = im.crop((x, y, x + w, y + h))
+        buffered = io.BytesIO()
+        crop.save(buffered, format="PNG")
+    return base64.b64encode(buffered.getvalue()).decode("ascii")
+
+def visualize_actions_on_image(image: Union['Image.Image', str], structured_actions: list, output_path: str, title: Optional[str] = None, dpi: int = 350, space: Optional[CoordinateSpace] = None) -> None:
     """
     Visualize structured actions on an image and save it.
 
@@ -42,6 +64,7 @@ def visualize_actions_on_image(image: Union['Image.Image', str], structured_acti
         output_path: Path where to save the visualized image
         title: Optional title for the plot (will be truncated if too long)
         dpi: DPI for saving the image (default: 350)
+        space: Coordinate space of the session (defaults to one matching the image size)
 
     Returns:
         None (saves image to output_path)
@@ -67,10 +90,17 @@ def visualize_actions_on_image(image: Union['Image.Image', str], structured_acti
         image = image.convert('RGB')
 
     image_width, image_height = image.size
+    if space is None or (space.image_width, space.image_height) != (image_width, image_height):
+        space = get_coordinate_space(image_width, image_height)
+    # Pixel positions of every action (box centers, where the generated code acts), converted together
+    pixel_points = space.action_points(structured_actions, target="image")
     
-    # Display the image
-    plt.clf()
-    plt.imshow(image)
+    # A figure and Agg canvas owned by this call (no pyplot state), so concurrent calls from
+    # threads or asyncio executors never draw into each other's figure
+    fig = Figure()
+    FigureCanvasAgg(fig)
+    ax = fig.add_subplot()
+    ax.imshow(image)
     
     # Process each action and visualize it
     for action_idx, action in enumerate(structured_actions):
@@ -85,48 +115,38 @@ def visualize_actions_on_image(image: Union['Image.Image', str], structured_acti
         for param_name, param_value in action_inputs.items():
             if any(coord_param in param_name for coord_param in ['start_box', 'end_box', 'point']):
                 try:
-                    # Handle different coordinate formats
-                    if isinstance(param_value, str):
-                        # Remove brackets and parse
-                        coord_str = param_value.strip('[]')
-                        coord_values = [float(x.strip()) for x in coord_str.split(',')]
+                    if (action_idx, param_name) not in pixel_points:
+                        raise ValueError("not a point or box")
+                    x, y = (int(v) for v in pixel_points[(action_idx, param_name)])
+                    coordinates.append((x, y))
+                    has_coordinates = True
+                    
+                    # Choose color based on parameter type
+                    if 'start' in param_name:
+                        color = 'red'
+                        marker_size = 100
+                    elif 'end' in param_name:
+                        color = 'blue'
+                        marker_size = 100
                     else:
-                        coord_values = param_value
+                        color = 'green'
+                        marker_size = 80
+                    
+                    # Draw circle for coordinate
+                    ax.scatter([x], [y], c=color, s=marker_size, alpha=0.7, edgecolors='black', linewidth=2)
+                    
+                    # Add action type label near the coordinate
+                    label_text = f'{action_type}'
+                    if param_name != 'start_box':  # Add parameter name if not default
+                        label_text += f'({param_name})'
+                    
+                    ax.annotate(label_text, (x, y), 
+                               xytext=(10, 10), textcoords='offset points',
+                               bbox=dict(boxstyle='round,pad=0.3', facecolor='yellow', alpha=0.7),
+                               fontsize=8, fontweight='bold')
+                    
+                    # print(f"Drawn coordinate: ({x}, {y}) for {action_type} ({param_name})")
                     
-                    if len(coord_values) >= 2:
-                        # Convert normalized coordinates (0-1) to pixel coordinates
-                        x = int(coord_values[0] * image_width)
-                        y = int(coord_values[1] * image_height)
-                        coordinates.append((x, y))
-                        # print(f"Parsed {param_name}: coord_values={coord_values}, pixel_coords=({x}, {y})")
-                        has_coordinates = True
-                        
-                        # Choose color based on parameter type
-                        if 'start' in param_name:
-                            color = 'red'
-                            marker_size = 100
-                        elif 'end' in param_name:
-                            color = 'blue'
-                            marker_size = 100
-                        else:
-                            color = 'green'
-                            marker_size = 80
-                        
-                        # Draw circle for coordinate
-                        plt.scatter([x], [y], c=color, s=marker_size, alpha=0.7, edgecolors='black', linewidth=2)
-                        
-                        # Add action type label near the coordinate
-                        label_text = f'{action_type}'
-                        if param_name != 'start_box':  # Add parameter name if not default
-                            label_text += f'({param_name})'
-                        
-                        plt.annotate(label_text, (x, y), 
-                                   xytext=(10, 10), textcoords='offset points',
-                                   bbox=dict(boxstyle='round,pad=0.3', facecolor='yellow', alpha=0.7),
-                                   fontsize=8, fontweight='bold')
-                        
-                        # print(f"Drawn coordinate: ({x}, {y}) for {action_type} ({param_name})")
-                        
                 except (ValueError, AttributeError, TypeError) as e:
                     print(f"Error parsing coordinates for {param_name}: {param_value}, Error: {e}")
                     continue
@@ -136,8 +156,8 @@ def visualize_actions_on_image(image: Union['Image.Image', str], structured_acti
             if len(coordinates) == 2:  # We have both start and end
                 start_x, start_y = coordinates[0]
                 end_x, end_y = coordinates[1]
-                plt.plot([start_x, end_x], [start_y, end_y], 'k--', alpha=0.5, linewidth=2)
-                plt.annotate('drag path', ((start_x + end_x)/2, (start_y + end_y)/2), 
+                ax.plot([start_x, end_x], [start_y, end_y], 'k--', alpha=0.5, linewidth=2)
+                ax.annotate('drag path', ((start_x + end_x)/2, (start_y + end_y)/2), 
                            bbox=dict(boxstyle='round,pad=0.2', facecolor='white', alpha=0.8),
                            fontsize=7)
                 # print(f"Drawn drag line from ({start_x}, {start_y}) to ({end_x}, {end_y})")
@@ -170,7 +190,7 @@ def visualize_actions_on_image(image: Union['Image.Image', str], structured_acti
             text_x = 50
             text_y = 50 + (action_idx * 40)  # Increased spacing
             
-            plt.annotate(action_text, (text_x, text_y), 
+            ax.annotate(action_text, (text_x, text_y), 
                         bbox=dict(boxstyle='round,pad=0.5', facecolor='lightblue', alpha=0.8),
                         fontsize=9, fontweight='bold')
             
@@ -180,22 +200,55 @@ def visualize_actions_on_image(image: Union['Image.Image', str], structured_acti
     if title:
         # Truncate title if too long
         display_title = title[:50] + "..." if len(title) > 50 else title
-        plt.title(f'Action Visualization - {display_title}')
+        ax.set_title(f'Action Visualization - {display_title}')
     else:
-        plt.title('Action Visualization')
+        ax.set_title('Action Visualization')
     
-    plt.axis('off')
+    ax.axis('off')
     
     # Ensure output directory exists
     os.makedirs(os.path.dirname(output_path), exist_ok=True)
     
     # Save the image (without bbox_inches to preserve full image)
-    plt.savefig(output_path, dpi=dpi)
-    plt.close()
+    fig.savefig(output_path, dpi=dpi)
     
     # print(f"Visualization saved to: {output_path}")
 
 
+def visualize_actions_batch(jobs: list, max_workers: Optional[int] = None, executor: Optional[Executor] = None) -> list:
+    """
+    Render several action visualizations in parallel.
+
+    visualize_actions_on_image keeps all drawing state in a per-call figure, so jobs can run on
+    any number of threads at once.
+
+    Args:
+        jobs: One dict of visualize_actions_on_image keyword arguments per frame
+              (image, structured_actions, output_path and optionally title, dpi, space)
+        max_workers: Threads of the temporary pool (default: one per job, at most os.cpu_count())
+        executor: Existing executor to use instead of a temporary pool
+
+    Returns:
+        list: Output paths in job order (the first failing job's exception is raised after all
+              jobs have finished)
+    """
+    if not jobs:
+        return []
+
+    def render(job):
+        visualize_actions_on_image(**job)
+        return job["output_path"]
+
+    if executor is not None:
+        futures = [executor.submit(render, job) for job in jobs]
+        wait(futures)
+        return [future.result() for future in futures]
+    workers = max_workers or min(len(jobs), os.cpu_count() or 1)
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="visualize") as pool:
+        futures = [pool.submit(render, job) for job in jobs]
+    return [future.result() for future in futures]
+
+
 def execute_pyautogui_code(code: str, timeout: int = 30) -> Tuple[bool, str]:
     """
     Execute generated pyautogui code safely.
@@ -243,7 +296,116 @@ def execute_pyautogui_code(code: str, timeout: int = 30) -> Tuple[bool, str]:
         return False, f"Failed to execute code: {str(e)}"
 
 
-def get_screenshot_base64(region: Optional[Tuple[int, int, int, int]] = None, width: Optional[int] = None, height: Optional[int] = None) -> str:
+class PyAutoGUICapture:
+    """Screen capture through pyautogui (scrot/PIL on Linux). Works everywhere pyautogui does."""
+
+    name = "pyautogui"
+
+    def __init__(self):
+        try:
+            import pyautogui
+        except ImportError:
+            raise ImportError("pyautogui is required for the pyautogui capture backend. Install with: pip install pyautogui")
+        self._pyautogui = pyautogui
+
+    def grab(self, region: Optional[Tuple[int, int, int, int]] = None, size: Optional[Tuple[int, int]] = None) -> "Image.Image":
+        shot = self._pyautogui.screenshot()
+        if shot.mode != "RGB":
+            shot = shot.convert("RGB")
+        if region is None and size is None:
+            return shot
+        x, y, w, h = region if region is not None else (0, 0, shot.width, shot.height)
+        box = (x, y, x + w, y + h)
+        if size is None:
+            return shot.crop(box)
+        # Crop and resample in one pass
+        return shot.resize((int(size[0]), int(size[1])), box=box)
+
+
+class MSSCapture:
+    """
+    Screen capture through mss (XGetImage/XShm on Linux): raw BGRA pixels without any
+    PNG round trip, and region capture done by the X server.
+    """
+
+    name = "mss"
+
+    def __init__(self):
+        try:
+            import mss
+        except ImportError:
+            raise ImportError("mss is required for the mss capture backend. Install with: pip install mss")
+        self._mss = mss
+        # mss handles are not thread safe; keep one per thread
+        self._local = threading.local()
+
+    def _sct(self):
+        sct = getattr(self._local, "sct", None)
+        if sct is None:
+            sct = self._local.sct = self._mss.mss()
+        return sct
+
+    def grab_raw(self, region: Optional[Tuple[int, int, int, int]] = None):
+        """
+        Capture into the mss buffer and return it without copying.
+
+        Returns:
+            (numpy.ndarray, (width, height)): (height, width, 4) uint8 BGRA view over the capture buffer
+        """
+        import numpy as np
+
+        sct = self._sct()
+        if region is None:
+            monitor = sct.monitors[1]
+        else:
+            x, y, w, h = region
+            monitor = {"left": int(x), "top": int(y), "width": int(w), "height": int(h)}
+        shot = sct.grab(monitor)
+        pixels = np.frombuffer(shot.raw, dtype=np.uint8).reshape(shot.height, shot.width, 4)
+        return pixels, (shot.width, shot.height)
+
+    def grab(self, region: Optional[Tuple[int, int, int, int]] = None, size: Optional[Tuple[int, int]] = None) -> "Image.Image":
+        pixels, (w, h) = self.grab_raw(region)
+        # frombuffer reads the BGRA buffer in place; conversion to RGB happens in the decoder
+        image = Image.frombuffer("RGB", (w, h), pixels, "raw", "BGRX", 0, 1)
+        if size is None:
+            return image
+        return image.resize((int(size[0]), int(size[1])))
+
+
+CAPTURE_BACKENDS = {
+    "pyautogui": PyAutoGUICapture,
+    "mss": MSSCapture,
+}
+
+_CAPTURE_BACKEND_INSTANCES = {}
+_CAPTURE_BACKEND_LOCK = threading.Lock()
+
+
+def get_capture_backend(name: Optional[str] = None):
+    """
+    Return a (shared) capture backend.
+
+    Args:
+        name: "pyautogui", "mss" or "auto". Defaults to the SCREEN_CAPTURE_BACKEND environment
+              variable, then "auto" (mss when installed, pyautogui otherwise).
+    """
+    name = (name or os.getenv("SCREEN_CAPTURE_BACKEND") or "auto").lower()
+    if name == "auto":
+        try:
+            import mss  # noqa: F401
+            name = "mss"
+        except ImportError:
+            name = "pyautogui"
+    if name not in CAPTURE_BACKENDS:
+        raise ValueError(f"Unknown capture backend: {name}, expected one of {sorted(CAPTURE_BACKENDS)} or 'auto'")
+    with _CAPTURE_BACKEND_LOCK:
+        if name not in _CAPTURE_BACKEND_INSTANCES:
+            _CAPTURE_BACKEND_INSTANCES[name] = CAPTURE_BACKENDS[name]()
+        return _CAPTURE_BACKEND_INSTANCES[name]
+
+
+def get_screenshot_base64(region: Optional[Tuple[int, int, int, int]] = None, width: Optional[int] = None, height: Optional[int] = None, backend: Optional[str] = None) -> str:
     """
     Capture a screenshot and return it as a base64 encoded string.
 
@@ -252,45 +414,42 @@ def get_screenshot_base64(region: Optional[Tuple[int, int, int, int]] = None, wi
                If None, captures the entire screen.
         width: Optional target width to resize the screenshot to before encoding.
         height: Optional target height to resize the screenshot to before encoding.
+        backend: Capture backend name (see get_capture_backend); defaults to SCREEN_CAPTURE_BACKEND or "auto"
 
     Returns:
         str: Base64 encoded string of the screenshot image
     """
-    try:
-        import pyautogui
-        from PIL import Image
-        import base64
-        from io import BytesIO
-    except ImportError:
-        raise ImportError("pyautogui and pillow are required for screenshot capture. Install with: pip install pyautogui pillow")
-
-    # Capture screenshot
-    if region:
-        screenshot = pyautogui.screenshot(region=region)
-    else:
-        screenshot = pyautogui.screenshot()
-
-    # Resize if requested (no quality downscale, still PNG)
-    if width is not None and height is not None:
-        if screenshot.mode != 'RGB':
-            screenshot = screenshot.convert('RGB')
-        screenshot = screenshot.resize((int(width), int(height)))
+    size = (int(width), int(height)) if width is not None and height is not None else None
+    screenshot = get_capture_backend(backend).grab(region=region, size=size)
 
     # Convert to base64 (PNG)
-    buffered = BytesIO()
+    buffered = io.BytesIO()
     screenshot.save(buffered, format="PNG")
     img_str = base64.b64encode(buffered.getvalue()).decode()
 
     return img_str
 
 
-# Example usage for testing
 if __name__ == "__main__":
     # Ensure data directory exists
     os.makedirs("./data", exist_ok=True)
 
-    # Test the screenshot function
-    print("Testing get_screenshot_base64...")
+    # Test the screenshot function with every capture backend that can be loaded
+    for backend_name in CAPTURE_BACKENDS:
+        print(f"Testing get_screenshot_base64 (backend: {backend_name})...")
+        try:
+            backend_string = get_screenshot_base64(backend=backend_name)
+            print(f"Screenshot captured successfully! Base64 length: {len(backend_string)}, size: {get_size_from_base64(backend_string)}")
+            region_string = get_screenshot_base64(region=(0, 0, 200, 100), width=100, height=50, backend=backend_name)
+            print(f"Region capture resized to {get_size_from_base64(region_string)}")
+        except ImportError as e:
+            print(f"Skipping {backend_name}: {e}")
+        except Exception as e:
+            print(f"Error: {e}")
+            import traceback
+            traceback.print_exc()
+
+    print("\nTesting get_screenshot_base64 (default backend)...")
     try:
         base64_string = get_screenshot_base64()
         print(f"Screenshot captured successfully! Base64 length: {len(base64_string)}")
@@ -299,14 +458,9 @@ if __name__ == "__main__":
         # Test visualization with base64 string
         print("\nTesting visualize_actions_on_image with base64 string...")
 
-        # First, let's test the base64 decoding separately
-        from PIL import Image
-        import base64
-        from io import BytesIO
-
         print("Decoding base64 to PIL Image...")
         image_data = base64.b64decode(base64_string)
-        pil_image = Image.open(BytesIO(image_data))
+        pil_image = Image.open(io.BytesIO(image_data))
         print(f"Original PIL Image mode: {pil_image.mode}")
         print(f"Original PIL Image size: {pil_image.size}")
 
@@ -338,6 +492,12 @@ if __name__ == "__main__":
         )
         print("Visualization saved successfully!")
 
+        # Same frame through the thread-pooled batch renderer
+        visualize_actions_batch([
+            {"image": base64_string, "structured_actions": test_actions, "output_path": "./data/test_visualization_batch.png", "title": "Test Visualization (batch)"},
+        ])
+        print("Batch visualization saved successfully!")
+
     except Exception as e:
         print(f"Error: {e}")
         import traceback